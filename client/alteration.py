@@ -19,3 +19,53 @@ def clean(input):
         input -- original speech text to-be modified
     """
     return detectYears(input)
+
+
+# Words with a trailing period that don't end a sentence
+ABBREVIATIONS = set(['mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'vs', 'etc',
+                     'e.g', 'i.e', 'no', 'jr', 'sr', 'inc', 'ltd', 'co'])
+
+
+def splitSentences(input, max_length=150):
+    """
+        Splits text into sentences, so that they can be synthesized one
+        after the other. Sentences that are longer than max_length are
+        split further at commas and semicolons.
+
+        Arguments:
+        input -- the text
+        max_length -- (optional) the length above which sentences are split
+                      into clauses
+
+        Returns:
+        A list of sentences (at least one)
+    """
+    sentences = []
+    for part in re.split(r'(?<=[.!?])\s+', input.strip()):
+        if not part:
+            continue
+        if sentences:
+            last_word = sentences[-1].rsplit(None, 1)[-1][:-1]
+            # Don't split after abbreviations and initials ("J. R. R.")
+            if last_word.lower() in ABBREVIATIONS or (len(last_word) == 1 and
+                                                      last_word.isupper()):
+                sentences[-1] += ' ' + part
+                continue
+        sentences.append(part)
+
+    result = []
+    for sentence in sentences:
+        if len(sentence) <= max_length:
+            result.append(sentence)
+            continue
+        # Split long sentences into clauses, but don't create tiny ones
+        clause = ''
+        for part in re.split(r'(?<=[,;:])\s+', sentence):
+            if clause and len(clause) + len(part) > max_length:
+                result.append(clause)
+                clause = part
+            else:
+                clause = clause + ' ' + part if clause else part
+        if clause:
+            result.append(clause)
+    return result if result else [input]
@@ -0,0 +1,349 @@
+# -*- coding: utf-8-*-
+"""
+Long-lived audio capture for the Mic class.
+
+Instead of opening a new PyAudio input stream for every listen cycle, a single
+AudioCapture keeps one stream open and writes everything it reads into a
+fixed-size RingBuffer. Listeners can then look back into the buffer (e.g. to
+prepend a pre-roll to an active listen), so audio spoken between two listen
+cycles is not lost. Every captured chunk also updates a NoiseFloorTracker, so
+that a current threshold is available at any time.
+
+The stream is read by a dedicated thread that hands the audio to the consumer
+through a bounded queue.
+"""
+import time
+import Queue
+import logging
+import threading
+import collections
+import vad
+
+# Same value as pyaudio.paInputOverflowed. It is defined here so that this
+# module does not need to import pyaudio itself (the PyAudio instance is
+# passed in by the Mic).
+PA_INPUT_OVERFLOWED = -9981
+
+# A chunk of captured audio, the time it was captured at, and the ring
+# buffer position right after it
+Frame = collections.namedtuple('Frame', ['data', 'timestamp', 'position'])
+
+
+class RingBuffer(object):
+    """
+    A fixed-size byte buffer that always holds the most recently written
+    data. Positions are absolute byte offsets since the buffer was created,
+    so readers can keep a cursor and read everything written after it.
+    """
+
+    def __init__(self, size):
+        """
+        Arguments:
+            size -- the capacity of the buffer in bytes
+        """
+        if size <= 0:
+            raise ValueError("RingBuffer size must be positive")
+        self._size = size
+        self._buffer = bytearray(size)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """
+        Returns:
+            The capacity of this buffer in bytes
+        """
+        return self._size
+
+    @property
+    def position(self):
+        """
+        Returns:
+            The absolute position after the last written byte
+        """
+        return self._written
+
+    def __len__(self):
+        return min(self._written, self._size)
+
+    def write(self, data):
+        """
+        Appends data to the buffer, overwriting the oldest data if the buffer
+        is full.
+
+        Arguments:
+            data -- a str, bytearray or memoryview
+        """
+        length = len(data)
+        if not length:
+            return
+        with self._lock:
+            if length > self._size:
+                # Only the tail fits, skip the rest
+                self._written += length - self._size
+                data = data[length - self._size:]
+                length = self._size
+            start = self._written % self._size
+            end = start + length
+            if end <= self._size:
+                self._buffer[start:end] = data
+            else:
+                split = self._size - start
+                self._buffer[start:] = data[:split]
+                self._buffer[:end - self._size] = data[split:]
+            self._written += length
+
+    def read(self, position, length=None):
+        """
+        Reads data starting at an absolute position. If the data at position
+        has already been overwritten, reading starts at the oldest byte that
+        is still available.
+
+        Arguments:
+            position -- an absolute position (see RingBuffer.position)
+            length -- (optional) the maximum number of bytes to read
+
+        Returns:
+            A str containing the requested data
+        """
+        with self._lock:
+            oldest = max(0, self._written - self._size)
+            position = max(position, oldest)
+            end = self._written
+            if length is not None:
+                end = min(end, position + length)
+            if end <= position:
+                return b''
+            start = position % self._size
+            stop = start + (end - position)
+            if stop <= self._size:
+                return str(self._buffer[start:stop])
+            return (str(self._buffer[start:]) +
+                    str(self._buffer[:stop - self._size]))
+
+    def latest(self, length):
+        """
+        Returns:
+            The last length bytes written to this buffer (or less, if not
+            enough data is available)
+        """
+        return self.read(self._written - length)
+
+
+class AudioCapture(object):
+    """
+    Wraps a single, persistent PyAudio input stream. A dedicated thread reads
+    the stream, records everything into a RingBuffer, updates the noise
+    floor and puts timestamped Frames into a bounded queue for the
+    consumer. This way, a slow consumer (e.g. while transcribing or playing
+    audio) can never stall the capture.
+    """
+
+    # Policies for a full queue: drop the oldest queued frame to make room
+    # for the new one, or drop the new frame.
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+    def __init__(self, audio, rate=16000, chunk=1024, width=2, channels=1,
+                 buffer_time=10, queue_time=5, overflow_policy=DROP_OLDEST):
+        """
+        Arguments:
+            audio -- a pyaudio.PyAudio instance
+            rate -- (optional) the sample rate in Hz (Default: 16000)
+            chunk -- (optional) the number of frames per read (Default: 1024)
+            width -- (optional) the sample width in bytes (Default: 2)
+            channels -- (optional) the number of channels (Default: 1)
+            buffer_time -- (optional) the number of seconds of audio kept in
+                           the ring buffer (Default: 10)
+            queue_time -- (optional) the number of seconds of audio the
+                          queue can hold before frames are dropped
+                          (Default: 5)
+            overflow_policy -- (optional) what to drop if the queue is full,
+                               DROP_OLDEST or DROP_NEWEST (Default:
+                               DROP_OLDEST)
+        """
+        if overflow_policy not in (self.DROP_OLDEST, self.DROP_NEWEST):
+            raise ValueError("Invalid overflow policy '%s'" % overflow_policy)
+        self._logger = logging.getLogger(__name__)
+        self._audio = audio
+        self._stream = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.chunk = chunk
+        self.width = width
+        self.channels = channels
+        self.overflow_policy = overflow_policy
+        # number of times the input stream overflowed (i.e. the capture
+        # thread didn't read fast enough)
+        self.overflows = 0
+        # number of frames dropped because the queue was full
+        self.dropped = 0
+        self.ringbuffer = RingBuffer(self.seconds_to_bytes(buffer_time))
+        self.noise_floor = vad.NoiseFloorTracker()
+        self._queue = Queue.Queue(
+            maxsize=max(1, int(queue_time * rate / chunk)))
+        # the ring buffer position after the last frame consumed by read()
+        self.position = 0
+
+    @property
+    def is_open(self):
+        return self._stream is not None
+
+    def seconds_to_bytes(self, seconds):
+        """
+        Returns:
+            The number of bytes that hold the given amount of audio
+        """
+        return int(seconds * self.rate) * self.width * self.channels
+
+    def open(self):
+        """
+        Opens the input stream and starts the capture thread, unless it is
+        already running. If the capture thread died after a read error, the
+        stream is reopened.
+        """
+        if self._stream is not None:
+            if self._running:
+                return
+            self._logger.warning("Audio capture stopped, reopening the " +
+                                 "capture stream")
+            try:
+                self.close()
+            except IOError:
+                self._logger.debug("Closing the capture stream failed",
+                                   exc_info=True)
+                self._thread = None
+                self._stream = None
+        self._logger.debug("Opening capture stream (rate: %d Hz, chunk: " +
+                           "%d frames)", self.rate, self.chunk)
+        self._stream = self._audio.open(
+            format=self._audio.get_format_from_width(self.width),
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk)
+        self._running = True
+        self._thread = threading.Thread(target=self._capture,
+                                        name='AudioCapture')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the capture thread and closes the input stream.
+        """
+        if self._stream is None:
+            return
+        self._logger.debug("Closing capture stream (%d overflows, %d " +
+                           "dropped frames)", self.overflows, self.dropped)
+        self._running = False
+        self._thread.join()
+        self._thread = None
+        self._stream.stop_stream()
+        self._stream.close()
+        self._stream = None
+
+    def _capture(self):
+        while self._running:
+            try:
+                data = self._stream.read(self.chunk)
+            except IOError as e:
+                if e.errno != PA_INPUT_OVERFLOWED:
+                    self._logger.error("Reading from capture stream failed",
+                                       exc_info=True)
+                    self._running = False
+                    break
+                self.overflows += 1
+                self._logger.warning("Capture stream overflowed (%d times " +
+                                     "so far)", self.overflows)
+                continue
+            timestamp = time.time()
+            self.noise_floor.update(vad.score(data, self.width))
+            with self._lock:
+                self.ringbuffer.write(data)
+                frame = Frame(data, timestamp, self.ringbuffer.position)
+                try:
+                    self._queue.put_nowait(frame)
+                except Queue.Full:
+                    self.dropped += 1
+                    if self.overflow_policy == self.DROP_OLDEST:
+                        self._queue.get_nowait()
+                        self._queue.put_nowait(frame)
+
+    def read_frame(self, timeout=None):
+        """
+        Takes the next captured Frame from the queue. The capture is started
+        on first use.
+
+        Arguments:
+            timeout -- (optional) seconds to wait for a frame (Default: wait
+                       forever)
+
+        Returns:
+            A Frame
+
+        Raises:
+            IOError if the capture thread died or no frame arrived in time
+        """
+        self.open()
+        waited = 0.0
+        while True:
+            try:
+                frame = self._queue.get(timeout=0.5)
+            except Queue.Empty:
+                waited += 0.5
+                if not self._running:
+                    raise IOError("Audio capture is not running")
+                if timeout is not None and waited >= timeout:
+                    raise IOError("No audio captured in %.1f seconds" %
+                                  waited)
+            else:
+                self.position = frame.position
+                return frame
+
+    def read(self):
+        """
+        Returns:
+            A str containing the next chunk of captured audio
+        """
+        return self.read_frame().data
+
+    def flush(self):
+        """
+        Discards all queued frames, so that the next read() returns live
+        audio. The discarded audio is still available in the ring buffer.
+        """
+        self.open()
+        with self._lock:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except Queue.Empty:
+                    break
+            self.position = self.ringbuffer.position
+
+    def get_threshold(self):
+        """
+        Returns the threshold that a chunk's score has to exceed to count as a
+        disturbance. Audio is only read if the noise floor estimate isn't
+        reliable yet (i.e. right after the stream has been opened).
+
+        Returns:
+            The current threshold
+        """
+        self.open()
+        while not self.noise_floor.ready:
+            self.read()
+        return self.noise_floor.threshold
+
+    def preroll(self, seconds):
+        """
+        Returns:
+            The last seconds of audio up to the last consumed frame (or the
+            last flush)
+        """
+        length = self.seconds_to_bytes(seconds)
+        return self.ringbuffer.read(self.position - length, length)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8-*-
+"""
+Encoders that compress raw PCM audio before it's uploaded to a cloud STT
+engine.
+
+16 kHz/16 bit PCM takes 32 KB per second of speech. Encoders are used
+through an EncoderStream, so audio can be encoded chunk by chunk while it's
+being streamed to the server. Each stream keeps track of how many bytes it
+saved and how long encoding took.
+"""
+import time
+import audioop
+import logging
+import threading
+import subprocess
+from abc import ABCMeta, abstractmethod
+
+import diagnose
+
+
+class EncoderStream(object):
+    """
+    Generic parent class for incremental encoders. Call write() with raw
+    audio and send what it returns, then send what close() returns.
+    """
+    __metaclass__ = ABCMeta
+
+    def __init__(self, encoding, rate, width):
+        self._logger = logging.getLogger(__name__)
+        self.encoding = encoding
+        self.rate = rate
+        self.width = width
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.encode_time = 0.0
+
+    def write(self, data):
+        """
+        Encodes a chunk of raw mono PCM audio.
+
+        Returns:
+            The encoded data that is ready to be sent (may be empty)
+        """
+        start = time.time()
+        encoded = self._write(data)
+        self.encode_time += time.time() - start
+        self.raw_bytes += len(data)
+        self.encoded_bytes += len(encoded)
+        return encoded
+
+    def close(self):
+        """
+        Ends the stream and logs how well the audio was compressed.
+
+        Returns:
+            The rest of the encoded data
+        """
+        start = time.time()
+        encoded = self._close()
+        self.encode_time += time.time() - start
+        self.encoded_bytes += len(encoded)
+        self._logger.debug("Encoded %d bytes of audio as %s to %d bytes " +
+                           "(%d bytes saved) in %.3fs", self.raw_bytes,
+                           self.encoding, self.encoded_bytes,
+                           self.bytes_saved, self.encode_time)
+        return encoded
+
+    @property
+    def bytes_saved(self):
+        return self.raw_bytes - self.encoded_bytes
+
+    @abstractmethod
+    def _write(self, data):
+        pass
+
+    def _close(self):
+        return ''
+
+
+class AbstractEncoder(object):
+    """
+    Generic parent class for all encoders
+    """
+    __metaclass__ = ABCMeta
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    @abstractmethod
+    def open(self, rate=16000, width=2):
+        """
+        Returns:
+            A new EncoderStream for audio with the given format
+        """
+        pass
+
+    def encode(self, data, rate=16000, width=2):
+        """
+        Encodes a complete clip of raw mono PCM audio.
+
+        Returns:
+            An (encoded data, EncoderStream) tuple, the stream holds the
+            statistics
+        """
+        stream = self.open(rate, width)
+        encoded = stream.write(data) + stream.close()
+        return encoded, stream
+
+
+class PCMEncoder(AbstractEncoder):
+    """
+    Passes raw PCM through unchanged.
+    """
+
+    SLUG = 'pcm'
+
+    class Stream(EncoderStream):
+        def _write(self, data):
+            return str(data)
+
+    def open(self, rate=16000, width=2):
+        return self.Stream(self.SLUG, rate, width)
+
+
+class ULawEncoder(AbstractEncoder):
+    """
+    Encodes 16 bit PCM as 8 bit G.711 µ-law. This halves the size and is
+    near-lossless for speech.
+    """
+
+    SLUG = 'ulaw'
+
+    class Stream(EncoderStream):
+        def _write(self, data):
+            return audioop.lin2ulaw(str(data), self.width)
+
+    def open(self, rate=16000, width=2):
+        return self.Stream(self.SLUG, rate, width)
+
+
+class FlacEncoder(AbstractEncoder):
+    """
+    Encodes PCM losslessly as FLAC using the flac command line encoder.
+    Speech usually shrinks to about half its size.
+    """
+
+    SLUG = 'flac'
+
+    class Stream(EncoderStream):
+        def __init__(self, encoding, rate, width):
+            super(FlacEncoder.Stream, self).__init__(encoding, rate, width)
+            cmd = ['flac', '--silent', '--stdout',
+                   '--force-raw-format', '--endian=little', '--sign=signed',
+                   '--channels=1', '--bps=%d' % (width * 8),
+                   '--sample-rate=%d' % rate, '-']
+            self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE)
+            self._output = []
+            self._lock = threading.Lock()
+            # Read the encoded data on a separate thread, so that flac never
+            # blocks on a full pipe
+            self._reader = threading.Thread(target=self._read,
+                                            name='FlacEncoder')
+            self._reader.daemon = True
+            self._reader.start()
+
+        def _read(self):
+            for chunk in iter(lambda: self._process.stdout.read(4096), ''):
+                with self._lock:
+                    self._output.append(chunk)
+
+        def _pop_output(self):
+            with self._lock:
+                output = ''.join(self._output)
+                self._output = []
+            return output
+
+        def _write(self, data):
+            self._process.stdin.write(str(data))
+            self._process.stdin.flush()
+            return self._pop_output()
+
+        def _close(self):
+            self._process.stdin.close()
+            self._reader.join()
+            if self._process.wait() != 0:
+                raise IOError("flac exited with code %d" %
+                              self._process.returncode)
+            return self._pop_output()
+
+    @classmethod
+    def is_available(cls):
+        return diagnose.check_executable('flac')
+
+    def open(self, rate=16000, width=2):
+        return self.Stream(self.SLUG, rate, width)
+
+
+def get_encoder(slug):
+    """
+    Returns:
+        An encoder instance for the slug
+
+    Raises:
+        ValueError if there is no (available) encoder for this slug
+    """
+    for encoder in (PCMEncoder, ULawEncoder, FlacEncoder):
+        if encoder.SLUG == slug:
+            if not encoder.is_available():
+                raise ValueError("Encoder '%s' is not available" % slug)
+            return encoder()
+    raise ValueError("No encoder found for slug '%s'" % slug)
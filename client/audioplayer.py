@@ -0,0 +1,432 @@
+# -*- coding: utf-8-*-
+"""
+In-process audio playback for the Mic class.
+
+Spawning `aplay` for every clip means forking a process and opening the
+sound card each time, which adds a noticeable lag between the wake word and
+the beep. An AudioPlayer instead keeps one PyAudio output stream open and
+plays queued clips on a dedicated thread. Clips are converted to the
+stream's format in memory, and clips that are played often (the beeps) can
+be preloaded, so that playback starts right away. Audio that is still being
+synthesized can be played through a StreamPlayback while it arrives.
+"""
+import wave
+import Queue
+import struct
+import audioop
+import logging
+import threading
+import collections
+
+# Raw audio in memory
+Clip = collections.namedtuple('Clip', ['data', 'rate', 'width', 'channels'])
+
+
+def load_wav(filename):
+    """
+    Returns:
+        The contents of a WAV file as a Clip
+    """
+    wav = wave.open(filename, 'rb')
+    try:
+        return Clip(wav.readframes(wav.getnframes()), wav.getframerate(),
+                    wav.getsampwidth(), wav.getnchannels())
+    finally:
+        wav.close()
+
+
+def parse_wav_header(data):
+    """
+    Parses the header of a WAV file that is still being read.
+
+    Arguments:
+        data -- the beginning of the WAV file
+
+    Returns:
+        A (rate, width, channels, offset of the audio data) tuple, or None
+        if data doesn't contain the whole header yet
+
+    Raises:
+        ValueError if data isn't a WAV file
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != 'RIFF' or data[8:12] != 'WAVE':
+        raise ValueError("Not a WAV file")
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        if chunk_id == 'data':
+            if fmt is None:
+                raise ValueError("WAV file has no fmt chunk")
+            return fmt + (pos + 8,)
+        if pos + 8 + size > len(data):
+            return None
+        if chunk_id == 'fmt ':
+            channels, rate = struct.unpack('<HI', data[pos + 10:pos + 16])
+            bits = struct.unpack('<H', data[pos + 22:pos + 24])[0]
+            fmt = (rate, bits // 8, channels)
+        # Chunks are padded to an even size
+        pos += 8 + size + (size & 1)
+    return None
+
+
+class Converter(object):
+    """
+    Converts audio to another sample rate, sample width and number of
+    channels (only mono and stereo are supported). Audio can be converted
+    in chunks, the state is kept between them.
+    """
+
+    def __init__(self, rate, width, channels, to_rate, to_width,
+                 to_channels):
+        if channels not in (1, 2) or to_channels not in (1, 2):
+            raise ValueError("Can't convert %d channels to %d" %
+                             (channels, to_channels))
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.to_rate = to_rate
+        self.to_width = to_width
+        self.to_channels = to_channels
+        self._state = None
+        self._pending = ''
+
+    def convert(self, data):
+        """
+        Returns:
+            The converted audio. Incomplete frames at the end are kept until
+            the next chunk.
+        """
+        data = self._pending + data
+        frame_size = self.width * self.channels
+        end = len(data) - len(data) % frame_size
+        data, self._pending = data[:end], data[end:]
+        if self.width != self.to_width:
+            data = audioop.lin2lin(data, self.width, self.to_width)
+        if self.channels == 2 and self.to_channels == 1:
+            data = audioop.tomono(data, self.to_width, 0.5, 0.5)
+        if self.rate != self.to_rate:
+            data, self._state = audioop.ratecv(
+                data, self.to_width, min(self.channels, self.to_channels),
+                self.rate, self.to_rate, self._state)
+        if self.channels == 1 and self.to_channels == 2:
+            data = audioop.tostereo(data, self.to_width, 1, 1)
+        return data
+
+
+def convert(clip, rate, width, channels):
+    """
+    Converts a clip to another sample rate, sample width and number of
+    channels (only mono and stereo are supported).
+
+    Returns:
+        The converted Clip
+    """
+    converter = Converter(clip.rate, clip.width, clip.channels, rate, width,
+                          channels)
+    return Clip(converter.convert(clip.data), rate, width, channels)
+
+
+class Playback(object):
+    """
+    A queued clip. Use wait() to block until it has been played.
+    """
+
+    def __init__(self, clip):
+        self.clip = clip
+        self.cancelled = False
+        # Set by the AudioPlayer when the clip is queued
+        self.generation = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits until the clip has been played (or cancelled).
+
+        Returns:
+            True if playback is done
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def cancel(self):
+        """
+        Stops the clip (or skips it, if it hasn't started yet).
+        """
+        self.cancelled = True
+
+    def blocks(self, size):
+        """
+        Yields the audio in blocks of (at most) size bytes.
+        """
+        data = self.clip.data
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+
+class StreamPlayback(Playback):
+    """
+    A queued clip that is still being written. Playback starts with the
+    first chunk, call close() after the last one.
+    """
+
+    def __init__(self, converter):
+        super(StreamPlayback, self).__init__(None)
+        self._converter = converter
+        self._chunks = Queue.Queue()
+
+    def write(self, data):
+        """
+        Adds a chunk of raw audio (in the format passed to open_stream()).
+        """
+        if not self.cancelled:
+            self._chunks.put(self._converter.convert(data))
+
+    def close(self):
+        """
+        Marks the end of the audio.
+        """
+        self._chunks.put(None)
+
+    def blocks(self, size):
+        buffered = ''
+        while not self.cancelled:
+            try:
+                chunk = self._chunks.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+            if chunk is None:
+                break
+            buffered += chunk
+            while len(buffered) >= size:
+                yield buffered[:size]
+                buffered = buffered[size:]
+        if buffered and not self.cancelled:
+            yield buffered
+
+
+class AudioPlayer(object):
+    """
+    Wraps a single, persistent PyAudio output stream. Clips are queued and
+    played in order by a dedicated thread.
+    """
+
+    def __init__(self, audio, rate=44100, width=2, channels=2, chunk=1024,
+                 device=None):
+        """
+        Arguments:
+            audio -- a pyaudio.PyAudio instance
+            rate -- (optional) the sample rate of the stream in Hz (Default:
+                    44100)
+            width -- (optional) the sample width in bytes (Default: 2)
+            channels -- (optional) the number of channels (Default: 2)
+            chunk -- (optional) the number of frames per write, playback can
+                     be cancelled between writes (Default: 1024)
+            device -- (optional) the output device: its PyAudio index or (a
+                      part of) its name (Default: the default output device)
+        """
+        self._logger = logging.getLogger(__name__)
+        self._audio = audio
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.chunk = chunk
+        self.device = device
+        self._stream = None
+        self._thread = None
+        self._queue = Queue.Queue()
+        self._current = None
+        # Incremented by cancel_all(). A clip that was queued before is
+        # skipped, even if the playback thread already took it off the queue.
+        self._generation = 0
+        self._cancel_lock = threading.Lock()
+        # filename -> Clip in the stream's format
+        self._clips = {}
+        self._lock = threading.Lock()
+
+    def _get_device_index(self):
+        if self.device is None:
+            return None
+        try:
+            return int(self.device)
+        except ValueError:
+            pass
+        for i in range(self._audio.get_device_count()):
+            info = self._audio.get_device_info_by_index(i)
+            if (info.get('maxOutputChannels') and
+                    self.device in info.get('name', '')):
+                return i
+        self._logger.warning("Output device '%s' not found, using the " +
+                             "default device", self.device)
+        return None
+
+    def open(self):
+        """
+        Opens the output stream and starts the playback thread, unless it is
+        already running.
+        """
+        with self._lock:
+            if self._stream is not None:
+                return
+            self._logger.debug("Opening playback stream (rate: %d Hz, " +
+                               "channels: %d)", self.rate, self.channels)
+            self._stream = self._audio.open(
+                format=self._audio.get_format_from_width(self.width),
+                channels=self.channels,
+                rate=self.rate,
+                output=True,
+                output_device_index=self._get_device_index(),
+                frames_per_buffer=self.chunk,
+                start=False)
+            self._thread = threading.Thread(target=self._play,
+                                            name='AudioPlayer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def close(self):
+        """
+        Stops the playback thread after the queued clips and closes the
+        output stream.
+        """
+        with self._lock:
+            if self._stream is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._stream.close()
+            self._stream = None
+
+    def load(self, filename):
+        """
+        Returns:
+            The WAV file as a Clip in the stream's format. Preloaded files
+            are returned from memory.
+        """
+        clip = self._clips.get(filename)
+        if clip is None:
+            clip = convert(load_wav(filename), self.rate, self.width,
+                           self.channels)
+        return clip
+
+    def preload(self, filename):
+        """
+        Keeps a WAV file in memory, so that playing it doesn't need any disk
+        access or conversion.
+        """
+        self._clips[filename] = self.load(filename)
+
+    def play(self, filename, block=True):
+        """
+        Queues a WAV file for playback.
+
+        Arguments:
+            filename -- the WAV file
+            block -- (optional) wait until the file has been played
+
+        Returns:
+            The Playback
+        """
+        return self.play_clip(self.load(filename), block)
+
+    def play_clip(self, clip, block=True):
+        """
+        Queues a Clip for playback.
+
+        Arguments:
+            clip -- the Clip, it's converted to the stream's format
+            block -- (optional) wait until the clip has been played
+
+        Returns:
+            The Playback
+        """
+        if (clip.rate, clip.width, clip.channels) != (self.rate, self.width,
+                                                      self.channels):
+            clip = convert(clip, self.rate, self.width, self.channels)
+        return self._enqueue(Playback(clip), block)
+
+    def open_stream(self, rate, width, channels):
+        """
+        Queues audio that is still being produced (e.g. synthesized). It
+        starts playing as soon as its turn comes and the first chunk has
+        been written.
+
+        Arguments:
+            rate -- the sample rate of the audio in Hz
+            width -- the sample width in bytes
+            channels -- the number of channels
+
+        Returns:
+            A StreamPlayback to write the audio to
+        """
+        return self._enqueue(StreamPlayback(Converter(
+            rate, width, channels, self.rate, self.width, self.channels)),
+            block=False)
+
+    def cancel_all(self):
+        """
+        Stops the clip that is playing and drops all queued clips.
+        """
+        with self._cancel_lock:
+            self._generation += 1
+            current = self._current
+        if current is not None:
+            current.cancel()
+        while True:
+            try:
+                playback = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            if playback is None:
+                # Don't swallow close()'s stop signal
+                self._queue.put(None)
+                break
+            playback.cancel()
+            playback._done.set()
+
+    def _enqueue(self, playback, block):
+        self.open()
+        with self._cancel_lock:
+            playback.generation = self._generation
+            self._queue.put(playback)
+        if block:
+            playback.wait()
+        return playback
+
+    def _play(self):
+        frame_size = self.width * self.channels
+        block_size = self.chunk * frame_size
+        while True:
+            playback = self._queue.get()
+            if playback is None:
+                break
+            with self._cancel_lock:
+                if playback.generation != self._generation:
+                    playback.cancel()
+                else:
+                    self._current = playback
+            try:
+                for block in playback.blocks(block_size):
+                    if playback.cancelled:
+                        break
+                    if self._stream.is_stopped():
+                        self._stream.start_stream()
+                    self._stream.write(block)
+            except IOError:
+                self._logger.error("Writing to playback stream failed",
+                                   exc_info=True)
+            finally:
+                with self._cancel_lock:
+                    self._current = None
+                playback._done.set()
+            # Stop the stream while there's nothing to play, so that the
+            # sound card doesn't underrun
+            if self._queue.empty() and not self._stream.is_stopped():
+                self._stream.stop_stream()
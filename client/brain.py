@@ -6,6 +6,12 @@ import jasperpath
 
 class Brain(object):
 
+    # Hypotheses below this confidence are ignored
+    MIN_CONFIDENCE = 0.1
+    # If the best hypothesis is at least this confident, the alternatives
+    # aren't considered
+    HIGH_CONFIDENCE = 0.8
+
     def __init__(self, mic, profile):
         """
         Instantiates a new Brain object, which cross-references user
@@ -56,14 +62,52 @@ class Brain(object):
                      else 0, reverse=True)
         return modules
 
+    def get_candidates(self, texts):
+        """
+        Picks the texts that are worth passing to the modules. If the texts
+        are a transcription with confidence scores, empty and unlikely
+        hypotheses are dropped, and only the best one is kept if the engine
+        is sure about it.
+
+        Arguments:
+        texts -- a list of texts or an stt.Transcription
+
+        Returns:
+            A list of texts, best first ([''] if every hypothesis was
+            dropped)
+        """
+        hypotheses = getattr(texts, 'hypotheses', None)
+        if not hypotheses:
+            return texts
+        candidates = []
+        for hypothesis in hypotheses:
+            if not hypothesis.text:
+                continue
+            if hypothesis.confidence is None:
+                candidates.append(hypothesis.text)
+            elif hypothesis.confidence >= self.MIN_CONFIDENCE:
+                candidates.append(hypothesis.text)
+                if (hypothesis is hypotheses[0] and
+                        hypothesis.confidence >= self.HIGH_CONFIDENCE):
+                    break
+            else:
+                self._logger.debug("Ignoring unlikely hypothesis '%s' " +
+                                   "(confidence: %.3f)", hypothesis.text,
+                                   hypothesis.confidence)
+        if not candidates:
+            # Nothing usable was heard, let the Unclear module ask again
+            return ['']
+        return candidates
+
     def query(self, texts):
         """
         Passes user input to the appropriate module, testing it against
         each candidate module's isValid function.
 
         Arguments:
-        text -- user input, typically speech, to be parsed by a module
+        texts -- user input, typically speech, to be parsed by a module
         """
+        texts = self.get_candidates(texts)
         for module in self.modules:
             for text in texts:
                 if module.isValid(text):
@@ -6,6 +6,10 @@ import socket
 import subprocess
 import pkgutil
 import logging
+import inspect
+import functools
+import threading
+import multiprocessing.pool
 import pip.req
 import jasperpath
 if sys.version_info < (3, 3):
@@ -15,7 +19,71 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# Seconds that the results of checks are cached
+CACHE_TTL = 300
+# The network can come and go, so its state is cached for a shorter time
+NETWORK_CACHE_TTL = 60
 
+# key -> (result, expiry time)
+_cache = {}
+# key -> threading.Event that is set when a running check finishes
+_pending = {}
+_cache_lock = threading.Lock()
+
+
+def _cached_call(key, ttl, func, *args, **kwargs):
+    """
+    Returns the cached result for key, or calls func and caches its result
+    for ttl seconds. If another thread is already running the same check,
+    this waits for its result instead of running the check again.
+    """
+    while True:
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is not None and time.time() < entry[1]:
+                return entry[0]
+            pending = _pending.get(key)
+            if pending is None:
+                pending = _pending[key] = threading.Event()
+                break
+        pending.wait()
+    try:
+        result = func(*args, **kwargs)
+        with _cache_lock:
+            _cache[key] = (result, time.time() + ttl)
+    finally:
+        with _cache_lock:
+            del _pending[key]
+        pending.set()
+    return result
+
+
+def cached(ttl):
+    """
+    Decorator that caches the results of a check function for ttl seconds,
+    per combination of arguments.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Normalize the arguments, so that f() and f(default) share a
+            # cache entry
+            callargs = inspect.getcallargs(func, *args, **kwargs)
+            key = (func.__name__, tuple(sorted(callargs.items())))
+            return _cached_call(key, ttl, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def clear_cache():
+    """
+    Forgets all cached check results.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+@cached(NETWORK_CACHE_TTL)
 def check_network_connection(server="www.google.com"):
     """
     Checks if jasper can connect a network server.
@@ -44,6 +112,31 @@ def check_network_connection(server="www.google.com"):
         return True
 
 
+def check_network_connection_async(server="www.google.com",
+                                   callback=None):
+    """
+    Starts checking the network connection in the background, so that the
+    result is cached by the time it's needed.
+
+    Arguments:
+        server -- (optional) the server to connect with (Default:
+                  "www.google.com")
+        callback -- (optional) a callable that is called with the result
+
+    Returns:
+        The thread running the check
+    """
+    def check():
+        connected = check_network_connection(server)
+        if callback is not None:
+            callback(connected)
+    thread = threading.Thread(target=check, name='NetworkCheck')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+@cached(CACHE_TTL)
 def check_executable(executable):
     """
     Checks if an executable exists in $PATH.
@@ -66,6 +159,7 @@ def check_executable(executable):
     return found
 
 
+@cached(CACHE_TTL)
 def check_python_import(package_or_module):
     """
     Checks if a python package or module is importable.
@@ -89,6 +183,43 @@ def check_python_import(package_or_module):
     return found
 
 
+def check_engine(engine):
+    """
+    Checks if an STT or TTS engine is available. The result is cached, so
+    that probes that spawn processes or need the network only run once.
+
+    Arguments:
+        engine -- the engine class
+
+    Returns:
+        True or False
+    """
+    return _cached_call(('check_engine', engine), CACHE_TTL,
+                        engine.is_available)
+
+
+def check_engines(engines):
+    """
+    Checks if several STT or TTS engines are available. The engines are
+    probed in parallel, so the slow checks don't add up.
+
+    Arguments:
+        engines -- a list of engine classes
+
+    Returns:
+        A dict that maps each engine class to True or False
+    """
+    engines = list(set(engines))
+    if len(engines) < 2:
+        return dict((engine, check_engine(engine)) for engine in engines)
+    pool = multiprocessing.pool.ThreadPool(len(engines))
+    try:
+        results = pool.map(check_engine, engines)
+    finally:
+        pool.close()
+    return dict(zip(engines, results))
+
+
 def get_pip_requirements(fname=os.path.join(jasperpath.LIB_PATH,
                                             'requirements.txt')):
     """
@@ -5,10 +5,10 @@ import subprocess
 import tempfile
 import logging
 
-import yaml
 
 import diagnose
 import jasperpath
+import jasperprofile
 
 
 class PhonetisaurusG2P(object):
@@ -65,22 +65,11 @@ class PhonetisaurusG2P(object):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as pull request
-        # jasperproject/jasper-client#128 has been merged
-
         conf = {'fst_model': os.path.join(jasperpath.APP_PATH, os.pardir,
                                           'phonetisaurus', 'g014b2b.fst')}
         # Try to get fst_model from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'pocketsphinx' in profile:
-                    if 'fst_model' in profile['pocketsphinx']:
-                        conf['fst_model'] = \
-                            profile['pocketsphinx']['fst_model']
-                    if 'nbest' in profile['pocketsphinx']:
-                        conf['nbest'] = int(profile['pocketsphinx']['nbest'])
+        conf.update(jasperprofile.get_profile().section(
+            'pocketsphinx', 'fst_model', 'nbest'))
         return conf
 
     def __new__(cls, fst_model=None, *args, **kwargs):
@@ -0,0 +1,272 @@
+# -*- coding: utf-8-*-
+"""
+HTTP transport for the cloud STT engines.
+
+A Transport keeps a requests.Session with a connection pool, so that
+connections (and their TLS sessions) are kept alive between utterances.
+Every request gets a connect and a read timeout, failed requests are retried
+a bounded number of times with exponential backoff and full jitter, and the
+latency of every request is recorded in a histogram.
+
+A StreamingUpload sends a request body in chunks while it's still being
+recorded.
+"""
+import time
+import Queue
+import random
+import bisect
+import socket
+import httplib
+import logging
+import threading
+import requests
+import requests.adapters
+
+
+class LatencyHistogram(object):
+    """
+    Counts request latencies in fixed buckets.
+    """
+
+    # Upper bounds of the buckets in seconds, the last bucket is unbounded
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def add(self, seconds):
+        """
+        Records a latency.
+        """
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+
+    def percentile(self, percent):
+        """
+        Returns:
+            The upper bound of the bucket that contains the given percentile
+            (None if it's in the unbounded bucket or nothing was recorded)
+        """
+        count = self.count
+        if not count:
+            return None
+        rank = percent / 100.0 * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return None
+
+    def format(self):
+        labels = ['<=%gs' % bound for bound in self.buckets]
+        labels.append('>%gs' % self.buckets[-1])
+        return ', '.join('%s: %d' % (label, count) for label, count
+                         in zip(labels, self.counts) if count)
+
+
+class Transport(object):
+    """
+    Sends HTTP requests for one engine through a pooled keep-alive session.
+    """
+
+    # Status codes that are worth retrying
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+    def __init__(self, name, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.25, max_backoff=2.0, pool_size=2):
+        """
+        Arguments:
+            name -- a name for log messages (e.g. the engine's slug)
+            connect_timeout -- (optional) seconds to wait for a connection
+            read_timeout -- (optional) seconds to wait for the server between
+                            bytes of the response
+            retries -- (optional) how often a failed request is retried
+            backoff -- (optional) the base delay before retrying in seconds
+            max_backoff -- (optional) the maximum delay before retrying
+            pool_size -- (optional) the number of kept-alive connections per
+                         host
+        """
+        self._logger = logging.getLogger(__name__)
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.latency = LatencyHistogram()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def _get_delay(self, attempt):
+        # Exponential backoff with full jitter, so that clients that failed
+        # at the same time don't retry at the same time
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        Sends a request, retrying on connection errors, timeouts and server
+        errors. Request bodies that can only be read once (e.g. generators)
+        must not be retried (retries=0).
+
+        Arguments:
+            method -- the HTTP method
+            url -- the URL
+            retries -- (optional) overrides the number of retries
+            kwargs -- passed on to requests.Session.request()
+
+        Returns:
+            A requests.Response (possibly with an error status)
+
+        Raises:
+            requests.exceptions.RequestException if the last attempt failed
+        """
+        if retries is None:
+            retries = self.retries
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                error = e
+                r = None
+            duration = time.time() - start
+            self.latency.add(duration)
+            if r is not None:
+                self._logger.debug("%s %s request: status %d in %.3fs",
+                                   self.name, method, r.status_code, duration)
+                if (r.status_code not in self.RETRY_STATUS_CODES or
+                        attempt >= retries):
+                    return r
+            else:
+                self._logger.warning("%s %s request failed after %.3fs: %s",
+                                     self.name, method, duration, error)
+                if attempt >= retries:
+                    raise error
+            delay = self._get_delay(attempt)
+            attempt += 1
+            self._logger.info("Retrying %s request in %.2fs (%d/%d)",
+                              self.name, delay, attempt, retries)
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def format_stats(self):
+        """
+        Returns:
+            A summary of the recorded latencies
+        """
+        median = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return "%d requests, mean %.3fs, p50 %s, p95 %s (%s)" % (
+            self.latency.count, self.latency.mean,
+            '<=%gs' % median if median else 'n/a',
+            '<=%gs' % p95 if p95 else 'n/a',
+            self.latency.format())
+
+
+class StreamingUpload(object):
+    """
+    Uploads a request body while it's still being produced. Chunks are
+    handed to a background thread that sends them with chunked transfer
+    encoding, so the upload overlaps with recording.
+    """
+
+    def __init__(self, transport, url, headers=None):
+        """
+        Arguments:
+            transport -- the Transport to send the request with
+            url -- the URL to POST to
+            headers -- (optional) a dict of request headers
+        """
+        self._logger = logging.getLogger(__name__)
+        self.transport = transport
+        self.bytes_sent = 0
+        self._queue = Queue.Queue()
+        self._response = None
+        self._error = None
+        # The body is a generator and can only be sent once
+        self._thread = threading.Thread(target=self._upload,
+                                        args=(url, headers),
+                                        name='StreamingUpload')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _body(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def _upload(self, url, headers):
+        try:
+            self._response = self.transport.post(url, data=self._body(),
+                                                 headers=headers, retries=0)
+        except requests.exceptions.RequestException as e:
+            # The body might not have been read to the end. The queue is
+            # unbounded, so write() doesn't block anyway.
+            self._error = e
+        except (httplib.HTTPException, socket.error) as e:
+            # requests doesn't wrap the errors of chunked uploads
+            self._error = requests.exceptions.ConnectionError(e)
+
+    def write(self, data):
+        """
+        Queues a chunk of the request body for sending.
+        """
+        if data and self._error is None:
+            self._queue.put(str(data))
+
+    def finish(self):
+        """
+        Ends the request body and waits for the response.
+
+        Returns:
+            A requests.Response
+
+        Raises:
+            requests.exceptions.RequestException if the request failed or
+            didn't finish within the transport's timeouts
+        """
+        self._queue.put(None)
+        # requests doesn't apply the read timeout to the response of a
+        # chunked upload, so it's enforced here
+        self._thread.join(self.transport.connect_timeout +
+                          self.transport.read_timeout + 1)
+        if self._thread.is_alive():
+            raise requests.exceptions.Timeout(
+                "%s streaming request didn't finish in time" %
+                self.transport.name)
+        if self._error is not None:
+            raise self._error
+        return self._response
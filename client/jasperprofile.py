@@ -0,0 +1,194 @@
+# -*- coding: utf-8-*-
+"""
+The parsed user profile (profile.yml).
+
+The profile is parsed once and shared by Jasper, all engines and all modules.
+It is only parsed again if the file's modification time changed. Sections
+(e.g. 'pocketsphinx' or 'espeak-tts') are checked against SCHEMA, so that
+engines get values of the expected types.
+"""
+import os
+import logging
+import threading
+import yaml
+
+import jasperpath
+
+# Expected types of the values in each profile section. Keys that are not
+# listed here are passed through unchanged.
+SCHEMA = {
+    'keys': {'GOOGLE_SPEECH': str},
+    'pocketsphinx': {'hmm_dir': str,
+                     'keyphrase': str,
+                     'keyphrase_threshold': float,
+                     'fst_model': str,
+                     'nbest': int},
+    'julius': {'hmmdefs': str,
+               'tiedlist': str,
+               'lexicon': str,
+               'lexicon_archive_member': str},
+    'google-stt': {'connect_timeout': float,
+                   'read_timeout': float,
+                   'retries': int,
+                   'streaming': bool,
+                   'encoding': str},
+    'att-stt': {'app_key': str,
+                'app_secret': str,
+                'connect_timeout': float,
+                'read_timeout': float,
+                'retries': int,
+                'streaming': bool,
+                'encoding': str},
+    'hedged-stt': {'engines': list,
+                   'deadlines': list,
+                   'threshold': float},
+    'witai-stt': {'access_token': str,
+                  'connect_timeout': float,
+                  'read_timeout': float,
+                  'retries': int,
+                  'streaming': bool,
+                  'encoding': str},
+    'playback': {'device': str,
+                 'aplay_device': str},
+    'tts-cache': {'enabled': bool,
+                  'max_size_mb': float},
+    'espeak-tts': {'voice': str,
+                   'pitch_adjustment': int,
+                   'words_per_minute': int},
+    'flite-tts': {'voice': str},
+    'pico-tts': {'language': str},
+    'google-tts': {'language': str},
+    'mary-tts': {'server': str,
+                 'port': int,
+                 'language': str,
+                 'voice': str},
+    'ivona-tts': {'access_key': str,
+                  'secret_key': str,
+                  'region': str,
+                  'voice': str,
+                  'speech_rate': str,
+                  'sentence_break': int}
+}
+
+
+class Profile(object):
+    """
+    A profile file that is parsed lazily and re-parsed whenever it changes
+    on disk.
+    """
+
+    def __init__(self, path, schema=SCHEMA):
+        """
+        Arguments:
+            path -- the path of the profile file
+            schema -- (optional) a dict of section names to dicts of key
+                      names and types
+        """
+        self._logger = logging.getLogger(__name__)
+        self.path = path
+        self.schema = schema
+        # number of times the file has been parsed
+        self.loads = 0
+        self._mtime = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @property
+    def data(self):
+        """
+        Returns:
+            The whole profile as a dict (empty if the file doesn't exist)
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            mtime = None
+        else:
+            # The size catches changes within the mtime resolution
+            mtime = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            if mtime != self._mtime:
+                self._data = self._load() if mtime is not None else {}
+                self._mtime = mtime
+            return self._data
+
+    def _load(self):
+        self._logger.debug("Reading profile: '%s'", self.path)
+        with open(self.path, 'r') as f:
+            data = yaml.safe_load(f)
+        self.loads += 1
+        if data is None:
+            return {}
+        if not isinstance(data, dict):
+            self._logger.error("Profile '%s' is not a mapping, ignoring it",
+                               self.path)
+            return {}
+        return data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def section(self, name, *keys):
+        """
+        Returns a section of the profile with its values converted to the
+        types in the schema. Values that can't be converted are logged and
+        left out.
+
+        Arguments:
+            name -- the section name (e.g. 'pocketsphinx')
+            keys -- (optional) only return these keys
+
+        Returns:
+            A dict (empty if the section doesn't exist)
+        """
+        section = self.get(name)
+        if not isinstance(section, dict):
+            if section is not None:
+                self._logger.warning("Profile section '%s' is not a " +
+                                     "mapping, ignoring it", name)
+            return {}
+        types = self.schema.get(name, {})
+        result = {}
+        for key, value in section.items():
+            if keys and key not in keys:
+                continue
+            if key in types and value is not None:
+                if types[key] is str and isinstance(value, basestring):
+                    result[key] = value
+                    continue
+                try:
+                    value = types[key](value)
+                except (TypeError, ValueError):
+                    self._logger.warning("Invalid value %r for '%s' in " +
+                                         "profile section '%s', expected %s",
+                                         value, key, name,
+                                         types[key].__name__)
+                    continue
+            result[key] = value
+        return result
+
+
+_profile = None
+_profile_lock = threading.Lock()
+
+
+def get_profile():
+    """
+    Returns:
+        The shared Profile instance for the user's profile.yml
+    """
+    global _profile
+    with _profile_lock:
+        if _profile is None:
+            _profile = Profile(jasperpath.config('profile.yml'))
+        return _profile
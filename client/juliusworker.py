@@ -0,0 +1,272 @@
+# -*- coding: utf-8-*-
+"""
+A long-running Julius recognizer process.
+
+Loading the acoustic model and grammar takes Julius much longer than
+recognizing a short command, so instead of spawning `julius` per utterance,
+a JuliusWorker keeps one process running in module mode (results are sent
+over a TCP socket) with adinnet input (audio is streamed over a second TCP
+socket). If the process dies, it's restarted on the next utterance.
+"""
+import re
+import time
+import Queue
+import socket
+import struct
+import logging
+import threading
+import subprocess
+
+# Words that mark the start and end of a sentence in Jasper's grammars
+SILENCE_WORDS = ('<s>', '</s>')
+
+SHYPO_PATTERN = re.compile(r'<SHYPO\b[^>]*>(.*?)</SHYPO>', re.DOTALL)
+WHYPO_PATTERN = re.compile(r'<WHYPO\b[^>]*>')
+ATTRIBUTE_PATTERN = re.compile(r'\b([A-Z]+)="([^"]*)"')
+
+
+def parse_message(message):
+    """
+    Parses a message sent by Julius in module mode.
+
+    Arguments:
+        message -- the message text, without the terminating '.' line
+
+    Returns:
+        A list of (sentence, confidence) tuples (best first) if the message
+        contains a recognition result, an empty list if recognition failed
+        or the input was rejected, or None for all other messages. The
+        confidence is the mean of the word confidence measures (CM), or None
+        if Julius didn't output them.
+    """
+    if '<RECOGOUT>' in message:
+        sentences = []
+        for shypo in SHYPO_PATTERN.findall(message):
+            words = []
+            scores = []
+            for whypo in WHYPO_PATTERN.findall(shypo):
+                attributes = dict(ATTRIBUTE_PATTERN.findall(whypo))
+                word = attributes.get('WORD')
+                if word is None or word in SILENCE_WORDS:
+                    continue
+                words.append(word)
+                if 'CM' in attributes:
+                    try:
+                        scores.append(float(attributes['CM']))
+                    except ValueError:
+                        pass
+            if words:
+                confidence = (sum(scores) / len(scores)
+                              if len(scores) == len(words) else None)
+                sentences.append((' '.join(words), confidence))
+        return sentences
+    elif '<RECOGFAIL' in message or '<REJECTED' in message:
+        return []
+    return None
+
+
+def log_output(logger, line):
+    """
+    Logs a line of Julius' log output with a matching log level.
+    """
+    line = line.strip()
+    if len(line) > 7 and line[:7].upper() == 'ERROR: ':
+        if not line[7:].startswith('adin_'):
+            logger.error(line[7:])
+    elif len(line) > 9 and line[:9].upper() == 'WARNING: ':
+        logger.warning(line[9:])
+    elif len(line) > 6 and line[:6].upper() == 'STAT: ':
+        logger.debug(line[6:])
+
+
+def get_free_port():
+    """
+    Returns:
+        A TCP port on localhost that is currently unused
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+class JuliusWorker(object):
+    """
+    Manages a Julius process in module/adinnet mode.
+    """
+
+    def __init__(self, args, executable='julius', host='127.0.0.1',
+                 startup_timeout=30, result_timeout=10):
+        """
+        Arguments:
+            args -- Julius arguments for the models (e.g. -dfa, -v, -h, ...)
+            executable -- (optional) the Julius executable
+            host -- (optional) the host Julius listens on
+            startup_timeout -- (optional) seconds to wait for Julius to
+                               accept connections
+            result_timeout -- (optional) seconds to wait for a result after
+                              the end of an utterance
+        """
+        self._logger = logging.getLogger(__name__)
+        self.args = [str(x) for x in args]
+        self.executable = executable
+        self.host = host
+        self.startup_timeout = startup_timeout
+        self.result_timeout = result_timeout
+        # number of times the process has been (re)started
+        self.starts = 0
+        self._process = None
+        self._module_sock = None
+        self._adin_sock = None
+        self._results = Queue.Queue()
+        self._lock = threading.RLock()
+
+    @property
+    def is_running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """
+        Starts Julius (unless it's already running) and connects to it.
+        """
+        with self._lock:
+            if self.is_running:
+                return
+            self.stop()
+            module_port = get_free_port()
+            adin_port = get_free_port()
+            cmd = [self.executable] + self.args + [
+                '-input', 'adinnet',
+                '-adport', str(adin_port),
+                '-module', str(module_port),
+                '-nocutsilence']
+            self._logger.debug('Executing: %r', cmd)
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT)
+            self.starts += 1
+            self._results = Queue.Queue()
+            thread = threading.Thread(target=self._read_log,
+                                      args=(self._process.stdout,),
+                                      name='JuliusLog')
+            thread.daemon = True
+            thread.start()
+            try:
+                # Julius waits for the module client before it opens the
+                # adinnet port
+                self._module_sock = self._connect(module_port)
+                thread = threading.Thread(target=self._read_module,
+                                          args=(self._module_sock,
+                                                self._results),
+                                          name='JuliusModule')
+                thread.daemon = True
+                thread.start()
+                self._adin_sock = self._connect(adin_port)
+            except Exception:
+                self.stop()
+                raise
+
+    def stop(self):
+        """
+        Disconnects from Julius and terminates the process.
+        """
+        with self._lock:
+            for sock in (self._adin_sock, self._module_sock):
+                if sock is not None:
+                    try:
+                        sock.close()
+                    except socket.error:
+                        pass
+            self._adin_sock = None
+            self._module_sock = None
+            if self._process is not None:
+                if self._process.poll() is None:
+                    self._process.terminate()
+                    self._process.wait()
+                self._process = None
+
+    def _connect(self, port):
+        deadline = time.time() + self.startup_timeout
+        while True:
+            if not self.is_running:
+                raise RuntimeError("Julius exited during startup")
+            try:
+                return socket.create_connection((self.host, port), timeout=1)
+            except socket.error:
+                if time.time() > deadline:
+                    raise RuntimeError("Julius didn't start listening on " +
+                                       "port %d" % port)
+                time.sleep(0.1)
+
+    def _read_log(self, stream):
+        for line in iter(stream.readline, ''):
+            log_output(self._logger, line)
+
+    def _read_module(self, sock, results):
+        sock.settimeout(None)
+        lines = []
+        try:
+            for line in sock.makefile('r'):
+                if line.strip() != '.':
+                    lines.append(line)
+                    continue
+                result = parse_message(''.join(lines))
+                lines = []
+                if result is not None:
+                    results.put(result)
+        except socket.error:
+            pass
+        # Wake up a waiting utterance
+        results.put(None)
+
+    def send(self, data):
+        """
+        Streams a chunk of raw 16 bit mono PCM audio to Julius.
+        """
+        if data:
+            self._adin_sock.sendall(struct.pack('<i', len(data)) + data)
+
+    def end_segment(self):
+        """
+        Marks the end of an utterance and waits for its result.
+
+        Returns:
+            A list of (sentence, confidence) tuples, see parse_message()
+
+        Raises:
+            RuntimeError if Julius died or didn't answer in time
+        """
+        self._adin_sock.sendall(struct.pack('<i', 0))
+        try:
+            result = self._results.get(timeout=self.result_timeout)
+        except Queue.Empty:
+            result = None
+        if result is None:
+            raise RuntimeError("Julius didn't return a result")
+        return result
+
+    def recognize(self, data):
+        """
+        Transcribes a complete utterance. If Julius isn't running (any more),
+        it is (re)started first. If it dies during recognition, the
+        utterance is retried once with a fresh process.
+
+        Arguments:
+            data -- raw 16 bit mono PCM audio
+
+        Returns:
+            A list of (sentence, confidence) tuples, see parse_message()
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    self.start()
+                    self.send(data)
+                    return self.end_segment()
+                except (socket.error, RuntimeError):
+                    if attempt:
+                        raise
+                    self._logger.warning("Julius failed, restarting it",
+                                         exc_info=True)
+                    self.stop()
@@ -4,6 +4,7 @@ A drop-in replacement for the Mic class that allows for all I/O to occur
 over the terminal. Useful for debugging. Unlike with the typical Mic
 implementation, Jasper is always active listening with local_mic.
 """
+import speechqueue
 
 
 class Mic:
@@ -30,3 +31,7 @@ class Mic:
 
     def say(self, phrase, OPTIONS=None):
         print("JASPER: %s" % phrase)
+
+    def say_async(self, phrase):
+        self.say(phrase)
+        return speechqueue.said(phrase)
@@ -3,12 +3,14 @@
     The Mic class handles all interactions with the microphone and speaker.
 """
 import logging
-import tempfile
-import wave
-import audioop
+import time
 import pyaudio
-import alteration
 import jasperpath
+import jasperprofile
+from audiocapture import AudioCapture
+from audioplayer import AudioPlayer
+import speechqueue
+import vad
 
 
 class Mic:
@@ -16,7 +18,23 @@ class Mic:
     speechRec = None
     speechRec_persona = None
 
-    def __init__(self, speaker, passive_stt_engine, active_stt_engine):
+    # seconds of already captured audio prepended to each active listen
+    PREROLL_TIME = 0.5
+
+    # keyphrase spotting only decodes audio around disturbances: this much
+    # audio before a disturbance and after the last one
+    KEYPHRASE_PREROLL_TIME = 0.3
+    KEYPHRASE_HANGOVER_TIME = 1
+
+    # end and restart the keyphrase spotting utterance after this many
+    # seconds of decoded audio, once it has become quiet
+    KEYPHRASE_UTTERANCE_TIME = 60
+
+    BEEP_HI = jasperpath.data('audio', 'beep_hi.wav')
+    BEEP_LO = jasperpath.data('audio', 'beep_lo.wav')
+
+    def __init__(self, speaker, passive_stt_engine, active_stt_engine,
+                 capture=None, speech=None):
         """
         Initiates the pocketsphinx instance.
 
@@ -25,112 +43,78 @@ class Mic:
         passive_stt_engine -- performs STT while Jasper is in passive listen
                               mode
         acive_stt_engine -- performs STT while Jasper is in active listen mode
+        capture -- (optional) an AudioCapture instance to share with another
+                   Mic instance (Default: a new one is created)
+        speech -- (optional) a SpeechQueue to share with another Mic
+                  instance, so that they don't talk over each other
+                  (Default: a new one is created)
         """
         self._logger = logging.getLogger(__name__)
         self.speaker = speaker
         self.passive_stt_engine = passive_stt_engine
         self.active_stt_engine = active_stt_engine
-        self._logger.info("Initializing PyAudio. ALSA/Jack error messages " +
-                          "that pop up during this process are normal and " +
-                          "can usually be safely ignored.")
-        self._audio = pyaudio.PyAudio()
-        self._logger.info("Initialization of PyAudio completed.")
+        self._audio = None
+        self.player = None
+        if capture is None:
+            self._logger.info("Initializing PyAudio. ALSA/Jack error " +
+                              "messages that pop up during this process " +
+                              "are normal and can usually be safely " +
+                              "ignored.")
+            self._audio = pyaudio.PyAudio()
+            self._logger.info("Initialization of PyAudio completed.")
+            capture = AudioCapture(self._audio)
+            # Play through the same PyAudio instance instead of spawning
+            # aplay, the beeps are kept in memory
+            config = jasperprofile.get_profile().section('playback',
+                                                         'device')
+            self.player = AudioPlayer(self._audio,
+                                      device=config.get('device'))
+            for beep in (self.BEEP_HI, self.BEEP_LO):
+                self.player.preload(beep)
+            self.player.open()
+            self.speaker.player = self.player
+        self.capture = capture
+        # phrases are said in order on a separate thread, see say_async()
+        if speech is None:
+            speech = speechqueue.for_speaker(self.speaker)
+        self.speech = speech
+        self._spotting_time = None
 
     def __del__(self):
-        self._audio.terminate()
+        # Only tear down the capture stream if this instance created it
+        if self._audio is not None:
+            self.capture.close()
+            self.player.close()
+            self._audio.terminate()
 
     def getScore(self, data):
-        rms = audioop.rms(data, 2)
-        score = rms / 3
-        return score
+        return vad.score(data, self.capture.width)
 
     def fetchThreshold(self):
-
-        # TODO: Consolidate variables from the next three functions
-        THRESHOLD_MULTIPLIER = 1.8
-        RATE = 16000
-        CHUNK = 1024
-
-        # number of seconds to allow to establish threshold
-        THRESHOLD_TIME = 1
-
-        # prepare recording stream
-        stream = self._audio.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=RATE,
-                                  input=True,
-                                  frames_per_buffer=CHUNK)
-
-        # stores the audio data
-        frames = []
-
-        # stores the lastN score values
-        lastN = [i for i in range(20)]
-
-        # calculate the long run average, and thereby the proper threshold
-        for i in range(0, RATE / CHUNK * THRESHOLD_TIME):
-
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-            # save this data point as a score
-            lastN.pop(0)
-            lastN.append(self.getScore(data))
-            average = sum(lastN) / len(lastN)
-
-        stream.stop_stream()
-        stream.close()
-
-        # this will be the benchmark to cause a disturbance over!
-        THRESHOLD = average * THRESHOLD_MULTIPLIER
-
-        return THRESHOLD
+        """
+        Returns the current disturbance threshold. The noise floor is
+        tracked continuously by the capture, so this returns immediately.
+        """
+        return self.capture.get_threshold()
 
     def passiveListen(self, PERSONA):
         """
         Listens for PERSONA in everyday sound. Times out after LISTEN_TIME, so
         needs to be restarted.
         """
+        if getattr(self.passive_stt_engine, 'keyphrase', None):
+            return self._spotKeyphrase(PERSONA)
 
-        THRESHOLD_MULTIPLIER = 1.8
-        RATE = 16000
-        CHUNK = 1024
-
-        # number of seconds to allow to establish threshold
-        THRESHOLD_TIME = 1
+        RATE = self.capture.rate
+        CHUNK = self.capture.chunk
 
         # number of seconds to listen before forcing restart
         LISTEN_TIME = 10
 
-        # prepare recording stream
-        stream = self._audio.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=RATE,
-                                  input=True,
-                                  frames_per_buffer=CHUNK)
-
-        # stores the audio data
-        frames = []
-
-        # stores the lastN score values
-        lastN = [i for i in range(30)]
-
-        # calculate the long run average, and thereby the proper threshold
-        for i in range(0, RATE / CHUNK * THRESHOLD_TIME):
-
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-            # save this data point as a score
-            lastN.pop(0)
-            lastN.append(self.getScore(data))
-            average = sum(lastN) / len(lastN)
-
-        # this will be the benchmark to cause a disturbance over!
-        THRESHOLD = average * THRESHOLD_MULTIPLIER
-
-        # save some memory for sound data
-        frames = []
+        # start with live audio
+        self.capture.flush()
+        THRESHOLD = self.fetchThreshold()
+        detector = vad.VoiceActivityDetector(width=self.capture.width)
 
         # flag raised when sound disturbance detected
         didDetect = False
@@ -138,51 +122,108 @@ class Mic:
         # start passively listening for disturbance above threshold
         for i in range(0, RATE / CHUNK * LISTEN_TIME):
 
-            data = stream.read(CHUNK)
-            frames.append(data)
-            score = self.getScore(data)
+            data = self.capture.read()
 
-            if score > THRESHOLD:
+            if detector.is_speech(detector.score(data), THRESHOLD):
                 didDetect = True
                 break
 
+            # follow the noise floor, it's updated with every chunk
+            THRESHOLD = self.capture.noise_floor.threshold
+
         # no use continuing if no flag raised
         if not didDetect:
             print "No disturbance detected"
-            stream.stop_stream()
-            stream.close()
             return (None, None)
 
-        # cutoff any recording before this disturbance was detected
-        frames = frames[-20:]
+        # keep the 20 chunks before this disturbance was detected
+        start = self.capture.position - 20 * CHUNK * self.capture.width
 
         # otherwise, let's keep recording for few seconds and save the file
         DELAY_MULTIPLIER = 1
         for i in range(0, RATE / CHUNK * DELAY_MULTIPLIER):
+            self.capture.read()
 
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        # save the audio data
-        stream.stop_stream()
-        stream.close()
-
-        with tempfile.NamedTemporaryFile(mode='w+b') as f:
-            wav_fp = wave.open(f, 'wb')
-            wav_fp.setnchannels(1)
-            wav_fp.setsampwidth(pyaudio.get_sample_size(pyaudio.paInt16))
-            wav_fp.setframerate(RATE)
-            wav_fp.writeframes(''.join(frames))
-            wav_fp.close()
-            f.seek(0)
-            # check if PERSONA was said
-            transcribed = self.passive_stt_engine.transcribe(f)
+        # check if PERSONA was said
+        transcribed = self.passive_stt_engine.transcribe_pcm(
+            self.capture.ringbuffer.read(start, self.capture.position - start),
+            RATE, self.capture.width)
 
         if any(PERSONA in phrase for phrase in transcribed):
+            self._keywordHeard()
             return (THRESHOLD, PERSONA)
 
         return (False, transcribed)
 
+    def _spotKeyphrase(self, PERSONA):
+        """
+        Listens for PERSONA with an engine that spots keyphrases in a
+        continuous audio stream. The utterance stays open across calls, so
+        a keyphrase that is said while the LISTEN_TIME runs out isn't lost.
+        To keep the CPU usage low, only the audio around disturbances is
+        decoded.
+        """
+        engine = self.passive_stt_engine
+        RATE = self.capture.rate
+        CHUNK = self.capture.chunk
+        chunk_time = float(CHUNK) / RATE
+
+        # number of seconds to listen before returning
+        LISTEN_TIME = 10
+
+        if self._spotting_time is None:
+            self.capture.flush()
+            engine.start_utterance(RATE, self.capture.width)
+            self._spotting_time = 0.0
+
+        THRESHOLD = self.fetchThreshold()
+        hangover = 0
+        decoding_time = 0.0
+        transcribed = []
+
+        for i in range(0, RATE / CHUNK * LISTEN_TIME):
+            data = self.capture.read()
+
+            if self.getScore(data) > THRESHOLD:
+                if not hangover:
+                    # decode some audio before the disturbance, too
+                    data = self.capture.preroll(self.KEYPHRASE_PREROLL_TIME)
+                hangover = int(self.KEYPHRASE_HANGOVER_TIME / chunk_time)
+            elif hangover:
+                hangover -= 1
+            else:
+                THRESHOLD = self.capture.noise_floor.threshold
+                if self._spotting_time > self.KEYPHRASE_UTTERANCE_TIME:
+                    engine.finish_utterance()
+                    engine.start_utterance(RATE, self.capture.width)
+                    self._spotting_time = 0.0
+                continue
+
+            started = time.time()
+            engine.feed_utterance(data)
+            transcribed = engine.get_partial_transcription()
+            decoding_time += time.time() - started
+            self._spotting_time += float(len(data)) / \
+                (self.capture.width * RATE)
+
+            if any(PERSONA in phrase for phrase in transcribed):
+                break
+
+        self._logger.debug("Keyphrase spotting used %.1f%% of the listen " +
+                           "time", 100 * decoding_time / LISTEN_TIME)
+
+        if not any(PERSONA in phrase for phrase in transcribed):
+            return (None, None)
+
+        engine.finish_utterance()
+        self._spotting_time = None
+        self._keywordHeard()
+        return (THRESHOLD, PERSONA)
+
+    def _keywordHeard(self):
+        # The user wants to say something, so stop talking (barge-in)
+        self.speech.cancel_all()
+
     def activeListen(self, THRESHOLD=None, LISTEN=True, MUSIC=False):
         """
             Records until a second of silence or times out after 12 seconds
@@ -202,61 +243,57 @@ class Mic:
             Returns a list of the matching options or None
         """
 
-        RATE = 16000
-        CHUNK = 1024
+        RATE = self.capture.rate
+        CHUNK = self.capture.chunk
         LISTEN_TIME = 12
 
         # check if no threshold provided
         if THRESHOLD is None:
             THRESHOLD = self.fetchThreshold()
 
-        self.speaker.play(jasperpath.data('audio', 'beep_hi.wav'))
+        self.speaker.play(self.BEEP_HI)
 
-        # prepare recording stream
-        stream = self._audio.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=RATE,
-                                  input=True,
-                                  frames_per_buffer=CHUNK)
+        # start with the audio captured right before (and during) the beep,
+        # so that nothing the user already said gets lost. Every chunk is
+        # passed to the STT engine right away, so that it can decode while
+        # we are still recording.
+        self.capture.flush()
+        self.active_stt_engine.start_utterance(RATE, self.capture.width)
+        self.active_stt_engine.feed_utterance(
+            self.capture.preroll(self.PREROLL_TIME))
 
-        frames = []
-        # increasing the range # results in longer pause after command
+        # increasing the window size results in longer pause after command
         # generation
-        lastN = [THRESHOLD * 1.2 for i in range(30)]
+        detector = vad.VoiceActivityDetector(width=self.capture.width)
+        detector.reset(THRESHOLD * 1.2)
 
         for i in range(0, RATE / CHUNK * LISTEN_TIME):
 
-            data = stream.read(CHUNK)
-            frames.append(data)
-            score = self.getScore(data)
+            data = self.capture.read()
+            self.active_stt_engine.feed_utterance(data)
+            detector.update(data)
 
-            lastN.pop(0)
-            lastN.append(score)
-
-            average = sum(lastN) / float(len(lastN))
-
-            # TODO: 0.8 should not be a MAGIC NUMBER!
-            if average < THRESHOLD * 0.8:
+            if detector.has_ended(THRESHOLD):
                 break
 
-        self.speaker.play(jasperpath.data('audio', 'beep_lo.wav'))
-
-        # save the audio data
-        stream.stop_stream()
-        stream.close()
+        self.speaker.play(self.BEEP_LO)
 
-        with tempfile.SpooledTemporaryFile(mode='w+b') as f:
-            wav_fp = wave.open(f, 'wb')
-            wav_fp.setnchannels(1)
-            wav_fp.setsampwidth(pyaudio.get_sample_size(pyaudio.paInt16))
-            wav_fp.setframerate(RATE)
-            wav_fp.writeframes(''.join(frames))
-            wav_fp.close()
-            f.seek(0)
-            return self.active_stt_engine.transcribe(f)
+        return self.active_stt_engine.finish_utterance()
 
     def say(self, phrase,
             OPTIONS=" -vdefault+m3 -p 40 -s 160 --stdout > say.wav"):
-        # alter phrase before speaking
-        phrase = alteration.clean(phrase)
-        self.speaker.say(phrase)
+        """
+        Says a phrase after the phrases that are already queued and waits
+        until it has been said.
+        """
+        self.say_async(phrase).wait()
+
+    def say_async(self, phrase):
+        """
+        Queues a phrase and returns right away, e.g. to fetch data while
+        "Let me check" is being said.
+
+        Returns:
+            A speechqueue.Speech handle to wait for or cancel the phrase
+        """
+        return self.speech.put(phrase)
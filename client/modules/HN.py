@@ -54,7 +54,8 @@ def handle(text, mic, profile):
         profile -- contains information related to the user (e.g., phone
                    number)
     """
-    mic.say("Pulling up some stories.")
+    # Fetch the stories while this is being said
+    mic.say_async("Pulling up some stories.")
     stories = getTopStories(maxResults=3)
     all_titles = '... '.join(str(idx + 1) + ") " +
                              story.title for idx, story in enumerate(stories))
@@ -73,7 +74,7 @@ def handle(text, mic, profile):
         send_all = not chosen_articles and app_utils.isPositive(text)
 
         if send_all or chosen_articles:
-            mic.say("Sure, just give me a moment")
+            mic.say_async("Sure, just give me a moment")
 
             if profile['prefers_email']:
                 body = "<ul>"
@@ -79,7 +79,9 @@ class MusicMode(object):
 
         self.mic = Mic(mic.speaker,
                        mic.passive_stt_engine,
-                       music_stt_engine)
+                       music_stt_engine,
+                       capture=mic.capture,
+                       speech=mic.speech)
 
     def delegateInput(self, input):
 
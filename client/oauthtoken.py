@@ -0,0 +1,191 @@
+# -*- coding: utf-8-*-
+"""
+OAuth access tokens that survive restarts.
+
+A TokenManager stores tokens with their expiry time in a JSON file in the
+config dir and refreshes them on a background timer shortly before they
+expire. All engine instances that use the same credentials share one
+manager, so an utterance never has to wait for a token to be fetched.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import jasperpath
+
+
+class TokenManager(object):
+    """
+    Keeps the access token for one set of credentials fresh.
+    """
+
+    def __init__(self, name, client_id, fetch, path=None, margin=300,
+                 default_lifetime=86400, retry_delay=30):
+        """
+        Arguments:
+            name -- a name for the tokens (e.g. the engine's slug)
+            client_id -- the client id the token belongs to
+            fetch -- a callable that fetches a new token and returns an
+                     (access token, expires_in) tuple
+            path -- (optional) the token file (Default:
+                    <config dir>/oauth-tokens.json)
+            margin -- (optional) refresh tokens this many seconds before
+                      they expire
+            default_lifetime -- (optional) the lifetime in seconds of tokens
+                                without expires_in
+            retry_delay -- (optional) seconds to wait before retrying a
+                           failed refresh
+        """
+        self._logger = logging.getLogger(__name__)
+        self.name = name
+        self.fetch = fetch
+        self.path = path if path else jasperpath.config('oauth-tokens.json')
+        self.margin = margin
+        self.default_lifetime = default_lifetime
+        self.retry_delay = retry_delay
+        # number of tokens fetched
+        self.fetches = 0
+        # Don't write the client id itself to disk
+        self.key = '%s:%s' % (name, hashlib.sha1(client_id).hexdigest())
+        # (access token, expiry time) in one attribute, so that it can be
+        # read without the lock
+        self._entry = (None, 0)
+        self._timer = None
+        self._lock = threading.RLock()
+        self._load()
+        if self._is_fresh():
+            self._logger.debug("Using cached %s token, it expires in %ds",
+                               self.name, self.expires_at - time.time())
+            self._schedule(self.expires_at - self.margin - time.time())
+        else:
+            self._schedule(0)
+
+    @property
+    def token(self):
+        """
+        Returns:
+            A valid access token. It's only fetched right away if the
+            background refresh hasn't managed to get one.
+        """
+        token, expires_at = self._entry
+        if token is not None and time.time() < expires_at:
+            return token
+        with self._lock:
+            token, expires_at = self._entry
+            if token is None or time.time() >= expires_at:
+                self._refresh(raise_errors=True)
+            return self._entry[0]
+
+    @property
+    def expires_at(self):
+        return self._entry[1]
+
+    def invalidate(self, token):
+        """
+        Drops a token that the server rejected and fetches a new one.
+        """
+        with self._lock:
+            if token == self._entry[0]:
+                self._logger.warning("%s token was rejected, refreshing it",
+                                     self.name)
+                self._entry = (None, 0)
+                self._refresh()
+
+    def cancel(self):
+        """
+        Stops the background refresh.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _is_fresh(self):
+        token, expires_at = self._entry
+        return token is not None and time.time() < expires_at - self.margin
+
+    def _schedule(self, delay):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(max(0, delay), self._refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh(self, raise_errors=False):
+        with self._lock:
+            try:
+                token, expires_in = self.fetch()
+            except Exception:
+                self._logger.warning("Refreshing %s token failed, retrying " +
+                                     "in %ds", self.name, self.retry_delay,
+                                     exc_info=True)
+                self._schedule(self.retry_delay)
+                if raise_errors:
+                    raise
+                return
+            self.fetches += 1
+            if not expires_in:
+                expires_in = self.default_lifetime
+            self._entry = (token, time.time() + expires_in)
+            self._logger.debug("Fetched new %s token, it expires in %ds",
+                               self.name, expires_in)
+            self._save()
+            self._schedule(max(expires_in - self.margin, expires_in / 2.0))
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                tokens = json.load(f)
+            entry = tokens[self.key]
+            self._entry = (entry['access_token'], float(entry['expires_at']))
+        except (IOError, ValueError, KeyError, TypeError):
+            self._entry = (None, 0)
+
+    def _save(self):
+        try:
+            with open(self.path, 'r') as f:
+                tokens = json.load(f)
+            if not isinstance(tokens, dict):
+                tokens = {}
+        except (IOError, ValueError):
+            tokens = {}
+        token, expires_at = self._entry
+        tokens[self.key] = {'access_token': token,
+                            'expires_at': expires_at}
+        tmp_path = self.path + '.tmp'
+        try:
+            # Tokens are credentials, so only the user may read them
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            self._logger.warning("Unable to save %s token to '%s'",
+                                 self.name, self.path, exc_info=True)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(name, client_id, fetch, **kwargs):
+    """
+    Returns the shared TokenManager for a set of credentials, creating it
+    if necessary.
+
+    Arguments:
+        name -- a name for the tokens (e.g. the engine's slug)
+        client_id -- the client id the token belongs to
+        fetch -- see TokenManager
+        kwargs -- passed on to TokenManager
+    """
+    with _managers_lock:
+        key = (name, client_id)
+        if key not in _managers:
+            _managers[key] = TokenManager(name, client_id, fetch, **kwargs)
+        return _managers[key]
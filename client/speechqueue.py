@@ -0,0 +1,187 @@
+# -*- coding: utf-8-*-
+"""
+Asynchronous speech output.
+
+Saying a phrase takes seconds, and a module that says "Pulling up the news"
+shouldn't have to wait for that before it starts fetching the news. A
+SpeechQueue says queued phrases in order on a dedicated thread. Every
+queued phrase gets a Speech handle that can be waited for or cancelled, so
+callers decide themselves when they need the speech to be finished.
+"""
+import logging
+import threading
+import collections
+
+import alteration
+
+
+class Speech(object):
+    """
+    A queued phrase. Use wait() to block until it has been said.
+    """
+
+    def __init__(self, phrase, on_cancel=None):
+        """
+        Arguments:
+            phrase -- the phrase
+            on_cancel -- (optional) called with this Speech when it's
+                         cancelled
+        """
+        self.phrase = phrase
+        self.cancelled = False
+        self._on_cancel = on_cancel
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits until the phrase has been said (or cancelled).
+
+        Returns:
+            True if the speech is done
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def cancel(self):
+        """
+        Stops the phrase if it's being said, or drops it if it hasn't
+        started yet.
+        """
+        if self.cancelled or self.done:
+            return
+        self.cancelled = True
+        if self._on_cancel is not None:
+            self._on_cancel(self)
+
+    def _finish(self):
+        self._done.set()
+
+
+def said(phrase):
+    """
+    Returns:
+        A Speech handle for a phrase that has already been said (for Mic
+        implementations that speak synchronously)
+    """
+    speech = Speech(phrase)
+    speech._finish()
+    return speech
+
+
+def say_text(speaker, text, speech=None):
+    """
+    Says a text with a TTS engine: the text is cleaned up and said sentence
+    by sentence, so that the first sentence plays while the rest are being
+    synthesized.
+
+    Arguments:
+        speaker -- the TTS engine
+        text -- the text
+        speech -- (optional) the text's Speech handle, the remaining
+                  sentences are skipped when it's cancelled
+    """
+    speaker.say_all(alteration.splitSentences(alteration.clean(text)),
+                    is_cancelled=lambda: speech is not None and
+                    speech.cancelled)
+
+
+def for_speaker(speaker):
+    """
+    Returns:
+        A SpeechQueue that says phrases with a TTS engine (see say_text())
+    """
+    return SpeechQueue(lambda phrase, speech: say_text(speaker, phrase,
+                                                       speech),
+                       speaker.stop)
+
+
+class SpeechQueue(object):
+    """
+    Says queued phrases one after the other on a dedicated thread.
+    """
+
+    def __init__(self, say, stop=None):
+        """
+        Arguments:
+            say -- a callable that says a phrase. It's called with the
+                   phrase and its Speech handle and should stop early when
+                   the handle is cancelled.
+            stop -- (optional) a callable that interrupts the phrase that
+                    is currently being said
+        """
+        self._logger = logging.getLogger(__name__)
+        self._say = say
+        self._stop = stop
+        # Taking the next phrase and making it the current one happen under
+        # the same lock, so that cancel_all() can't miss a phrase in between
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._current = None
+        self._thread = None
+
+    def put(self, phrase):
+        """
+        Queues a phrase.
+
+        Returns:
+            The phrase's Speech handle
+        """
+        speech = Speech(phrase, on_cancel=self._cancel)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='SpeechQueue')
+                self._thread.daemon = True
+                self._thread.start()
+            self._queue.append(speech)
+            self._cond.notify()
+        return speech
+
+    def cancel_all(self):
+        """
+        Stops the current phrase and drops all queued ones (e.g. because
+        the user started talking).
+        """
+        with self._cond:
+            queued = list(self._queue)
+            self._queue.clear()
+            current = self._current
+        for speech in queued:
+            speech.cancelled = True
+            speech._finish()
+        if current is not None:
+            current.cancel()
+
+    def _cancel(self, speech):
+        with self._cond:
+            current = speech is self._current
+        if current and self._stop is not None:
+            self._logger.debug("Interrupting speech '%s'", speech.phrase)
+            self._stop()
+
+    def _next(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            speech = self._queue.popleft()
+            if not speech.cancelled:
+                self._current = speech
+            return speech
+
+    def _run(self):
+        while True:
+            speech = self._next()
+            try:
+                if speech is self._current:
+                    self._say(speech.phrase, speech)
+            except Exception:
+                self._logger.error("Saying '%s' failed", speech.phrase,
+                                   exc_info=True)
+            finally:
+                with self._cond:
+                    self._current = None
+                speech._finish()
@@ -4,17 +4,76 @@ import os
 import wave
 import json
 import tempfile
+import collections
 import logging
 import urllib
 import urlparse
-import re
-import subprocess
+import socket
+import threading
+import time
+import Queue
 from abc import ABCMeta, abstractmethod
 import requests
-import yaml
 import jasperpath
 import diagnose
+import jasperprofile
+import httptransport
+import audioencoder
+import oauthtoken
 import vocabcompiler
+import juliusworker
+
+
+# A transcription hypothesis: the text, its confidence between 0 and 1 (None
+# if the engine doesn't provide one), the engine's slug and the seconds from
+# the end of the audio to the result
+Hypothesis = collections.namedtuple('Hypothesis',
+                                    ['text', 'confidence', 'engine', 'timing'])
+
+
+class Transcription(list):
+    """
+    The result of a transcription. It's a list of the transcribed texts (best
+    first), so it can be used like a plain list of strings. The hypotheses
+    attribute holds a Hypothesis for each text.
+    """
+
+    def __init__(self, hypotheses=()):
+        """
+        Arguments:
+            hypotheses -- an iterable of Hypothesis tuples, best first
+        """
+        self.hypotheses = list(hypotheses)
+        super(Transcription, self).__init__(hypothesis.text for hypothesis
+                                            in self.hypotheses)
+
+    @classmethod
+    def from_texts(cls, texts, engine, timing, confidences=None):
+        """
+        Creates a Transcription from a list of texts and (optionally) a list
+        of their confidences.
+        """
+        if confidences is None:
+            confidences = [None] * len(texts)
+        return cls(Hypothesis(text, confidence, engine, timing)
+                   for text, confidence in zip(texts, confidences))
+
+
+def get_confidence(transcription):
+    """
+    Returns:
+        The confidence of the best hypothesis of a transcription. If the
+        engine doesn't provide confidences, any non-empty text counts as
+        fully confident.
+    """
+    hypotheses = getattr(transcription, 'hypotheses', None)
+    if hypotheses and hypotheses[0].confidence is not None:
+        return hypotheses[0].confidence
+    return 1.0 if any(transcription) else 0.0
+
+
+# Half a second of silence at 16 kHz, decoded by local engines to warm up
+WARM_UP_SILENCE = '\x00\x00' * 8000
 
 
 class AbstractSTTEngine(object):
@@ -30,8 +89,9 @@ class AbstractSTTEngine(object):
         return {}
 
     @classmethod
-    def get_instance(cls, vocabulary_name, phrases):
+    def get_instance(cls, vocabulary_name, phrases, **kwargs):
         config = cls.get_config()
+        config.update(kwargs)
         if cls.VOCABULARY_TYPE:
             vocabulary = cls.VOCABULARY_TYPE(vocabulary_name,
                                              path=jasperpath.config(
@@ -61,17 +121,260 @@ class AbstractSTTEngine(object):
     def transcribe(self, fp):
         pass
 
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        """
+        Transcribes raw mono PCM audio that is already in memory.
+
+        Engines that need a container format don't have to override this:
+        the data is wrapped into a WAV file and passed to transcribe().
+        Engines that work on raw audio should override it to avoid that
+        copy.
+
+        Arguments:
+            data -- a str, bytearray or memoryview containing raw frames
+            rate -- (optional) the sample rate in Hz (Default: 16000)
+            width -- (optional) the sample width in bytes (Default: 2)
+
+        Returns:
+            The transcription, in the same format as transcribe()
+        """
+        with tempfile.SpooledTemporaryFile(mode='w+b') as f:
+            wav_fp = wave.open(f, 'wb')
+            wav_fp.setnchannels(1)
+            wav_fp.setsampwidth(width)
+            wav_fp.setframerate(rate)
+            wav_fp.writeframes(data)
+            wav_fp.close()
+            f.seek(0)
+            return self.transcribe(f)
+
+    def warm_up(self):
+        """
+        Prepares the engine for its first utterance, so that it isn't slower
+        than the following ones. Engines with a local decoder transcribe
+        some silence to load their models into memory, engines that send the
+        audio to a server don't need to do anything.
+        """
+        pass
+
+    def start_utterance(self, rate=16000, width=2):
+        """
+        Starts a streaming transcription. Audio is then passed in chunk by
+        chunk via feed_utterance() while it is being recorded and the result
+        is fetched with finish_utterance().
+
+        Engines that cannot decode incrementally just collect the chunks and
+        transcribe them at once when the utterance is finished.
+
+        Arguments:
+            rate -- (optional) the sample rate in Hz (Default: 16000)
+            width -- (optional) the sample width in bytes (Default: 2)
+        """
+        self._utterance_frames = []
+        self._utterance_rate = rate
+        self._utterance_width = width
+
+    def feed_utterance(self, data):
+        """
+        Passes a chunk of raw mono PCM audio to the current utterance.
+
+        Arguments:
+            data -- a str containing raw audio frames
+        """
+        self._utterance_frames.append(data)
+
+    def get_partial_transcription(self):
+        """
+        Returns:
+            A list of hypotheses for the audio fed so far (might be empty if
+            the engine can't decode incrementally)
+        """
+        return []
+
+    def finish_utterance(self):
+        """
+        Ends the current utterance.
+
+        Returns:
+            The transcription, in the same format as transcribe()
+        """
+        data = ''.join(self._utterance_frames)
+        self._utterance_frames = []
+        return self.transcribe_pcm(data, self._utterance_rate,
+                                   self._utterance_width)
+
+
+class AbstractStreamingSTTEngine(AbstractSTTEngine):
+    """
+    Generic parent class for cloud STT engines that upload audio while the
+    user is still speaking. The chunks passed to feed_utterance() are sent
+    with chunked transfer encoding, so that only the recognition itself is
+    left to wait for when the utterance ends. If the streaming request
+    fails, the buffered utterance is uploaded again as a whole.
+
+    Audio is compressed by an encoder before it's uploaded. ENCODINGS lists
+    the encodings the API accepts (in order of preference) with their
+    content types.
+    """
+    __metaclass__ = ABCMeta
+
+    ENCODINGS = (('pcm', 'audio/l16; rate=%(rate)d'),)
+
+    @abstractmethod
+    def get_streaming_request(self, rate, width):
+        """
+        Arguments:
+            rate -- the sample rate in Hz
+            width -- the sample width in bytes
+
+        Returns:
+            A (url, headers) tuple for uploading encoded audio of this
+            format, or None if the audio can't be streamed
+        """
+        pass
+
+    @abstractmethod
+    def parse_response(self, r, timing):
+        """
+        Arguments:
+            r -- a requests.Response
+            timing -- the seconds from the end of the audio to the response
+
+        Returns:
+            The Transcription contained in the response (an empty list if
+            the request failed)
+        """
+        pass
+
+    def _set_encoding(self, encoding=None):
+        """
+        Selects the encoder for uploads.
+
+        Arguments:
+            encoding -- (optional) an encoding slug from ENCODINGS (Default:
+                        the first available one)
+        """
+        encodings = [slug for slug, content_type in self.ENCODINGS]
+        if encoding is not None:
+            if encoding not in encodings:
+                raise ValueError("STT engine '%s' doesn't support the " %
+                                 self.SLUG + "encoding '%s'" % encoding)
+            encodings = [encoding]
+        for slug in encodings:
+            try:
+                self.encoder = audioencoder.get_encoder(slug)
+            except ValueError:
+                self._logger.debug("Encoding '%s' not available", slug)
+            else:
+                self._logger.debug("Using encoding '%s'", slug)
+                return
+        raise ValueError("None of the encodings of STT engine '%s' is " %
+                         self.SLUG + "available")
+
+    def get_content_type(self, rate, width):
+        content_type = dict(self.ENCODINGS)[self.encoder.SLUG]
+        return content_type % {'rate': rate, 'bits': width * 8}
+
+    def encode(self, data, rate=16000, width=2):
+        """
+        Encodes a complete utterance for upload.
+
+        Returns:
+            An (encoded data, content type) tuple
+        """
+        try:
+            encoded, stream = self.encoder.encode(data, rate, width)
+        except (IOError, OSError):
+            if self.encoder.SLUG == 'pcm' or 'pcm' not in dict(self.ENCODINGS):
+                raise
+            self._logger.warning("Encoding as '%s' failed, falling back " +
+                                 "to 'pcm'", self.encoder.SLUG,
+                                 exc_info=True)
+            self.encoder = audioencoder.get_encoder('pcm')
+            encoded, stream = self.encoder.encode(data, rate, width)
+        return encoded, self.get_content_type(rate, width)
+
+    def start_utterance(self, rate=16000, width=2):
+        super(AbstractStreamingSTTEngine, self).start_utterance(rate, width)
+        self._upload = None
+        if not self.streaming:
+            return
+        request = self.get_streaming_request(rate, width)
+        if request is None:
+            return
+        try:
+            self._encoder_stream = self.encoder.open(rate, width)
+        except OSError:
+            self._logger.warning("Unable to start encoder '%s'",
+                                 self.encoder.SLUG, exc_info=True)
+            return
+        url, headers = request
+        self._upload = httptransport.StreamingUpload(self._http, url, headers)
+
+    def feed_utterance(self, data):
+        super(AbstractStreamingSTTEngine, self).feed_utterance(data)
+        if self._upload is not None:
+            try:
+                self._upload.write(self._encoder_stream.write(data))
+            except (IOError, OSError):
+                self._logger.warning("Encoder '%s' failed",
+                                     self.encoder.SLUG, exc_info=True)
+                self._upload.finish()
+                self._upload = None
+
+    def finish_utterance(self):
+        upload = self._upload
+        self._upload = None
+        if upload is not None:
+            try:
+                upload.write(self._encoder_stream.close())
+            except (IOError, OSError):
+                self._logger.warning("Encoder '%s' failed",
+                                     self.encoder.SLUG, exc_info=True)
+                upload.finish()
+                upload = None
+        if upload is not None:
+            start = time.time()
+            try:
+                r = upload.finish()
+            except requests.exceptions.RequestException:
+                self._logger.warning('Streaming request failed, uploading ' +
+                                     'the whole utterance.', exc_info=True)
+            else:
+                # Authorization and server errors might go away when the
+                # utterance is sent again
+                if (r.status_code != requests.codes['unauthorized'] and
+                        r.status_code < 500):
+                    self._utterance_frames = []
+                    return self.parse_response(r, time.time() - start)
+                self._logger.warning('Streaming request failed with http ' +
+                                     'status %d, uploading the whole ' +
+                                     'utterance.', r.status_code)
+        return super(AbstractStreamingSTTEngine, self).finish_utterance()
+
 
 class PocketSphinxSTT(AbstractSTTEngine):
     """
     The default Speech-to-Text implementation which relies on PocketSphinx.
+
+    For passive listening, PocketSphinx can also spot a keyphrase in the
+    continuous audio stream instead of transcribing single recordings. To
+    enable it, set the keyphrase (and optionally the detection threshold) in
+    your profile.yml:
+
+        ...
+        stt_passive_engine: sphinx
+        pocketsphinx:
+            keyphrase: JASPER
+            keyphrase_threshold: 1e-20
     """
 
     SLUG = 'sphinx'
     VOCABULARY_TYPE = vocabcompiler.PocketsphinxVocabulary
 
     def __init__(self, vocabulary, hmm_dir="/usr/local/share/" +
-                 "pocketsphinx/model/hmm/en_US/hub4wsj_sc_8k"):
+                 "pocketsphinx/model/hmm/en_US/hub4wsj_sc_8k", nbest=5,
+                 keyphrase=None, keyphrase_threshold=1e-20):
 
         """
         Initiates the pocketsphinx instance.
@@ -79,19 +382,17 @@ class PocketSphinxSTT(AbstractSTTEngine):
         Arguments:
             vocabulary -- a PocketsphinxVocabulary instance
             hmm_dir -- the path of the Hidden Markov Model (HMM)
+            nbest -- (optional) the maximum number of hypotheses to return
+            keyphrase -- (optional) if set, the decoder only spots this
+                         phrase instead of decoding with the language model
+            keyphrase_threshold -- (optional) the detection threshold for
+                                   keyphrase spotting. Lower values detect
+                                   more, but also cause more false alarms.
         """
 
         self._logger = logging.getLogger(__name__)
-
-        # quirky bug where first import doesn't work
-        try:
-            import pocketsphinx as ps
-        except:
-            import pocketsphinx as ps
-
-        with tempfile.NamedTemporaryFile(prefix='psdecoder_',
-                                         suffix='.log', delete=False) as f:
-            self._logfile = f.name
+        self.keyphrase = keyphrase
+        self.nbest = nbest
 
         self._logger.debug("Initializing PocketSphinx Decoder with hmm_dir " +
                            "'%s'", hmm_dir)
@@ -122,29 +423,150 @@ class PocketSphinxSTT(AbstractSTTEngine):
                                  "hmm_dir in your profile.",
                                  hmm_dir, ', '.join(missing_hmm_files))
 
-        self._decoder = ps.Decoder(hmm=hmm_dir, logfn=self._logfile,
-                                   **vocabulary.decoder_kwargs)
+        # All instances with the same acoustic model share one decoder, each
+        # instance only adds a named search for its vocabulary
+        self._shared = self.SharedDecoder.get(hmm_dir,
+                                              vocabulary.dictionary_file)
+        self._shared.add_dictionary(vocabulary.dictionary_file)
+        if self.keyphrase:
+            self._logger.debug("Spotting keyphrase '%s' (threshold: %g)",
+                               self.keyphrase, keyphrase_threshold)
+            self._search = '%s-keyphrase' % vocabulary.name
+            self._shared.add_keyphrase_search(self._search, self.keyphrase,
+                                              keyphrase_threshold)
+        else:
+            self._search = vocabulary.name
+            self._shared.add_lm_search(self._search,
+                                       vocabulary.languagemodel_file)
+        self._decoder = self._shared.decoder
 
-    def __del__(self):
-        os.remove(self._logfile)
+    class SharedDecoder(object):
+        """
+        A PocketSphinx decoder that holds several named searches (language
+        models or keyphrases) for one acoustic model. Loading the acoustic
+        model is what takes most of the memory and initialization time, so
+        it's only done once per hmm_dir.
+        """
+
+        _instances = {}
+        _instances_lock = threading.Lock()
+
+        @classmethod
+        def get(cls, hmm_dir, dictionary_file):
+            """
+            Returns the shared decoder for hmm_dir, creating it if necessary.
+
+            Arguments:
+                hmm_dir -- the path of the Hidden Markov Model (HMM)
+                dictionary_file -- the dictionary to create the decoder with
+            """
+            hmm_dir = os.path.abspath(hmm_dir)
+            with cls._instances_lock:
+                if hmm_dir not in cls._instances:
+                    cls._instances[hmm_dir] = cls(hmm_dir, dictionary_file)
+                return cls._instances[hmm_dir]
+
+        def __init__(self, hmm_dir, dictionary_file):
+            self._logger = logging.getLogger(__name__)
+
+            # quirky bug where first import doesn't work
+            try:
+                import pocketsphinx as ps
+            except:
+                import pocketsphinx as ps
+
+            with tempfile.NamedTemporaryFile(prefix='psdecoder_',
+                                             suffix='.log',
+                                             delete=False) as f:
+                self.logfile = f.name
+
+            config = ps.Decoder.default_config()
+            config.set_string('-hmm', hmm_dir)
+            config.set_string('-dict', dictionary_file)
+            config.set_string('-logfn', self.logfile)
+            self.decoder = ps.Decoder(config)
+            # A semaphore rather than a lock: an utterance holds it from
+            # start_utterance() to finish_utterance(), which may be called
+            # on another thread (e.g. by HedgedSTT)
+            self.lock = threading.Semaphore(1)
+            self._dictionaries = set([dictionary_file])
+
+        def __del__(self):
+            os.remove(self.logfile)
+
+        def add_dictionary(self, dictionary_file):
+            """
+            Adds all words of a dictionary file that the decoder doesn't know
+            yet.
+            """
+            with self.lock:
+                if dictionary_file in self._dictionaries:
+                    return
+                with open(dictionary_file, 'r') as f:
+                    entries = [line.split(None, 1) for line in f
+                               if line.strip()]
+                entries = [(word, phones.strip()) for word, phones in entries
+                           if self.decoder.lookup_word(word) is None]
+                for i, (word, phones) in enumerate(entries, start=1):
+                    # Only rebuild the search structures after the last word
+                    self.decoder.add_word(word, phones, i == len(entries))
+                self._dictionaries.add(dictionary_file)
+
+        def add_lm_search(self, name, languagemodel_file):
+            """
+            Adds (or replaces) a named language model search.
+            """
+            with self.lock:
+                self.decoder.set_lm_file(name, languagemodel_file)
+
+        def add_keyphrase_search(self, name, keyphrase, threshold):
+            """
+            Adds (or replaces) a named keyphrase spotting search.
+            """
+            with tempfile.NamedTemporaryFile(prefix='kws_', suffix='.list',
+                                             delete=False) as f:
+                f.write('%s /%g/\n' % (keyphrase, threshold))
+                kws_file = f.name
+            try:
+                with self.lock:
+                    self.decoder.set_kws(name, kws_file)
+            finally:
+                os.remove(kws_file)
+
+        def use_search(self, name):
+            """
+            Switches to a named search. This is cheap, but only possible
+            between utterances.
+            """
+            if self.decoder.get_search() != name:
+                self.decoder.set_search(name)
+
+        def flush_log(self, logger):
+            """
+            Writes the decoder log to logger and clears it.
+            """
+            with open(self.logfile, 'r+') as f:
+                for line in f:
+                    logger.debug(line.strip())
+                f.truncate(0)
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                try:
-                    config['hmm_dir'] = profile['pocketsphinx']['hmm_dir']
-                except KeyError:
-                    pass
+        return jasperprofile.get_profile().section('pocketsphinx', 'hmm_dir')
 
-        return config
+    @classmethod
+    def get_passive_instance(cls):
+        # Keyphrase spotting is enabled by setting a keyphrase in the config
+        config = jasperprofile.get_profile().section(
+            'pocketsphinx', 'keyphrase', 'keyphrase_threshold')
+        if 'keyphrase' in config:
+            config['keyphrase'] = config['keyphrase'].upper()
+
+        phrases = vocabcompiler.get_keyword_phrases()
+        if 'keyphrase' in config:
+            # The keyphrase has to be in the dictionary
+            phrases = sorted(set(phrases + config['keyphrase'].split()))
+        return cls.get_instance('keyword', phrases, **config)
 
     def transcribe(self, fp):
         """
@@ -158,21 +580,91 @@ class PocketSphinxSTT(AbstractSTTEngine):
 
         # FIXME: Can't use the Decoder.decode_raw() here, because
         # pocketsphinx segfaults with tempfile.SpooledTemporaryFile()
-        data = fp.read()
-        self._decoder.start_utt()
-        self._decoder.process_raw(data, False, True)
-        self._decoder.end_utt()
-
-        result = self._decoder.get_hyp()
-        with open(self._logfile, 'r+') as f:
-            for line in f:
-                self._logger.debug(line.strip())
-            f.truncate()
-
-        transcribed = [result[0]]
-        self._logger.info('Transcribed: %r', transcribed)
+        return self.transcribe_pcm(fp.read())
+
+    def warm_up(self):
+        self.transcribe_pcm(WARM_UP_SILENCE)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        start = time.time()
+        self.start_utterance(rate, width)
+        try:
+            self._decoder.process_raw(data, False, True)
+        except Exception:
+            self._end_utterance(start)
+            raise
+        return self._end_utterance(start)
+
+    def start_utterance(self, rate=16000, width=2):
+        # The decoder is shared with the other engines for this acoustic
+        # model, so it's locked from the start of the utterance until it
+        # has been finished (released in _end_utterance())
+        self._shared.lock.acquire()
+        try:
+            self._shared.use_search(self._search)
+            self._decoder.start_utt()
+        except Exception:
+            self._shared.lock.release()
+            raise
+
+    def feed_utterance(self, data):
+        self._decoder.process_raw(data, False, False)
+
+    def get_partial_transcription(self):
+        hyp = self._decoder.hyp()
+        return [hyp.hypstr] if hyp and hyp.hypstr else []
+
+    def finish_utterance(self):
+        return self._end_utterance(time.time())
+
+    def _end_utterance(self, start):
+        try:
+            self._decoder.end_utt()
+            results = self._get_nbest()
+            self._shared.flush_log(self._logger)
+        finally:
+            self._shared.lock.release()
+
+        timing = time.time() - start
+        transcribed = Transcription(Hypothesis(text, confidence, self.SLUG,
+                                               timing)
+                                    for text, confidence in results)
+        self._logger.info('Transcribed: %r (confidences: %s)', transcribed,
+                          ', '.join('%.3f' % h.confidence
+                                    for h in transcribed.hypotheses))
         return transcribed
 
+    def _get_nbest(self):
+        """
+        Returns:
+            A list of (text, confidence) tuples for the last utterance, best
+            first
+        """
+        hyp = self._decoder.hyp()
+        if hyp is None or not hyp.hypstr:
+            return [('', 0.0)]
+        logmath = self._decoder.get_logmath()
+        # The posterior probability of the best path in the lattice
+        confidence = min(1.0, logmath.exp(hyp.prob))
+        results = [(hyp.hypstr, confidence)]
+        if self.nbest <= 1 or self.keyphrase:
+            return results
+        seen = set([hyp.hypstr])
+        try:
+            for i, alternative in enumerate(self._decoder.nbest()):
+                if len(results) >= self.nbest or i >= self.nbest * 4:
+                    break
+                text = alternative.hypstr
+                if not text or text in seen:
+                    continue
+                seen.add(text)
+                # Scale the best path's confidence by the score difference
+                results.append((text, confidence * min(1.0, logmath.exp(
+                    alternative.score - hyp.best_score))))
+        except (AttributeError, RuntimeError):
+            self._logger.debug("Unable to get n-best list", exc_info=True)
+        return results
+
     @classmethod
     def is_available(cls):
         return diagnose.check_python_import('pocketsphinx')
@@ -193,74 +685,98 @@ class JuliusSTT(AbstractSTTEngine):
         self._vocabulary = vocabulary
         self._hmmdefs = hmmdefs
         self._tiedlist = tiedlist
-        self._pattern = re.compile(r'sentence(\d+): <s> (.+) </s>')
-
-        # Inital test run: we run this command once to log errors/warnings
-        cmd = ['julius',
-               '-input', 'stdin',
-               '-dfa', self._vocabulary.dfa_file,
-               '-v', self._vocabulary.dict_file,
-               '-h', self._hmmdefs,
-               '-hlist', self._tiedlist,
-               '-forcedict']
-        cmd = [str(x) for x in cmd]
-        self._logger.debug('Executing: %r', cmd)
-        with tempfile.SpooledTemporaryFile() as out_f:
-            with tempfile.SpooledTemporaryFile() as f:
-                with tempfile.SpooledTemporaryFile() as err_f:
-                    subprocess.call(cmd, stdin=f, stdout=out_f, stderr=err_f)
-            out_f.seek(0)
-            for line in out_f.read().splitlines():
-                line = line.strip()
-                if len(line) > 7 and line[:7].upper() == 'ERROR: ':
-                    if not line[7:].startswith('adin_'):
-                        self._logger.error(line[7:])
-                elif len(line) > 9 and line[:9].upper() == 'WARNING: ':
-                    self._logger.warning(line[9:])
-                elif len(line) > 6 and line[:6].upper() == 'STAT: ':
-                    self._logger.debug(line[6:])
+
+        # Julius keeps running for the life of this instance, so the models
+        # are only loaded once
+        self._worker = juliusworker.JuliusWorker(
+            ['-dfa', self._vocabulary.dfa_file,
+             '-v', self._vocabulary.dict_file,
+             '-h', self._hmmdefs,
+             '-hlist', self._tiedlist,
+             '-forcedict'])
+        self._chunks = []
+        self._streaming = False
+        try:
+            self._worker.start()
+        except (OSError, RuntimeError):
+            self._logger.warning("Unable to start Julius, will retry on " +
+                                 "first use", exc_info=True)
+
+    def __del__(self):
+        self._worker.stop()
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'julius' in profile:
-                    if 'hmmdefs' in profile['julius']:
-                        config['hmmdefs'] = profile['julius']['hmmdefs']
-                    if 'tiedlist' in profile['julius']:
-                        config['tiedlist'] = profile['julius']['tiedlist']
-        return config
+        return jasperprofile.get_profile().section(
+            'julius', 'hmmdefs', 'tiedlist')
 
     def transcribe(self, fp, mode=None):
-        cmd = ['julius',
-               '-quiet',
-               '-nolog',
-               '-input', 'stdin',
-               '-dfa', self._vocabulary.dfa_file,
-               '-v', self._vocabulary.dict_file,
-               '-h', self._hmmdefs,
-               '-hlist', self._tiedlist,
-               '-forcedict']
-        cmd = [str(x) for x in cmd]
-        self._logger.debug('Executing: %r', cmd)
-        with tempfile.SpooledTemporaryFile() as out_f:
-            with tempfile.SpooledTemporaryFile() as err_f:
-                subprocess.call(cmd, stdin=fp, stdout=out_f, stderr=err_f)
-            out_f.seek(0)
-            results = [(int(i), text) for i, text in
-                       self._pattern.findall(out_f.read())]
-        transcribed = [text for i, text in
-                       sorted(results, key=lambda x: x[0])
-                       if text]
+        wav = wave.open(fp, 'rb')
+        data = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(data, rate, width)
+
+    def warm_up(self):
+        # Also starts Julius if that failed in __init__
+        self.transcribe_pcm(WARM_UP_SILENCE)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        self.start_utterance(rate, width)
+        self.feed_utterance(data)
+        return self.finish_utterance()
+
+    def start_utterance(self, rate=16000, width=2):
+        self._chunks = []
+        try:
+            self._worker.start()
+        except (OSError, RuntimeError):
+            self._logger.warning("Unable to start Julius", exc_info=True)
+            self._streaming = False
+        else:
+            self._streaming = True
+
+    def feed_utterance(self, data):
+        self._chunks.append(data)
+        if self._streaming:
+            try:
+                self._worker.send(data)
+            except socket.error:
+                self._logger.warning("Streaming to Julius failed",
+                                     exc_info=True)
+                self._streaming = False
+
+    def finish_utterance(self):
+        start = time.time()
+        results = None
+        if self._streaming:
+            try:
+                results = self._worker.end_segment()
+            except (socket.error, RuntimeError):
+                self._logger.warning("Julius failed during the utterance",
+                                     exc_info=True)
+        if results is None:
+            # Julius died (or never started), restart it and recognize the
+            # buffered utterance again
+            self._worker.stop()
+            try:
+                results = self._worker.recognize(''.join(self._chunks))
+            except (OSError, RuntimeError, socket.error):
+                self._logger.error("Julius failed to recognize the " +
+                                   "utterance", exc_info=True)
+                results = None
+        self._chunks = []
+        self._streaming = False
+        if results is None:
+            return Transcription()
+        timing = time.time() - start
+        transcribed = Transcription(Hypothesis(text, confidence, self.SLUG,
+                                               timing)
+                                    for text, confidence in results if text)
         if not transcribed:
-            transcribed.append('')
+            transcribed = Transcription([Hypothesis('', 0.0, self.SLUG,
+                                                    timing)])
         self._logger.info('Transcribed: %r', transcribed)
         return transcribed
 
@@ -269,7 +785,7 @@ class JuliusSTT(AbstractSTTEngine):
         return diagnose.check_executable('julius')
 
 
-class GoogleSTT(AbstractSTTEngine):
+class GoogleSTT(AbstractStreamingSTTEngine):
     """
     Speech-To-Text implementation which relies on the Google Speech API.
 
@@ -300,18 +816,29 @@ class GoogleSTT(AbstractSTTEngine):
     """
 
     SLUG = 'google'
+    ENCODINGS = (('flac', 'audio/x-flac; rate=%(rate)d'),
+                 ('pcm', 'audio/l16; rate=%(rate)d'))
 
-    def __init__(self, api_key=None, language='en-us'):
+    def __init__(self, api_key=None, language='en-us', connect_timeout=3.05,
+                 read_timeout=10, retries=2, streaming=True, encoding=None):
         # FIXME: get init args from config
         """
         Arguments:
         api_key - the public api key which allows access to Google APIs
+        connect_timeout, read_timeout - timeouts of requests in seconds
+        retries - how often a failed request is retried
+        streaming - upload audio while the user is still speaking
+        encoding - 'flac' or 'pcm' (Default: 'flac' if available)
         """
         self._logger = logging.getLogger(__name__)
         self._request_url = None
         self._language = None
         self._api_key = None
-        self._http = requests.Session()
+        self._http = httptransport.Transport(self.SLUG, connect_timeout,
+                                             read_timeout, retries)
+        self._upload = None
+        self.streaming = streaming
+        self._set_encoding(encoding)
         self.language = language
         self.api_key = api_key
 
@@ -353,16 +880,13 @@ class GoogleSTT(AbstractSTTEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'keys' in profile and 'GOOGLE_SPEECH' in profile['keys']:
-                    config['api_key'] = profile['keys']['GOOGLE_SPEECH']
+        profile = jasperprofile.get_profile()
+        config = profile.section('google-stt', 'connect_timeout',
+                                 'read_timeout', 'retries', 'streaming',
+                                 'encoding')
+        keys = profile.section('keys', 'GOOGLE_SPEECH')
+        if 'GOOGLE_SPEECH' in keys:
+            config['api_key'] = keys['GOOGLE_SPEECH']
         return config
 
     def transcribe(self, fp):
@@ -374,22 +898,45 @@ class GoogleSTT(AbstractSTTEngine):
         audio_file_path -- the path to the .wav file to be transcribed
         """
 
+        wav = wave.open(fp, 'rb')
+        frame_rate = wav.getframerate()
+        sample_width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(fp.read(), frame_rate, sample_width)
+
+    def _check_request(self):
         if not self.api_key:
             self._logger.critical('API key missing, transcription request ' +
                                   'aborted.')
-            return []
+            return False
         elif not self.language:
             self._logger.critical('Language info missing, transcription ' +
                                   'request aborted.')
+            return False
+        return True
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        if not self._check_request():
             return []
 
-        wav = wave.open(fp, 'rb')
-        frame_rate = wav.getframerate()
-        wav.close()
-        data = fp.read()
+        data, content_type = self.encode(data, rate, width)
+        headers = {'content-type': content_type}
+        start = time.time()
+        try:
+            r = self._http.post(self.request_url, data=data, headers=headers)
+        except requests.exceptions.RequestException:
+            self._logger.critical('Request failed.', exc_info=True)
+            return []
+        return self.parse_response(r, time.time() - start)
+
+    def get_streaming_request(self, rate, width):
+        if not self._check_request():
+            return None
+        return (self.request_url,
+                {'content-type': self.get_content_type(rate, width)})
 
-        headers = {'content-type': 'audio/l16; rate=%s' % frame_rate}
-        r = self._http.post(self.request_url, data=data, headers=headers)
+    def parse_response(self, r, timing):
+        self._logger.debug('Latency: %s', self._http.format_stats())
         try:
             r.raise_for_status()
         except requests.exceptions.HTTPError:
@@ -408,8 +955,10 @@ class GoogleSTT(AbstractSTTEngine):
             if len(response['result']) == 0:
                 # Response result is empty
                 raise ValueError('Nothing has been transcribed.')
-            results = [alt['transcript'] for alt
-                       in response['result'][0]['alternative']]
+            alternatives = response['result'][0]['alternative']
+            # Only the best alternative comes with a confidence
+            results = [(alt['transcript'], alt.get('confidence'))
+                       for alt in alternatives]
         except ValueError as e:
             self._logger.warning('Empty response: %s', e.args[0])
             results = []
@@ -418,7 +967,9 @@ class GoogleSTT(AbstractSTTEngine):
             results = []
         else:
             # Convert all results to uppercase
-            results = tuple(result.upper() for result in results)
+            results = Transcription(Hypothesis(text.upper(), confidence,
+                                               self.SLUG, timing)
+                                    for text, confidence in results)
             self._logger.info('Transcribed: %r', results)
         return results
 
@@ -427,7 +978,7 @@ class GoogleSTT(AbstractSTTEngine):
         return diagnose.check_network_connection()
 
 
-class AttSTT(AbstractSTTEngine):
+class AttSTT(AbstractStreamingSTTEngine):
     """
     Speech-To-Text implementation which relies on the AT&T Speech API.
 
@@ -443,53 +994,95 @@ class AttSTT(AbstractSTTEngine):
     """
 
     SLUG = "att"
+    # The API only accepts uncompressed audio or lossy codecs
+    ENCODINGS = (('pcm', 'audio/raw;coding=linear;rate=%(rate)d;' +
+                  'byteorder=LE'),)
 
-    def __init__(self, app_key, app_secret):
+    def __init__(self, app_key, app_secret, connect_timeout=3.05,
+                 read_timeout=10, retries=2, streaming=True, encoding=None):
         self._logger = logging.getLogger(__name__)
-        self._token = None
+        self._http = httptransport.Transport(self.SLUG, connect_timeout,
+                                             read_timeout, retries)
+        self._upload = None
+        self.streaming = streaming
+        self._set_encoding(encoding)
         self.app_key = app_key
         self.app_secret = app_secret
+        # Tokens are cached on disk, refreshed in the background and shared
+        # by all instances with the same app_key
+        self._tokens = oauthtoken.get_token_manager(self.SLUG, app_key,
+                                                    self._fetch_token)
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # Try to get AT&T app_key/app_secret from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'att-stt' in profile:
-                    if 'app_key' in profile['att-stt']:
-                        config['app_key'] = profile['att-stt']['app_key']
-                    if 'app_secret' in profile['att-stt']:
-                        config['app_secret'] = profile['att-stt']['app_secret']
-        return config
+        return jasperprofile.get_profile().section(
+            'att-stt', 'app_key', 'app_secret', 'connect_timeout',
+            'read_timeout', 'retries', 'streaming', 'encoding')
 
     @property
     def token(self):
-        if not self._token:
-            headers = {'content-type': 'application/x-www-form-urlencoded',
-                       'accept': 'application/json'}
-            payload = {'client_id': self.app_key,
-                       'client_secret': self.app_secret,
-                       'scope': 'SPEECH',
-                       'grant_type': 'client_credentials'}
-            r = requests.post('https://api.att.com/oauth/v4/token',
-                              data=payload,
-                              headers=headers)
-            self._token = r.json()['access_token']
-        return self._token
+        return self._tokens.token
+
+    def _fetch_token(self):
+        headers = {'content-type': 'application/x-www-form-urlencoded',
+                   'accept': 'application/json'}
+        payload = {'client_id': self.app_key,
+                   'client_secret': self.app_secret,
+                   'scope': 'SPEECH',
+                   'grant_type': 'client_credentials'}
+        r = self._http.post('https://api.att.com/oauth/v4/token',
+                            data=payload,
+                            headers=headers)
+        r.raise_for_status()
+        try:
+            response = r.json()
+            return (response['access_token'],
+                    int(response.get('expires_in', 0) or 0))
+        except (ValueError, KeyError):
+            raise requests.exceptions.RequestException(
+                'Invalid token response: %r' % r.text)
 
     def transcribe(self, fp):
-        data = fp.read()
-        r = self._get_response(data)
-        if r.status_code == requests.codes['unauthorized']:
-            # Request token invalid, retry once with a new token
-            self._logger.warning('OAuth access token invalid, generating a ' +
-                                 'new one and retrying...')
-            self._token = None
-            r = self._get_response(data)
+        wav = wave.open(fp, 'rb')
+        data = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(data, rate, width)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        data, content_type = self.encode(data, rate, width)
+        start = time.time()
+        try:
+            token = self.token
+            r = self._get_response(data, content_type, token)
+            if r.status_code == requests.codes['unauthorized']:
+                # Token revoked before it expired, retry once with a new one
+                self._logger.warning('OAuth access token invalid, ' +
+                                     'generating a new one and retrying...')
+                self._tokens.invalidate(token)
+                r = self._get_response(data, content_type, self.token)
+        except requests.exceptions.RequestException:
+            self._logger.critical('Request failed.', exc_info=True)
+            return []
+        return self.parse_response(r, time.time() - start)
+
+    def get_streaming_request(self, rate, width):
+        if width != 2:
+            return None
+        try:
+            token = self.token
+        except requests.exceptions.RequestException:
+            self._logger.warning('Unable to get an OAuth access token.',
+                                 exc_info=True)
+            return None
+        headers = {'authorization': 'Bearer %s' % token,
+                   'accept': 'application/json',
+                   'content-type': self.get_content_type(rate, width)}
+        return ('https://api.att.com/speech/v3/speechToText', headers)
+
+    def parse_response(self, r, timing):
+        self._logger.debug('Latency: %s', self._http.format_stats())
         try:
             r.raise_for_status()
         except requests.exceptions.HTTPError:
@@ -516,26 +1109,28 @@ class AttSTT(AbstractSTTEngine):
                                       exc_info=True)
                 return []
             else:
-                transcribed = [x[0].upper() for x in sorted(results,
-                                                            key=lambda x: x[1],
-                                                            reverse=True)]
+                results.sort(key=lambda x: x[1], reverse=True)
+                transcribed = Transcription(Hypothesis(text.upper(),
+                                                       float(confidence),
+                                                       self.SLUG, timing)
+                                            for text, confidence in results)
                 self._logger.info('Transcribed: %r', transcribed)
                 return transcribed
 
-    def _get_response(self, data):
-        headers = {'authorization': 'Bearer %s' % self.token,
+    def _get_response(self, data, content_type, token):
+        headers = {'authorization': 'Bearer %s' % token,
                    'accept': 'application/json',
-                   'content-type': 'audio/wav'}
-        return requests.post('https://api.att.com/speech/v3/speechToText',
-                             data=data,
-                             headers=headers)
+                   'content-type': content_type}
+        return self._http.post('https://api.att.com/speech/v3/speechToText',
+                               data=data,
+                               headers=headers)
 
     @classmethod
     def is_available(cls):
         return diagnose.check_network_connection()
 
 
-class WitAiSTT(AbstractSTTEngine):
+class WitAiSTT(AbstractStreamingSTTEngine):
     """
     Speech-To-Text implementation which relies on the Wit.ai Speech API.
 
@@ -550,25 +1145,26 @@ class WitAiSTT(AbstractSTTEngine):
     """
 
     SLUG = "witai"
+    ENCODINGS = (('ulaw', 'audio/raw;encoding=ulaw;bits=8;rate=%(rate)d;' +
+                  'endian=little'),
+                 ('pcm', 'audio/raw;encoding=signed-integer;' +
+                  'bits=%(bits)d;rate=%(rate)d;endian=little'))
 
-    def __init__(self, access_token):
+    def __init__(self, access_token, connect_timeout=3.05, read_timeout=10,
+                 retries=2, streaming=True, encoding=None):
         self._logger = logging.getLogger(__name__)
+        self._http = httptransport.Transport(self.SLUG, connect_timeout,
+                                             read_timeout, retries)
+        self._upload = None
+        self.streaming = streaming
+        self._set_encoding(encoding)
         self.token = access_token
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # Try to get wit.ai Auth token from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'witai-stt' in profile:
-                    if 'access_token' in profile['witai-stt']:
-                        config['access_token'] = \
-                            profile['witai-stt']['access_token']
-        return config
+        return jasperprofile.get_profile().section(
+            'witai-stt', 'access_token', 'connect_timeout', 'read_timeout',
+            'retries', 'streaming', 'encoding')
 
     @property
     def token(self):
@@ -578,21 +1174,47 @@ class WitAiSTT(AbstractSTTEngine):
     def token(self, value):
         self._token = value
         self._headers = {'Authorization': 'Bearer %s' % self.token,
-                         'accept': 'application/json',
-                         'Content-Type': 'audio/wav'}
+                         'accept': 'application/json'}
 
     @property
     def headers(self):
         return self._headers
 
     def transcribe(self, fp):
-        data = fp.read()
-        r = requests.post('https://api.wit.ai/speech?v=20150101',
-                          data=data,
-                          headers=self.headers)
+        wav = wave.open(fp, 'rb')
+        data = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(data, rate, width)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        data, content_type = self.encode(data, rate, width)
+        headers = dict(self.headers)
+        headers['Content-Type'] = content_type
+        start = time.time()
+        try:
+            r = self._http.post('https://api.wit.ai/speech?v=20150101',
+                                data=data,
+                                headers=headers)
+        except requests.exceptions.RequestException:
+            self._logger.critical('Request failed.', exc_info=True)
+            return []
+        return self.parse_response(r, time.time() - start)
+
+    def get_streaming_request(self, rate, width):
+        headers = dict(self.headers)
+        headers['Content-Type'] = self.get_content_type(rate, width)
+        return ('https://api.wit.ai/speech?v=20150101', headers)
+
+    def parse_response(self, r, timing):
+        self._logger.debug('Latency: %s', self._http.format_stats())
         try:
             r.raise_for_status()
-            text = r.json()['_text']
+            response = r.json()
+            text = response['_text']
+            outcomes = response.get('outcomes')
+            confidence = outcomes[0].get('confidence') if outcomes else None
         except requests.exceptions.HTTPError:
             self._logger.critical('Request failed with response: %r',
                                   r.text,
@@ -610,9 +1232,10 @@ class WitAiSTT(AbstractSTTEngine):
                                   exc_info=True)
             return []
         else:
-            transcribed = []
+            transcribed = Transcription()
             if text:
-                transcribed.append(text.upper())
+                transcribed = Transcription([Hypothesis(
+                    text.upper(), confidence, self.SLUG, timing)])
             self._logger.info('Transcribed: %r', transcribed)
             return transcribed
 
@@ -621,6 +1244,195 @@ class WitAiSTT(AbstractSTTEngine):
         return diagnose.check_network_connection()
 
 
+class HedgedSTT(AbstractSTTEngine):
+    """
+    Sends each utterance to several STT engines at once and returns the
+    first result that is confident enough. This way, a fast local engine
+    can answer while a more accurate cloud engine is slow, and vice versa.
+
+    Every engine can have a deadline (in seconds after the utterance ended)
+    after which it isn't waited for any more. If no engine returned a
+    confident result, the first non-empty result in the order of the
+    engines is used.
+
+    Excerpt from sample profile.yml:
+
+        ...
+        stt_engine: hedged
+        hedged-stt:
+            engines: [sphinx, google]
+            deadlines: [2, 5]
+            threshold: 0.5
+    """
+
+    SLUG = 'hedged'
+
+    def __init__(self, engines, deadlines=None, threshold=0.5):
+        """
+        Arguments:
+            engines -- a list of STT engine instances, in fallback order
+            deadlines -- (optional) a list with a deadline in seconds (or
+                         None) for each engine
+            threshold -- (optional) the confidence a result needs to be
+                         returned right away
+        """
+        self._logger = logging.getLogger(__name__)
+        if not engines:
+            raise ValueError("HedgedSTT needs at least one engine")
+        if deadlines is None:
+            deadlines = [None] * len(engines)
+        if len(deadlines) != len(engines):
+            raise ValueError("HedgedSTT needs one deadline per engine")
+        self.engines = engines
+        self.deadlines = deadlines
+        self.threshold = threshold
+        # number of utterances each engine answered first
+        self.wins = [0] * len(engines)
+        self._busy = set()
+        self._lock = threading.Lock()
+        self._active = []
+
+    @classmethod
+    def get_config(cls):
+        return jasperprofile.get_profile().section(
+            'hedged-stt', 'engines', 'deadlines', 'threshold')
+
+    @classmethod
+    def _get_hedged_instance(cls, get_engine_instance):
+        config = cls.get_config()
+        slugs = config.pop('engines', [])
+        engines = [get_engine_instance(get_engine_by_slug(str(slug)))
+                   for slug in slugs]
+        return cls(engines, **config)
+
+    @classmethod
+    def get_instance(cls, vocabulary_name, phrases, **kwargs):
+        return cls._get_hedged_instance(
+            lambda engine: engine.get_instance(vocabulary_name, phrases))
+
+    @classmethod
+    def get_passive_instance(cls):
+        return cls._get_hedged_instance(
+            lambda engine: engine.get_passive_instance())
+
+    @classmethod
+    def get_active_instance(cls):
+        return cls._get_hedged_instance(
+            lambda engine: engine.get_active_instance())
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def warm_up(self):
+        for engine in self.engines:
+            engine.warm_up()
+
+    def _get_idle_engines(self):
+        with self._lock:
+            idle = [i for i in range(len(self.engines))
+                    if i not in self._busy]
+        if len(idle) < len(self.engines):
+            self._logger.warning("Skipping engines that are still busy " +
+                                 "with the last utterance: %s",
+                                 ', '.join(self.engines[i].SLUG
+                                           for i in range(len(self.engines))
+                                           if i not in idle))
+        return idle
+
+    def _run(self, i, func, args, results, start):
+        try:
+            result = func(*args)
+        except Exception:
+            self._logger.error("STT engine '%s' failed",
+                               self.engines[i].SLUG, exc_info=True)
+            result = None
+        finally:
+            with self._lock:
+                self._busy.discard(i)
+        results.put((i, result, time.time() - start))
+
+    def _race(self, indices, method, *args):
+        results = Queue.Queue()
+        start = time.time()
+        with self._lock:
+            self._busy.update(indices)
+        for i in indices:
+            thread = threading.Thread(target=self._run,
+                                      args=(i, getattr(self.engines[i],
+                                                       method),
+                                            args, results, start),
+                                      name='HedgedSTT-%s' %
+                                      self.engines[i].SLUG)
+            thread.daemon = True
+            thread.start()
+
+        pending = set(indices)
+        finished = {}
+        while pending:
+            deadlines = [start + self.deadlines[i] for i in pending
+                         if self.deadlines[i] is not None]
+            timeout = None
+            if len(deadlines) == len(pending):
+                timeout = max(0, min(deadlines) - time.time())
+            try:
+                i, result, duration = results.get(timeout=timeout)
+            except Queue.Empty:
+                pass
+            else:
+                pending.discard(i)
+                if result is not None:
+                    confidence = get_confidence(result)
+                    self._logger.debug("STT engine '%s' returned %r " +
+                                       "(confidence: %.2f) after %.3fs",
+                                       self.engines[i].SLUG, result,
+                                       confidence, duration)
+                    if confidence >= self.threshold:
+                        self.wins[i] += 1
+                        return result
+                    finished[i] = result
+            now = time.time()
+            for j in list(pending):
+                if (self.deadlines[j] is not None and
+                        start + self.deadlines[j] <= now):
+                    self._logger.info("STT engine '%s' missed its " +
+                                      "deadline of %.2fs",
+                                      self.engines[j].SLUG, self.deadlines[j])
+                    pending.discard(j)
+
+        for i in indices:
+            if finished.get(i):
+                self.wins[i] += 1
+                return finished[i]
+        return []
+
+    def transcribe(self, fp):
+        wav = wave.open(fp, 'rb')
+        data = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(data, rate, width)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        return self._race(self._get_idle_engines(), 'transcribe_pcm',
+                          data, rate, width)
+
+    def start_utterance(self, rate=16000, width=2):
+        self._active = self._get_idle_engines()
+        for i in self._active:
+            self.engines[i].start_utterance(rate, width)
+
+    def feed_utterance(self, data):
+        for i in self._active:
+            self.engines[i].feed_utterance(data)
+
+    def finish_utterance(self):
+        active = self._active
+        self._active = []
+        return self._race(active, 'finish_utterance')
+
+
 def get_engine_by_slug(slug=None):
     """
     Returns:
@@ -642,7 +1454,7 @@ def get_engine_by_slug(slug=None):
             print(("WARNING: Multiple STT engines found for slug '%s'. " +
                    "This is most certainly a bug.") % slug)
         engine = selected_engines[0]
-        if not engine.is_available():
+        if not diagnose.check_engine(engine):
             raise ValueError(("STT engine '%s' is not available (due to " +
                               "missing dependencies, missing " +
                               "dependencies, etc.)") % slug)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8-*-
+"""
+Benchmarks STT engines on a corpus of recorded utterances.
+
+The corpus is a directory of WAV files (16 bit mono). The reference
+transcript of each file is read from a text file with the same name (e.g.
+time.wav and time.txt), files without one are only used for timing.
+
+For each engine, the benchmark reports the real-time factor (processing
+time divided by audio duration), the median and 95th percentile latency per
+utterance, the peak resident set size of the process and its children, and
+the word error rate against the reference transcripts. The peak RSS never
+decreases, so benchmark one engine per run to compare memory usage.
+
+Usage:
+    python sttbenchmark.py CORPUS_DIR [--engine SLUG ...] [--json]
+"""
+import os
+import re
+import sys
+import math
+import json
+import time
+import wave
+import logging
+import resource
+import argparse
+import collections
+
+import diagnose
+import stt
+
+Clip = collections.namedtuple('Clip', ['name', 'data', 'rate', 'width',
+                                       'duration', 'reference'])
+
+WORD_PATTERN = re.compile(r"[A-Z0-9']+")
+
+
+def normalize(text):
+    """
+    Returns:
+        The words of a transcript, uppercased and without punctuation
+    """
+    return WORD_PATTERN.findall(text.upper())
+
+
+def word_errors(reference, hypothesis):
+    """
+    Counts the word-level edit distance between two transcripts.
+
+    Arguments:
+        reference -- the reference transcript
+        hypothesis -- the transcribed text
+
+    Returns:
+        A (errors, reference words) tuple. errors is the number of
+        substituted, deleted and inserted words.
+    """
+    ref = normalize(reference)
+    hyp = normalize(hypothesis)
+    # Levenshtein distance over words, one row at a time
+    row = range(len(hyp) + 1)
+    for i, ref_word in enumerate(ref, start=1):
+        previous, row = row, [i]
+        for j, hyp_word in enumerate(hyp, start=1):
+            row.append(min(previous[j] + 1,
+                           row[j - 1] + 1,
+                           previous[j - 1] + (ref_word != hyp_word)))
+    return row[-1], len(ref)
+
+
+def word_error_rate(pairs):
+    """
+    Arguments:
+        pairs -- a list of (reference, hypothesis) tuples
+
+    Returns:
+        The word error rate over all pairs (None if there are no reference
+        words)
+    """
+    errors = 0
+    words = 0
+    for reference, hypothesis in pairs:
+        pair_errors, pair_words = word_errors(reference, hypothesis)
+        errors += pair_errors
+        words += pair_words
+    return float(errors) / words if words else None
+
+
+def percentile(values, percent):
+    """
+    Returns:
+        The nearest-rank percentile of values (None if there are none)
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def get_peak_rss():
+    """
+    Returns:
+        A (process, children) tuple of the peak resident set sizes in KiB
+    """
+    # ru_maxrss is in KiB on Linux, but in bytes on OS X
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def load_corpus(path):
+    """
+    Loads all WAV files in a directory and their reference transcripts.
+
+    Returns:
+        A list of Clip tuples, sorted by name
+    """
+    logger = logging.getLogger(__name__)
+    clips = []
+    for fname in sorted(os.listdir(path)):
+        name, ext = os.path.splitext(fname)
+        if ext.lower() != '.wav':
+            continue
+        wav = wave.open(os.path.join(path, fname), 'rb')
+        try:
+            if wav.getnchannels() != 1:
+                logger.warning("Skipping '%s', it isn't mono", fname)
+                continue
+            data = wav.readframes(wav.getnframes())
+            rate = wav.getframerate()
+            width = wav.getsampwidth()
+        finally:
+            wav.close()
+        reference = None
+        reference_file = os.path.join(path, name + '.txt')
+        if os.path.exists(reference_file):
+            with open(reference_file, 'r') as f:
+                reference = f.read().strip()
+        clips.append(Clip(name, data, rate, width,
+                          float(len(data)) / (rate * width), reference))
+    return clips
+
+
+def benchmark(engine, clips):
+    """
+    Transcribes every clip with an engine and measures it.
+
+    Arguments:
+        engine -- an STT engine instance
+        clips -- a list of Clip tuples
+
+    Returns:
+        A dict with the results
+    """
+    logger = logging.getLogger(__name__)
+    engine.warm_up()
+    latencies = []
+    pairs = []
+    transcriptions = {}
+    for clip in clips:
+        start = time.time()
+        transcription = engine.transcribe_pcm(clip.data, clip.rate,
+                                              clip.width)
+        latencies.append(time.time() - start)
+        text = transcription[0] if transcription else ''
+        transcriptions[clip.name] = text
+        logger.debug("%s: '%s' -> '%s' (%.3fs)", clip.name, clip.reference,
+                     text, latencies[-1])
+        if clip.reference is not None:
+            pairs.append((clip.reference, text))
+    audio_duration = sum(clip.duration for clip in clips)
+    peak_rss, peak_children_rss = get_peak_rss()
+    return {'engine': engine.SLUG,
+            'clips': len(clips),
+            'audio_seconds': audio_duration,
+            'processing_seconds': sum(latencies),
+            'rtf': (sum(latencies) / audio_duration if audio_duration
+                    else None),
+            'latency_p50': percentile(latencies, 50),
+            'latency_p95': percentile(latencies, 95),
+            'peak_rss_kib': peak_rss,
+            'peak_children_rss_kib': peak_children_rss,
+            'wer': word_error_rate(pairs),
+            'transcriptions': transcriptions}
+
+
+def format_results(results):
+    """
+    Returns:
+        The results as a human-readable table
+    """
+    def fmt(value, pattern, scale=1):
+        return pattern % (value * scale) if value is not None else 'n/a'
+
+    lines = ['%-12s %6s %8s %8s %8s %10s %10s' % (
+        'engine', 'clips', 'rtf', 'p50', 'p95', 'rss (KiB)', 'wer')]
+    for result in results:
+        lines.append('%-12s %6d %8s %8s %8s %10d %10s' % (
+            result['engine'], result['clips'],
+            fmt(result['rtf'], '%.3f'),
+            fmt(result['latency_p50'], '%.3fs'),
+            fmt(result['latency_p95'], '%.3fs'),
+            max(result['peak_rss_kib'], result['peak_children_rss_kib']),
+            fmt(result['wer'], '%.1f%%', scale=100)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Jasper STT benchmark')
+    parser.add_argument('corpus', help='a directory of WAV files and ' +
+                        'reference transcripts')
+    parser.add_argument('--engine', action='append', dest='engines',
+                        metavar='SLUG', help='the engine to benchmark ' +
+                        '(Default: all available engines)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the results as JSON')
+    parser.add_argument('--debug', action='store_true',
+                        help='Show debug messages')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig()
+    logger = logging.getLogger(__name__)
+    if args.debug:
+        logger.setLevel(logging.DEBUG)
+
+    clips = load_corpus(args.corpus)
+    if not clips:
+        parser.error("No WAV files found in '%s'" % args.corpus)
+
+    if args.engines:
+        engines = [stt.get_engine_by_slug(slug) for slug in args.engines]
+    else:
+        availability = diagnose.check_engines(stt.get_engines())
+        engines = sorted((engine for engine, available
+                          in availability.items() if available),
+                         key=lambda engine: engine.SLUG)
+
+    results = []
+    for engine in engines:
+        logger.info("Benchmarking STT engine '%s'...", engine.SLUG)
+        try:
+            instance = engine.get_active_instance()
+        except Exception:
+            logger.warning("Unable to create STT engine '%s', skipping it",
+                           engine.SLUG, exc_info=True)
+            continue
+        results.append(benchmark(instance, clips))
+
+    if args.json:
+        print(json.dumps({'corpus': os.path.abspath(args.corpus),
+                          'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                          'results': results}, indent=2, sort_keys=True))
+    else:
+        print(format_results(results))
+    return 0 if results else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
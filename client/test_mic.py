@@ -4,6 +4,7 @@ A drop-in replacement for the Mic class used during unit testing.
 Designed to take pre-arranged inputs as an argument and store any
 outputs for inspection. Requires a populated profile (profile.yml).
 """
+import speechqueue
 
 
 class Mic:
@@ -31,3 +32,7 @@ class Mic:
 
     def say(self, phrase, OPTIONS=None):
         self.outputs.append(phrase)
+
+    def say_async(self, phrase):
+        self.say(phrase)
+        return speechqueue.said(phrase)
@@ -4,13 +4,23 @@ A Speaker handles audio output from Jasper to the user
 
 Speaker methods:
     say - output 'phrase' as speech
+    say_all - output several phrases, synthesizing ahead while playing
+    synthesize - synthesize 'phrase' into a WAV file
     play - play the audio in 'filename'
     is_available - returns True if the platform supports this implementation
+
+Phrases are synthesized once and then played from the phrase cache (see
+ttscache.py). Engines that can output audio while they are still
+synthesizing (STREAMING) play it as it arrives.
 """
 import os
 import platform
 import re
+import time
 import tempfile
+import threading
+import collections
+import multiprocessing.pool
 import subprocess
 import pipes
 import logging
@@ -21,7 +31,6 @@ import requests
 from abc import ABCMeta, abstractmethod
 
 import argparse
-import yaml
 
 try:
     import mad
@@ -39,7 +48,9 @@ except ImportError:
     pass
 
 import diagnose
-import jasperpath
+import jasperprofile
+import ttscache
+import audioplayer
 
 
 class AbstractTTSEngine(object):
@@ -48,6 +59,11 @@ class AbstractTTSEngine(object):
     """
     __metaclass__ = ABCMeta
 
+    # True if the engine implements synthesize_stream()
+    STREAMING = False
+    # The number of phrases say_all() synthesizes ahead of the one playing
+    LOOKAHEAD = 2
+
     @classmethod
     def get_config(cls):
         return {}
@@ -56,6 +72,10 @@ class AbstractTTSEngine(object):
     def get_instance(cls):
         config = cls.get_config()
         instance = cls(**config)
+        instance.cache = ttscache.get_cache()
+        instance.aplay_device = jasperprofile.get_profile().section(
+            'playback', 'aplay_device').get('aplay_device',
+                                            instance.aplay_device)
         return instance
 
     @classmethod
@@ -65,24 +85,255 @@ class AbstractTTSEngine(object):
 
     def __init__(self, **kwargs):
         self._logger = logging.getLogger(__name__)
+        # A ttscache.PhraseCache, or None to synthesize every time
+        self.cache = None
+        # An audioplayer.AudioPlayer, or None to play files with aplay
+        self.player = None
+        self.aplay_device = 'plughw:1,0'
+        self._pool = None
+        # The aplay process that is playing, see stop()
+        self._aplay = None
+        self._aplay_lock = threading.Lock()
+
+    def get_voice_params(self):
+        """
+        Returns:
+            A dict of the settings that change how phrases sound. Phrases
+            are cached per engine and voice parameters.
+        """
+        return {}
 
-    @abstractmethod
-    def say(self, phrase, *args):
-        pass
+    def synthesize(self, phrase):
+        """
+        Synthesizes a phrase.
+
+        Returns:
+            The path of a temporary WAV file, the caller has to delete it
+        """
+        raise NotImplementedError
+
+    def synthesize_stream(self, phrase):
+        """
+        Synthesizes a phrase incrementally.
+
+        Returns:
+            An iterator over chunks of a WAV file, the chunks are yielded as
+            soon as the synthesizer outputs them
+        """
+        raise NotImplementedError
+
+    @property
+    def can_synthesize(self):
+        """
+        True if the engine implements synthesize() (some engines can only
+        speak directly).
+        """
+        return (type(self).synthesize.im_func is not
+                AbstractTTSEngine.synthesize.im_func)
+
+    def _get_cache_key(self, phrase):
+        return self.cache.get_key(self.SLUG, self.get_voice_params(), phrase)
+
+    def prepare(self, phrase):
+        """
+        Gets the audio of a phrase ready for playback, either from the
+        phrase cache or by synthesizing it.
+
+        Returns:
+            A (filename, temporary) tuple: the WAV file (None if synthesis
+            failed) and whether the caller has to delete it
+        """
+        if self.cache is None:
+            return self.synthesize(phrase), True
+        key = self._get_cache_key(phrase)
+        fname = self.cache.get(key)
+        self._logger.debug("TTS cache: %s", self.cache.format_stats())
+        if fname is None:
+            fname = self.cache.put(key, self.synthesize(phrase))
+            if fname is None:
+                self._logger.warning("Synthesizing '%s' with '%s' failed",
+                                     phrase, self.SLUG)
+        return fname, False
+
+    def _play_prepared(self, fname, temporary):
+        if fname is None:
+            return
+        try:
+            self.play(fname)
+        finally:
+            if temporary:
+                os.remove(fname)
+
+    def say(self, phrase):
+        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+        if self.STREAMING and self.player is not None:
+            key = None
+            if self.cache is not None:
+                key = self._get_cache_key(phrase)
+                fname = self.cache.get(key)
+                self._logger.debug("TTS cache: %s",
+                                   self.cache.format_stats())
+                if fname is not None:
+                    self.play(fname)
+                    return
+            fname = self._play_stream(phrase, keep=key is not None)
+            if fname is not None:
+                self.cache.put(key, fname)
+            return
+        self._play_prepared(*self.prepare(phrase))
+
+    def say_all(self, phrases, is_cancelled=None):
+        """
+        Says several phrases (e.g. the sentences of a long text) one after
+        the other. While a phrase is playing, up to LOOKAHEAD of the
+        following phrases are synthesized in the background, so only the
+        first phrase has to be waited for.
+
+        Arguments:
+            phrases -- a list of phrases
+            is_cancelled -- (optional) a callable that is checked before and
+                            after each phrase is synthesized, the remaining
+                            phrases are skipped if it returns True
+        """
+        if is_cancelled is None:
+            def is_cancelled():
+                return False
+        if not self.can_synthesize:
+            for phrase in phrases:
+                if is_cancelled():
+                    break
+                self.say(phrase)
+            return
+        if self._pool is None:
+            self._pool = multiprocessing.pool.ThreadPool(self.LOOKAHEAD)
+        phrases = list(phrases)
+        first = None
+        if self.STREAMING and self.player is not None:
+            # Streaming gets the first phrase out fastest
+            first = phrases.pop(0)
+        pending = collections.deque()
+        try:
+            while phrases and len(pending) < self.LOOKAHEAD:
+                pending.append(self._pool.apply_async(self.prepare,
+                                                      (phrases.pop(0),)))
+            if first is not None and not is_cancelled():
+                self.say(first)
+            while pending and not is_cancelled():
+                fname, temporary = pending.popleft().get()
+                if is_cancelled():
+                    # Cancelled while it was being synthesized
+                    if temporary and fname is not None:
+                        os.remove(fname)
+                    break
+                if phrases:
+                    pending.append(self._pool.apply_async(
+                        self.prepare, (phrases.pop(0),)))
+                self._logger.debug("Saying prepared phrase with '%s' (%d " +
+                                   "more synthesized ahead)", self.SLUG,
+                                   len(pending))
+                self._play_prepared(fname, temporary)
+        finally:
+            # Clean up the phrases that won't be played
+            for result in pending:
+                try:
+                    fname, temporary = result.get()
+                except Exception:
+                    continue
+                if temporary and fname is not None:
+                    os.remove(fname)
+
+    def _play_stream(self, phrase, keep=False):
+        """
+        Plays a phrase while it's being synthesized.
+
+        Arguments:
+            phrase -- the phrase
+            keep -- (optional) also write the audio to a WAV file
+
+        Returns:
+            The path of a temporary WAV file with the audio if keep is set
+            and the phrase was played completely, otherwise None
+        """
+        start = time.time()
+        header = ''
+        fmt = None
+        playback = None
+        frames = []
+        try:
+            for chunk in self.synthesize_stream(phrase):
+                if playback is None:
+                    header += chunk
+                    fmt = audioplayer.parse_wav_header(header)
+                    if fmt is None:
+                        continue
+                    playback = self.player.open_stream(*fmt[:3])
+                    chunk = header[fmt[3]:]
+                    self._logger.debug("First audio after %.3fs",
+                                       time.time() - start)
+                if playback.cancelled:
+                    break
+                playback.write(chunk)
+                if keep:
+                    frames.append(chunk)
+        finally:
+            if playback is not None:
+                playback.close()
+        if playback is None:
+            self._logger.warning("Synthesizing '%s' with '%s' failed",
+                                 phrase, self.SLUG)
+            return None
+        playback.wait()
+        if not keep or playback.cancelled or not frames:
+            return None
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            wav = wave.open(f, 'wb')
+            wav.setframerate(fmt[0])
+            wav.setsampwidth(fmt[1])
+            wav.setnchannels(fmt[2])
+            wav.writeframes(''.join(frames))
+            wav.close()
+        return f.name
 
     def play(self, filename):
+        if self.player is not None:
+            self.player.play(filename)
+            return
         # FIXME: Use platform-independent audio-output here
         # See issue jasperproject/jasper-client#188
-        cmd = ['aplay', '-D', 'plughw:1,0', str(filename)]
+        cmd = ['aplay']
+        if self.aplay_device:
+            cmd.extend(['-D', self.aplay_device])
+        cmd.append(str(filename))
         self._logger.debug('Executing %s', ' '.join([pipes.quote(arg)
                                                      for arg in cmd]))
         with tempfile.TemporaryFile() as f:
-            subprocess.call(cmd, stdout=f, stderr=f)
+            aplay = subprocess.Popen(cmd, stdout=f, stderr=f)
+            with self._aplay_lock:
+                self._aplay = aplay
+            try:
+                aplay.wait()
+            finally:
+                with self._aplay_lock:
+                    self._aplay = None
             f.seek(0)
             output = f.read()
             if output:
                 self._logger.debug("Output was: '%s'", output)
 
+    def stop(self):
+        """
+        Interrupts the audio that is currently playing and drops the queued
+        audio. Called from another thread than the one that is speaking.
+        """
+        if self.player is not None:
+            self.player.cancel_all()
+        with self._aplay_lock:
+            if self._aplay is not None and self._aplay.poll() is None:
+                try:
+                    self._aplay.terminate()
+                except OSError:
+                    pass
+
 
 class AbstractMp3TTSEngine(AbstractTTSEngine):
     """
@@ -93,9 +344,15 @@ class AbstractMp3TTSEngine(AbstractTTSEngine):
         return (super(AbstractMp3TTSEngine, cls).is_available() and
                 diagnose.check_python_import('mad'))
 
-    def play_mp3(self, filename):
+    def decode_mp3(self, filename):
+        """
+        Decodes an mp3 file and deletes it.
+
+        Returns:
+            The path of a temporary WAV file
+        """
         mf = mad.MadFile(filename)
-        with tempfile.NamedTemporaryFile(suffix='.wav') as f:
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
             wav = wave.open(f, mode='wb')
             wav.setframerate(mf.samplerate())
             wav.setnchannels(1 if mf.mode() == mad.MODE_SINGLE_CHANNEL else 2)
@@ -106,7 +363,13 @@ class AbstractMp3TTSEngine(AbstractTTSEngine):
                 wav.writeframes(frame)
                 frame = mf.read()
             wav.close()
-            self.play(f.name)
+        os.remove(filename)
+        return f.name
+
+    def play_mp3(self, filename):
+        fname = self.decode_mp3(filename)
+        self.play(fname)
+        os.remove(fname)
 
 
 class DummyTTS(AbstractTTSEngine):
@@ -136,6 +399,7 @@ class EspeakTTS(AbstractTTSEngine):
     """
 
     SLUG = "espeak-tts"
+    STREAMING = True
 
     def __init__(self, voice='default+m3', pitch_adjustment=40,
                  words_per_minute=160):
@@ -146,50 +410,62 @@ class EspeakTTS(AbstractTTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'espeak-tts' in profile:
-                    if 'voice' in profile['espeak-tts']:
-                        config['voice'] = profile['espeak-tts']['voice']
-                    if 'pitch_adjustment' in profile['espeak-tts']:
-                        config['pitch_adjustment'] = \
-                            profile['espeak-tts']['pitch_adjustment']
-                    if 'words_per_minute' in profile['espeak-tts']:
-                        config['words_per_minute'] = \
-                            profile['espeak-tts']['words_per_minute']
-        return config
+        return jasperprofile.get_profile().section(
+            'espeak-tts', 'voice', 'pitch_adjustment', 'words_per_minute')
 
     @classmethod
     def is_available(cls):
         return (super(cls, cls).is_available() and
                 diagnose.check_executable('espeak'))
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            fname = f.name
+    def get_voice_params(self):
+        return {'voice': self.voice,
+                'pitch_adjustment': self.pitch_adjustment,
+                'words_per_minute': self.words_per_minute}
+
+    def _get_command(self, phrase, *args):
         cmd = ['espeak', '-v', self.voice,
                          '-p', self.pitch_adjustment,
-                         '-s', self.words_per_minute,
-                         '-w', fname,
-                         phrase]
+                         '-s', self.words_per_minute]
+        cmd.extend(args)
+        cmd.append(phrase)
         cmd = [str(x) for x in cmd]
         self._logger.debug('Executing %s', ' '.join([pipes.quote(arg)
                                                      for arg in cmd]))
+        return cmd
+
+    def synthesize(self, phrase):
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            fname = f.name
+        cmd = self._get_command(phrase, '-w', fname)
         with tempfile.TemporaryFile() as f:
             subprocess.call(cmd, stdout=f, stderr=f)
             f.seek(0)
             output = f.read()
             if output:
                 self._logger.debug("Output was: '%s'", output)
-        self.play(fname)
-        os.remove(fname)
+        return fname
+
+    def synthesize_stream(self, phrase):
+        cmd = self._get_command(phrase, '--stdout')
+        with tempfile.TemporaryFile() as err_f:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                       stderr=err_f)
+            try:
+                # os.read() returns whatever is available, so audio is
+                # passed on as soon as espeak writes it
+                for chunk in iter(lambda: os.read(process.stdout.fileno(),
+                                                  4096), ''):
+                    yield chunk
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                process.wait()
+                err_f.seek(0)
+                output = err_f.read()
+                if output:
+                    self._logger.debug("Output was: '%s'", output)
 
 
 class FestivalTTS(AbstractTTSEngine):
@@ -221,10 +497,10 @@ class FestivalTTS(AbstractTTSEngine):
                     return ('No default voice found' not in output)
         return False
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def synthesize(self, phrase):
         cmd = ['text2wave']
-        with tempfile.NamedTemporaryFile(suffix='.wav') as out_f:
+        with tempfile.NamedTemporaryFile(suffix='.wav',
+                                         delete=False) as out_f:
             with tempfile.SpooledTemporaryFile() as in_f:
                 in_f.write(phrase)
                 in_f.seek(0)
@@ -238,7 +514,7 @@ class FestivalTTS(AbstractTTSEngine):
                     output = err_f.read()
                     if output:
                         self._logger.debug("Output was: '%s'", output)
-            self.play(out_f.name)
+        return out_f.name
 
 
 class FliteTTS(AbstractTTSEngine):
@@ -268,18 +544,7 @@ class FliteTTS(AbstractTTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'flite-tts' in profile:
-                    if 'voice' in profile['flite-tts']:
-                        config['voice'] = profile['flite-tts']['voice']
-        return config
+        return jasperprofile.get_profile().section('flite-tts', 'voice')
 
     @classmethod
     def is_available(cls):
@@ -287,8 +552,10 @@ class FliteTTS(AbstractTTSEngine):
                 diagnose.check_executable('flite') and
                 len(cls.get_voices()) > 0)
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def get_voice_params(self):
+        return {'voice': self.voice}
+
+    def synthesize(self, phrase):
         cmd = ['flite']
         if self.voice:
             cmd.extend(['-voice', self.voice])
@@ -305,8 +572,7 @@ class FliteTTS(AbstractTTSEngine):
             output = out_f.read().strip()
         if output:
             self._logger.debug("Output was: '%s'", output)
-        self.play(fname)
-        os.remove(fname)
+        return fname
 
 
 class MacOSXTTS(AbstractTTSEngine):
@@ -365,18 +631,7 @@ class PicoTTS(AbstractTTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'pico-tts' in profile and 'language' in profile['pico-tts']:
-                    config['language'] = profile['pico-tts']['language']
-
-        return config
+        return jasperprofile.get_profile().section('pico-tts', 'language')
 
     @property
     def languages(self):
@@ -395,8 +650,10 @@ class PicoTTS(AbstractTTSEngine):
         langs = matchobj.group(1).split()
         return langs
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def get_voice_params(self):
+        return {'language': self.language}
+
+    def synthesize(self, phrase):
         with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
             fname = f.name
         cmd = ['pico2wave', '--wave', fname]
@@ -413,8 +670,7 @@ class PicoTTS(AbstractTTSEngine):
             output = f.read()
             if output:
                 self._logger.debug("Output was: '%s'", output)
-        self.play(fname)
-        os.remove(fname)
+        return fname
 
 
 class GoogleTTS(AbstractMp3TTSEngine):
@@ -437,19 +693,7 @@ class GoogleTTS(AbstractMp3TTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if ('google-tts' in profile and
-                   'language' in profile['google-tts']):
-                    config['language'] = profile['google-tts']['language']
-
-        return config
+        return jasperprofile.get_profile().section('google-tts', 'language')
 
     @property
     def languages(self):
@@ -460,8 +704,10 @@ class GoogleTTS(AbstractMp3TTSEngine):
                  'th', 'tr', 'vi', 'cy']
         return langs
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def get_voice_params(self):
+        return {'language': self.language}
+
+    def synthesize(self, phrase):
         if self.language not in self.languages:
             raise ValueError("Language '%s' not supported by '%s'",
                              self.language, self.SLUG)
@@ -469,8 +715,7 @@ class GoogleTTS(AbstractMp3TTSEngine):
         with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as f:
             tmpfile = f.name
         tts.save(tmpfile)
-        self.play_mp3(tmpfile)
-        os.remove(tmpfile)
+        return self.decode_mp3(tmpfile)
 
 
 class MaryTTS(AbstractTTSEngine):
@@ -514,25 +759,8 @@ class MaryTTS(AbstractTTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'mary-tts' in profile:
-                    if 'server' in profile['mary-tts']:
-                        config['server'] = profile['mary-tts']['server']
-                    if 'port' in profile['mary-tts']:
-                        config['port'] = profile['mary-tts']['port']
-                    if 'language' in profile['mary-tts']:
-                        config['language'] = profile['mary-tts']['language']
-                    if 'voice' in profile['mary-tts']:
-                        config['voice'] = profile['mary-tts']['voice']
-
-        return config
+        return jasperprofile.get_profile().section(
+            'mary-tts', 'server', 'port', 'language', 'voice')
 
     @classmethod
     def is_available(cls):
@@ -544,8 +772,12 @@ class MaryTTS(AbstractTTSEngine):
         urlparts = ('http', self.netloc, path, query_s, '')
         return urlparse.urlunsplit(urlparts)
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def get_voice_params(self):
+        return {'server': self.netloc,
+                'language': self.language,
+                'voice': self.voice}
+
+    def synthesize(self, phrase):
         if self.language not in self.languages:
             raise ValueError("Language '%s' not supported by '%s'"
                              % (self.language, self.SLUG))
@@ -564,8 +796,7 @@ class MaryTTS(AbstractTTSEngine):
         with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
             f.write(r.content)
             tmpfile = f.name
-        self.play(tmpfile)
-        os.remove(tmpfile)
+        return tmpfile
 
 
 class IvonaTTS(AbstractMp3TTSEngine):
@@ -593,32 +824,9 @@ class IvonaTTS(AbstractMp3TTSEngine):
 
     @classmethod
     def get_config(cls):
-        # FIXME: Replace this as soon as we have a config module
-        config = {}
-        # HMM dir
-        # Try to get hmm_dir from config
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'ivona-tts' in profile:
-                    if 'access_key' in profile['ivona-tts']:
-                        config['access_key'] = \
-                            profile['ivona-tts']['access_key']
-                    if 'secret_key' in profile['ivona-tts']:
-                        config['secret_key'] = \
-                            profile['ivona-tts']['secret_key']
-                    if 'region' in profile['ivona-tts']:
-                        config['region'] = profile['ivona-tts']['region']
-                    if 'voice' in profile['ivona-tts']:
-                        config['voice'] = profile['ivona-tts']['voice']
-                    if 'speech_rate' in profile['ivona-tts']:
-                        config['speech_rate'] = \
-                            profile['ivona-tts']['speech_rate']
-                    if 'sentence_break' in profile['ivona-tts']:
-                        config['sentence_break'] = \
-                            profile['ivona-tts']['sentence_break']
-        return config
+        return jasperprofile.get_profile().section(
+            'ivona-tts', 'access_key', 'secret_key', 'region', 'voice',
+            'speech_rate', 'sentence_break')
 
     @classmethod
     def is_available(cls):
@@ -626,13 +834,17 @@ class IvonaTTS(AbstractMp3TTSEngine):
                 diagnose.check_python_import('pyvona') and
                 diagnose.check_network_connection())
 
-    def say(self, phrase):
-        self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
+    def get_voice_params(self):
+        return {'region': self._pyvonavoice.region,
+                'voice': self._pyvonavoice.voice_name,
+                'speech_rate': self._pyvonavoice.speech_rate,
+                'sentence_break': self._pyvonavoice.sentence_break}
+
+    def synthesize(self, phrase):
         with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as f:
             tmpfile = f.name
         self._pyvonavoice.fetch_voice(phrase, tmpfile)
-        self.play_mp3(tmpfile)
-        os.remove(tmpfile)
+        return self.decode_mp3(tmpfile)
 
 
 def get_default_engine_slug():
@@ -660,7 +872,7 @@ def get_engine_by_slug(slug=None):
             print("WARNING: Multiple TTS engines found for slug '%s'. " +
                   "This is most certainly a bug." % slug)
         engine = selected_engines[0]
-        if not engine.is_available():
+        if not diagnose.check_engine(engine):
             raise ValueError(("TTS engine '%s' is not available (due to " +
                               "missing dependencies, etc.)") % slug)
         return engine
@@ -0,0 +1,187 @@
+# -*- coding: utf-8-*-
+"""
+A disk cache of synthesized speech.
+
+Jasper says the same phrases over and over ("Pardon?", the salutation, ...).
+A PhraseCache keeps the synthesized audio of each phrase as a WAV file in
+the config dir, so that a phrase only has to be synthesized once. Files are
+named after a hash of the engine's slug, its voice parameters and the
+normalized text. The cache is bounded in size: when it grows too large, the
+least recently used phrases are deleted.
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import collections
+
+import jasperpath
+import jasperprofile
+
+
+def normalize(phrase):
+    """
+    Returns:
+        The phrase with runs of whitespace collapsed, so that phrases that
+        sound the same share a cache entry
+    """
+    return re.sub(r'\s+', ' ', phrase).strip()
+
+
+class PhraseCache(object):
+    """
+    A size-bounded LRU cache of WAV files.
+    """
+
+    def __init__(self, path=None, max_size=50 * 1024 * 1024):
+        """
+        Arguments:
+            path -- (optional) the cache dir (Default: <config dir>/tts-cache)
+            max_size -- (optional) the maximum size of all files in bytes
+        """
+        self._logger = logging.getLogger(__name__)
+        self.path = path if path else jasperpath.config('tts-cache')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        # key -> file size, least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                self._logger.warning("Unable to create TTS cache dir '%s'",
+                                     self.path, exc_info=True)
+                return
+        entries = []
+        for fname in os.listdir(self.path):
+            key, ext = os.path.splitext(fname)
+            if ext != '.wav':
+                continue
+            stat = os.stat(os.path.join(self.path, fname))
+            entries.append((stat.st_mtime, key, stat.st_size))
+        # The mtime is updated on every hit, so it orders entries by use
+        for mtime, key, size in sorted(entries):
+            self._entries[key] = size
+            self.size += size
+        self._logger.debug("TTS cache '%s' holds %d phrases (%d bytes)",
+                           self.path, len(self._entries), self.size)
+
+    def _get_path(self, key):
+        return os.path.join(self.path, key + '.wav')
+
+    @staticmethod
+    def get_key(slug, params, phrase):
+        """
+        Arguments:
+            slug -- the TTS engine's slug
+            params -- a dict of the voice parameters that affect the audio
+            phrase -- the phrase
+
+        Returns:
+            The cache key for a phrase
+        """
+        data = json.dumps([slug, params, normalize(phrase)], sort_keys=True)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns:
+            The path of the cached WAV file, or None if the phrase isn't
+            cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._get_path(key)
+            try:
+                os.utime(path, None)
+            except OSError:
+                # Deleted behind our back
+                self.size -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+            return path
+
+    def put(self, key, filename):
+        """
+        Moves a synthesized WAV file into the cache.
+
+        Arguments:
+            key -- the cache key (see get_key())
+            filename -- the WAV file, it's moved into the cache
+
+        Returns:
+            The path of the cached file, or None if the file is empty (it
+            is deleted then)
+        """
+        size = os.path.getsize(filename)
+        if not size:
+            os.remove(filename)
+            return None
+        path = self._get_path(key)
+        with self._lock:
+            shutil.move(filename, path)
+            if key in self._entries:
+                self.size -= self._entries.pop(key)
+            self._entries[key] = size
+            self.size += size
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Never evict the entry that was just added
+        while self.size > self.max_size and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._get_path(key))
+            except OSError:
+                pass
+
+    def format_stats(self):
+        """
+        Returns:
+            A summary of the cache's hits, misses and size
+        """
+        lookups = self.hits + self.misses
+        return "%d hits, %d misses (%.0f%% hit rate), %d phrases, " \
+               "%d bytes, %d evicted" % (
+                   self.hits, self.misses,
+                   100.0 * self.hits / lookups if lookups else 0,
+                   len(self._entries), self.size, self.evictions)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns:
+        The shared PhraseCache configured in the profile, or None if the
+        cache is disabled
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = jasperprofile.get_profile().section(
+                'tts-cache', 'enabled', 'max_size_mb')
+            if not config.get('enabled', True):
+                return None
+            _cache = PhraseCache(max_size=int(config.get('max_size_mb', 50) *
+                                              1024 * 1024))
+        return _cache
@@ -0,0 +1,252 @@
+# -*- coding: utf-8-*-
+"""
+Energy based voice activity detection on 16 bit PCM audio.
+
+The VoiceActivityDetector scores audio frames by their energy and keeps a
+rolling average of the most recent scores (the noise floor while nobody
+speaks). Updating the average is O(1) per frame, and whole buffers can be
+scored with a single vectorized call.
+"""
+import numpy
+
+# A disturbance has to be this much louder than the noise floor
+THRESHOLD_MULTIPLIER = 1.8
+
+# Speech has ended when the rolling average falls below this fraction of the
+# threshold
+END_OF_SPEECH_RATIO = 0.8
+
+# Number of frames in the rolling average
+WINDOW_SIZE = 30
+
+
+def to_samples(data, width=2):
+    """
+    Converts raw little-endian PCM data to a NumPy array without copying it.
+
+    Arguments:
+        data -- a str, bytearray or memoryview with raw audio frames
+        width -- (optional) the sample width in bytes (Default: 2)
+
+    Returns:
+        A NumPy array of samples
+    """
+    if width != 2:
+        raise ValueError("Only 16 bit audio is supported")
+    return numpy.frombuffer(data, dtype='<i2')
+
+
+def frame_energy(samples):
+    """
+    Returns:
+        The root mean square of a NumPy array of samples
+    """
+    if not len(samples):
+        return 0.0
+    samples = samples.astype(numpy.float64)
+    return float(numpy.sqrt(numpy.dot(samples, samples) / len(samples)))
+
+
+def score(data, width=2):
+    """
+    Returns:
+        The score (a scaled energy) of a chunk of raw audio data
+    """
+    return frame_energy(to_samples(data, width)) / 3
+
+
+class VoiceActivityDetector(object):
+    """
+    Keeps a rolling average over the scores of the last frames and compares
+    new frames against it.
+    """
+
+    def __init__(self, window=WINDOW_SIZE,
+                 threshold_multiplier=THRESHOLD_MULTIPLIER,
+                 end_of_speech_ratio=END_OF_SPEECH_RATIO, width=2):
+        """
+        Arguments:
+            window -- (optional) the number of frames in the rolling average
+            threshold_multiplier -- (optional) how much louder than the
+                                    rolling average a frame has to be to
+                                    count as a disturbance
+            end_of_speech_ratio -- (optional) fraction of the threshold below
+                                   which the rolling average signals the end
+                                   of speech
+            width -- (optional) the sample width in bytes (Default: 2)
+        """
+        self.threshold_multiplier = threshold_multiplier
+        self.end_of_speech_ratio = end_of_speech_ratio
+        self.width = width
+        self._scores = numpy.zeros(window)
+        self.reset()
+
+    def reset(self, value=None):
+        """
+        Clears the rolling average. If value is given, the window is filled
+        with that score instead of being emptied.
+        """
+        self._index = 0
+        if value is None:
+            self._scores.fill(0)
+            self._count = 0
+            self._sum = 0.0
+        else:
+            self._scores.fill(value)
+            self._count = len(self._scores)
+            self._sum = float(value) * len(self._scores)
+
+    def score(self, data):
+        """
+        Returns:
+            The score of a chunk of raw audio data
+        """
+        return score(data, self.width)
+
+    def scores(self, data, chunk):
+        """
+        Scores a whole buffer at once.
+
+        Arguments:
+            data -- raw audio data
+            chunk -- the number of frames per score
+
+        Returns:
+            A NumPy array with one score per (complete) chunk
+        """
+        samples = to_samples(data, self.width)
+        count = len(samples) // chunk
+        frames = samples[:count * chunk].reshape(count, chunk)
+        frames = frames.astype(numpy.float64)
+        return numpy.sqrt(numpy.mean(frames * frames, axis=1)) / 3
+
+    def update(self, data):
+        """
+        Scores a chunk of raw audio data and adds it to the rolling average.
+
+        Returns:
+            The score of the chunk
+        """
+        value = self.score(data)
+        self.add_score(value)
+        return value
+
+    def add_score(self, value):
+        """
+        Adds a score to the rolling average in constant time.
+        """
+        self._sum += value - self._scores[self._index]
+        self._scores[self._index] = value
+        self._index = (self._index + 1) % len(self._scores)
+        self._count = min(self._count + 1, len(self._scores))
+
+    @property
+    def average(self):
+        """
+        Returns:
+            The average of the scores in the window
+        """
+        if not self._count:
+            return 0.0
+        return self._sum / self._count
+
+    @property
+    def threshold(self):
+        """
+        Returns:
+            The score a frame needs to count as a disturbance, given that
+            the rolling average is the current noise floor
+        """
+        return self.average * self.threshold_multiplier
+
+    def is_speech(self, value, threshold=None):
+        """
+        Returns:
+            True if the score value exceeds threshold (Default:
+            self.threshold)
+        """
+        if threshold is None:
+            threshold = self.threshold
+        return value > threshold
+
+    def has_ended(self, threshold):
+        """
+        Returns:
+            True if the rolling average dropped low enough below threshold
+            to consider the speech to have ended
+        """
+        return self.average < threshold * self.end_of_speech_ratio
+
+
+class NoiseFloorTracker(object):
+    """
+    Continuously estimates the noise floor with an asymmetric exponential
+    moving average: it follows quieter frames quickly, louder frames slowly
+    and frames that look like speech very slowly. This way, speech hardly
+    raises the noise floor, but a permanent change of the background noise
+    (e.g. a fan being switched on) is picked up after a while.
+    """
+
+    def __init__(self, fall_rate=0.2, rise_rate=0.02, speech_rise_rate=0.002,
+                 threshold_multiplier=THRESHOLD_MULTIPLIER, warmup=15):
+        """
+        Arguments:
+            fall_rate -- (optional) smoothing factor for quieter frames
+            rise_rate -- (optional) smoothing factor for louder frames
+            speech_rise_rate -- (optional) smoothing factor for frames above
+                                the threshold
+            threshold_multiplier -- (optional) how much louder than the noise
+                                    floor a frame has to be to count as a
+                                    disturbance
+            warmup -- (optional) the number of frames needed before the
+                      estimate is considered reliable
+        """
+        self.fall_rate = fall_rate
+        self.rise_rate = rise_rate
+        self.speech_rise_rate = speech_rise_rate
+        self.threshold_multiplier = threshold_multiplier
+        self.warmup = warmup
+        self.frames = 0
+        self._floor = 0.0
+
+    @property
+    def ready(self):
+        """
+        Returns:
+            True if enough frames have been seen to trust the estimate
+        """
+        return self.frames >= self.warmup
+
+    @property
+    def floor(self):
+        """
+        Returns:
+            The current noise floor estimate (as a score)
+        """
+        return self._floor
+
+    @property
+    def threshold(self):
+        """
+        Returns:
+            The score a frame needs to count as a disturbance
+        """
+        return self._floor * self.threshold_multiplier
+
+    def update(self, value):
+        """
+        Adds a score to the estimate.
+
+        Returns:
+            The updated noise floor
+        """
+        if not self.frames:
+            self._floor = float(value)
+        elif value <= self._floor:
+            self._floor += self.fall_rate * (value - self._floor)
+        elif value > self.threshold:
+            self._floor += self.speech_rise_rate * (value - self._floor)
+        else:
+            self._floor += self.rise_rate * (value - self._floor)
+        self.frames += 1
+        return self._floor
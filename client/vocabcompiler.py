@@ -14,10 +14,10 @@ import re
 import contextlib
 import shutil
 from abc import ABCMeta, abstractmethod, abstractproperty
-import yaml
 
 import brain
 import jasperpath
+import jasperprofile
 
 from g2p import PhonetisaurusG2P
 try:
@@ -421,16 +421,11 @@ class JuliusVocabulary(AbstractVocabulary):
 
         lexicon_file = jasperpath.data('julius-stt', 'VoxForge.tgz')
         lexicon_archive_member = 'VoxForge/VoxForgeDict'
-        profile_path = jasperpath.config('profile.yml')
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile = yaml.safe_load(f)
-                if 'julius' in profile:
-                    if 'lexicon' in profile['julius']:
-                        lexicon_file = profile['julius']['lexicon']
-                    if 'lexicon_archive_member' in profile['julius']:
-                        lexicon_archive_member = \
-                            profile['julius']['lexicon_archive_member']
+        config = jasperprofile.get_profile().section(
+            'julius', 'lexicon', 'lexicon_archive_member')
+        lexicon_file = config.get('lexicon', lexicon_file)
+        lexicon_archive_member = config.get('lexicon_archive_member',
+                                            lexicon_archive_member)
 
         lexicon = JuliusVocabulary.VoxForgeLexicon(lexicon_file,
                                                    lexicon_archive_member)
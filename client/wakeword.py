@@ -0,0 +1,195 @@
+# -*- coding: utf-8-*-
+"""
+Cheap first-stage detectors for passive listening.
+
+Whenever passive listening hears a disturbance, the clip is transcribed by
+the passive STT engine. If that engine is a cloud service, every cough and
+door slam costs a network round-trip (and maybe money). A DetectorCascade
+wraps the passive engine and only passes clips on that all of its detectors
+accept. It counts how many clips each stage rejected, so that the cascade
+can be tuned for CPU usage and cost.
+
+Example profile.yml excerpt:
+
+    ...
+    stt_passive_engine: google
+    stt_passive_detectors:
+        - energy
+        - sphinx
+"""
+import wave
+import logging
+from abc import ABCMeta, abstractmethod
+
+import numpy
+
+import stt
+import vad
+
+
+class AbstractDetector(object):
+    """
+    Generic parent class for all wake word detectors
+    """
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def accepts(self, data, rate=16000, width=2):
+        """
+        Checks if a clip might contain the wake word.
+
+        Arguments:
+            data -- raw mono PCM audio
+            rate -- (optional) the sample rate in Hz (Default: 16000)
+            width -- (optional) the sample width in bytes (Default: 2)
+
+        Returns:
+            True if the clip should be passed on to the next stage
+        """
+        pass
+
+
+class SpeechDurationDetector(AbstractDetector):
+    """
+    Accepts clips whose voiced part is about as long as a spoken wake word.
+    Clicks, door slams and coughs are too short, continuous noise (like
+    music) is too long.
+    """
+
+    SLUG = 'energy'
+
+    def __init__(self, min_duration=0.2, max_duration=2.0, frame_time=0.03,
+                 threshold_multiplier=vad.THRESHOLD_MULTIPLIER):
+        """
+        Arguments:
+            min_duration -- (optional) minimum voiced time in seconds
+            max_duration -- (optional) maximum voiced time in seconds
+            frame_time -- (optional) length of analyzed frames in seconds
+            threshold_multiplier -- (optional) how much louder than the
+                                    quietest frames in the clip a frame has
+                                    to be to count as voiced
+        """
+        self._logger = logging.getLogger(__name__)
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.frame_time = frame_time
+        self.threshold_multiplier = threshold_multiplier
+
+    def accepts(self, data, rate=16000, width=2):
+        frame = max(1, int(rate * self.frame_time))
+        scores = vad.VoiceActivityDetector(width=width).scores(data, frame)
+        if not len(scores):
+            return False
+        # The quietest part of the clip is our noise floor
+        floor = numpy.percentile(scores, 20)
+        voiced = numpy.count_nonzero(scores > floor *
+                                     self.threshold_multiplier)
+        duration = voiced * float(frame) / rate
+        self._logger.debug("Clip contains %.2f seconds of voiced audio",
+                           duration)
+        return self.min_duration <= duration <= self.max_duration
+
+
+class STTDetector(AbstractDetector):
+    """
+    Accepts clips in which a (usually local) STT engine heard a keyword.
+    """
+
+    SLUG = 'sphinx'
+
+    def __init__(self, engine, keywords):
+        """
+        Arguments:
+            engine -- an STT engine instance
+            keywords -- a list of keywords
+        """
+        self.engine = engine
+        self.keywords = keywords
+
+    def accepts(self, data, rate=16000, width=2):
+        transcribed = self.engine.transcribe_pcm(data, rate, width)
+        return any(keyword in phrase for phrase in transcribed
+                   for keyword in self.keywords)
+
+
+class DetectorCascade(stt.AbstractSTTEngine):
+    """
+    Wraps an STT engine so that it only gets to transcribe clips that all
+    detectors accepted. Detectors are asked in order, so cheap ones should
+    come first.
+    """
+
+    def __init__(self, engine, detectors):
+        """
+        Arguments:
+            engine -- the STT engine instance that is called last
+            detectors -- a list of AbstractDetector instances
+        """
+        self._logger = logging.getLogger(__name__)
+        self.engine = engine
+        self.detectors = detectors
+        self.clips = 0
+        self.rejected = [0] * len(detectors)
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def warm_up(self):
+        self.engine.warm_up()
+
+    def transcribe(self, fp):
+        wav = wave.open(fp, 'rb')
+        data = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        wav.close()
+        return self.transcribe_pcm(data, rate, width)
+
+    def transcribe_pcm(self, data, rate=16000, width=2):
+        self.clips += 1
+        for i, detector in enumerate(self.detectors):
+            if not detector.accepts(data, rate, width):
+                self.rejected[i] += 1
+                self._logger.debug("Detector '%s' rejected the clip (%s)",
+                                   detector.SLUG, self.format_stats())
+                return []
+        return self.engine.transcribe_pcm(data, rate, width)
+
+    @property
+    def stats(self):
+        """
+        Returns:
+            A list of (stage name, rejected clips) tuples, including the
+            number of clips that reached the wrapped engine
+        """
+        stats = [(detector.SLUG, rejected) for detector, rejected
+                 in zip(self.detectors, self.rejected)]
+        stats.append(('passed', self.clips - sum(self.rejected)))
+        return stats
+
+    def format_stats(self):
+        return ', '.join('%s: %d' % item for item in self.stats) + \
+            ' of %d clips' % self.clips
+
+
+def get_detector_by_slug(slug, keywords):
+    """
+    Creates a detector instance.
+
+    Arguments:
+        slug -- the detector's slug
+        keywords -- the keywords that detectors should look for
+
+    Returns:
+        An AbstractDetector instance
+
+    Raises:
+        ValueError if there is no detector for this slug
+    """
+    if slug == SpeechDurationDetector.SLUG:
+        return SpeechDurationDetector()
+    elif slug == STTDetector.SLUG:
+        engine = stt.get_engine_by_slug('sphinx')
+        return STTDetector(engine.get_passive_instance(), keywords)
+    raise ValueError("No wake word detector found for slug '%s'" % slug)
@@ -3,13 +3,15 @@
 
 import os
 import sys
+import time
 import shutil
 import logging
+import multiprocessing.pool
 
-import yaml
 import argparse
 
-from client import tts, stt, jasperpath, diagnose
+from client import tts, stt, jasperpath, jasperprofile, diagnose, wakeword
+from client import speechqueue
 from client.conversation import Conversation
 
 # Add jasperpath.LIB_PATH to sys.path
@@ -34,6 +36,9 @@ else:
 class Jasper(object):
     def __init__(self):
         self._logger = logging.getLogger(__name__)
+        # (phase, seconds) tuples for the startup log
+        self.timings = []
+        start = time.time()
 
         # Create config dir if it does not exist yet
         if not os.path.exists(jasperpath.CONFIG_PATH):
@@ -72,12 +77,26 @@ class Jasper(object):
 
         # Read config
         self._logger.debug("Trying to read config file: '%s'", new_configfile)
-        try:
-            with open(new_configfile, "r") as f:
-                self.config = yaml.safe_load(f)
-        except OSError:
+        # The profile is parsed once and shared with the engines
+        profile = jasperprofile.get_profile()
+        if not profile.exists:
             self._logger.error("Can't open config file: '%s'", new_configfile)
-            raise
+            raise IOError("Config file '%s' not found" % new_configfile)
+        self.config = profile.data
+        self._record('config', start)
+
+        # Probe all configured engines at once, get_engine_by_slug() then
+        # uses the cached results
+        probe_start = time.time()
+        stt_slugs = set([self.config.get('stt_engine', 'sphinx'),
+                         self.config.get('stt_passive_engine')])
+        tts_slug = self.config.get('tts_engine',
+                                   tts.get_default_engine_slug())
+        diagnose.check_engines(
+            [engine for engine in stt.get_engines()
+             if engine.SLUG in stt_slugs] +
+            [engine for engine in tts.get_engines()
+             if engine.SLUG == tts_slug])
 
         try:
             stt_engine_slug = self.config['stt_engine']
@@ -100,19 +119,89 @@ class Jasper(object):
             logger.warning("tts_engine not specified in profile, defaulting " +
                            "to '%s'", tts_engine_slug)
         tts_engine_class = tts.get_engine_by_slug(tts_engine_slug)
+        self._record('probe engines', probe_start)
 
-        # Initialize Mic
-        self.mic = Mic(tts_engine_class.get_instance(),
-                       stt_passive_engine_class.get_passive_instance(),
-                       stt_engine_class.get_active_instance())
+        # Building the STT engines (compiling vocabularies, loading decoders)
+        # takes much longer than building the TTS engine, so they are built
+        # concurrently and the salutation is said as soon as TTS is ready
+        pool = multiprocessing.pool.ThreadPool(3)
+        try:
+            tts_result = pool.apply_async(
+                self._timed, ('tts', tts_engine_class.get_instance))
+            stt_passive_result = pool.apply_async(
+                self._timed, ('passive stt', self._create_stt_engine,
+                              stt_passive_engine_class.get_passive_instance))
+            stt_active_result = pool.apply_async(
+                self._timed, ('active stt', self._create_stt_engine,
+                              stt_engine_class.get_active_instance))
+
+            tts_engine = tts_result.get()
+            # The local mic prints what it says, so it greets in run()
+            self.greeted = not args.local
+            if self.greeted:
+                # Said through the speech queue that the Mic takes over, so
+                # it's cleaned up and split like everything else Jasper says
+                speech = speechqueue.for_speaker(tts_engine)
+                greeting = speech.put(self.get_salutation())
+
+            stt_passive_engine = stt_passive_result.get()
+            stt_active_engine = stt_active_result.get()
+        finally:
+            pool.close()
+
+        if self.config.get('stt_passive_detectors'):
+            detectors = [wakeword.get_detector_by_slug(detector, ['JASPER'])
+                         for detector in self.config['stt_passive_detectors']]
+            stt_passive_engine = wakeword.DetectorCascade(stt_passive_engine,
+                                                          detectors)
 
-    def run(self):
+        # Initialize Mic
+        if self.greeted:
+            # The greeting is played with aplay, as there is no AudioPlayer
+            # yet. Let it finish before the Mic opens the sound card.
+            self._timed('salutation', greeting.wait)
+            self.mic = Mic(tts_engine, stt_passive_engine, stt_active_engine,
+                           speech=speech)
+        else:
+            self.mic = Mic(tts_engine, stt_passive_engine, stt_active_engine)
+
+        self._logger.info("Startup took %.2fs (%s)", time.time() - start,
+                          ', '.join('%s: %.2fs' % timing
+                                    for timing in self.timings))
+
+    def _record(self, phase, phase_start):
+        """
+        Records how long a startup phase took for the startup log.
+        """
+        self.timings.append((phase, time.time() - phase_start))
+
+    def _timed(self, phase, func, *args):
+        """
+        Calls func and records how long it took as a startup phase.
+        """
+        phase_start = time.time()
+        result = func(*args)
+        self._record(phase, phase_start)
+        return result
+
+    def _create_stt_engine(self, get_instance):
+        engine = get_instance()
+        warm_up_start = time.time()
+        engine.warm_up()
+        self._logger.debug("Warmed up STT engine '%s' in %.2fs", engine.SLUG,
+                           time.time() - warm_up_start)
+        return engine
+
+    def get_salutation(self):
         if 'first_name' in self.config:
-            salutation = ("How can I be of service, %s?"
-                          % self.config["first_name"])
+            return ("How can I be of service, %s?"
+                    % self.config["first_name"])
         else:
-            salutation = "How can I be of service?"
-        self.mic.say(salutation)
+            return "How can I be of service?"
+
+    def run(self):
+        if not self.greeted:
+            self.mic.say(self.get_salutation())
 
         conversation = Conversation("JASPER", self.mic, self.config)
         conversation.handleForever()
@@ -131,9 +220,15 @@ if __name__ == "__main__":
     if args.debug:
         logger.setLevel(logging.DEBUG)
 
-    if not args.no_network_check and not diagnose.check_network_connection():
-        logger.warning("Network not connected. This may prevent Jasper from " +
-                       "running properly.")
+    def warn_if_offline(connected):
+        if not connected:
+            logger.warning("Network not connected. This may prevent Jasper " +
+                           "from running properly.")
+
+    if not args.no_network_check:
+        # The engines that need the network wait for this check instead of
+        # running their own
+        diagnose.check_network_connection_async(callback=warn_if_offline)
 
     if args.diagnose:
         failed_checks = diagnose.run()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import unittest
+from client import alteration
+
+
+class TestAlteration(unittest.TestCase):
+    def testClean(self):
+        self.assertEqual(alteration.clean("It was 1995."), "It was 19 95.")
+
+    def testSplitSentences(self):
+        self.assertEqual(alteration.splitSentences(
+            "Pulling up the news. Here are the headlines! Want them?"),
+            ["Pulling up the news.", "Here are the headlines!",
+             "Want them?"])
+        # Abbreviations, initials and numbers don't end sentences
+        self.assertEqual(alteration.splitSentences(
+            "Dr. Smith met J. R. R. Tolkien at 3.5 pm. Really."),
+            ["Dr. Smith met J. R. R. Tolkien at 3.5 pm.", "Really."])
+        self.assertEqual(alteration.splitSentences("Hi"), ["Hi"])
+
+    def testSplitClauses(self):
+        sentence = "first clause, second clause, third clause"
+        self.assertEqual(alteration.splitSentences(sentence, max_length=30),
+                         ["first clause, second clause,", "third clause"])
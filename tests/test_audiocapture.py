@@ -0,0 +1,132 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import unittest
+import threading
+from client import audiocapture
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.ringbuffer = audiocapture.RingBuffer(8)
+
+    def testWriteAndRead(self):
+        self.ringbuffer.write('abc')
+        self.assertEqual(self.ringbuffer.position, 3)
+        self.assertEqual(len(self.ringbuffer), 3)
+        self.assertEqual(self.ringbuffer.read(0), 'abc')
+        self.assertEqual(self.ringbuffer.read(1, 1), 'b')
+
+    def testWrapAround(self):
+        self.ringbuffer.write('abcdef')
+        self.ringbuffer.write('ghij')
+        self.assertEqual(len(self.ringbuffer), 8)
+        # 'ab' has been overwritten, so reading starts at 'c'
+        self.assertEqual(self.ringbuffer.read(0), 'cdefghij')
+        self.assertEqual(self.ringbuffer.read(6), 'ghij')
+        self.assertEqual(self.ringbuffer.latest(3), 'hij')
+
+    def testOversizedWrite(self):
+        self.ringbuffer.write('0123456789')
+        self.assertEqual(self.ringbuffer.position, 10)
+        self.assertEqual(self.ringbuffer.latest(100), '23456789')
+
+    def testReadBeyondPosition(self):
+        self.ringbuffer.write('abc')
+        self.assertEqual(self.ringbuffer.read(3), '')
+
+
+class FakeStream(object):
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.exhausted = threading.Event()
+        self.closed = threading.Event()
+
+    def read(self, num_frames):
+        if not self.chunks:
+            self.exhausted.set()
+            self.closed.wait(0.01)
+            return '\x00\x00' * num_frames
+        chunk = self.chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeAudio(object):
+    def __init__(self, chunks):
+        self.stream = FakeStream(chunks)
+        self.opened = 0
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, **kwargs):
+        self.opened += 1
+        return self.stream
+
+
+class TestAudioCapture(unittest.TestCase):
+
+    def tearDown(self):
+        self.capture.close()
+
+    def testReadFillsRingBuffer(self):
+        self.capture = audiocapture.AudioCapture(
+            FakeAudio(['\x01\x00' * 4, '\x02\x00' * 4]), chunk=4)
+        frame = self.capture.read_frame(timeout=5)
+        self.assertEqual(frame.data, '\x01\x00' * 4)
+        self.assertEqual(frame.position, 8)
+        self.assertEqual(self.capture.read(), '\x02\x00' * 4)
+        self.assertEqual(self.capture.position, 16)
+        self.assertEqual(self.capture.preroll(1),
+                         '\x01\x00' * 4 + '\x02\x00' * 4)
+
+    def testThresholdWarmup(self):
+        warmup = 5
+        self.capture = audiocapture.AudioCapture(
+            FakeAudio(['\x30\x00' * 4] * warmup), chunk=4)
+        self.capture.noise_floor.warmup = warmup
+        threshold = self.capture.get_threshold()
+        self.assertAlmostEqual(threshold, 0x30 / 3.0 *
+                               self.capture.noise_floor.threshold_multiplier)
+
+    def testDropOldest(self):
+        audio = FakeAudio(['\x01\x00', '\x02\x00', '\x03\x00'])
+        self.capture = audiocapture.AudioCapture(audio, chunk=1, rate=2,
+                                                 queue_time=1)
+        self.capture.open()
+        audio.stream.exhausted.wait(5)
+        self.capture.flush()
+        self.assertGreaterEqual(self.capture.dropped, 1)
+        # Everything is still in the ring buffer
+        self.assertEqual(self.capture.ringbuffer.read(0, 6),
+                         '\x01\x00\x02\x00\x03\x00')
+
+    def testDropNewest(self):
+        audio = FakeAudio(['\x01\x00', '\x02\x00', '\x03\x00'])
+        self.capture = audiocapture.AudioCapture(
+            audio, chunk=1, rate=2, queue_time=1,
+            overflow_policy=audiocapture.AudioCapture.DROP_NEWEST)
+        self.capture.open()
+        audio.stream.exhausted.wait(5)
+        self.assertEqual(self.capture.read(), '\x01\x00')
+        self.assertEqual(self.capture.read(), '\x02\x00')
+        self.assertGreaterEqual(self.capture.dropped, 1)
+
+    def testReopenAfterError(self):
+        """
+        Is the capture restarted after the capture thread died?
+        """
+        audio = FakeAudio([IOError(-9999, 'Unanticipated host error'),
+                           '\x01\x00' * 4])
+        self.capture = audiocapture.AudioCapture(audio, chunk=4)
+        self.assertRaises(IOError, self.capture.read_frame, timeout=5)
+        self.assertEqual(self.capture.read(), '\x01\x00' * 4)
+        self.assertEqual(audio.opened, 2)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import math
+import struct
+import audioop
+import unittest
+from client import audioencoder, diagnose
+
+
+def sine(frequency=440, rate=16000, seconds=0.5, amplitude=8000):
+    return ''.join(struct.pack('<h', int(amplitude * math.sin(
+        2 * math.pi * frequency * i / rate)))
+        for i in range(int(rate * seconds)))
+
+
+class TestAudioEncoder(unittest.TestCase):
+    def setUp(self):
+        self.data = sine()
+
+    def testPCM(self):
+        encoded, stream = audioencoder.get_encoder('pcm').encode(self.data)
+        self.assertEqual(encoded, self.data)
+        self.assertEqual(stream.bytes_saved, 0)
+
+    def testULaw(self):
+        """
+        Does µ-law halve the size without distorting the audio much?
+        """
+        encoded, stream = audioencoder.get_encoder('ulaw').encode(self.data)
+        self.assertEqual(len(encoded), len(self.data) / 2)
+        self.assertEqual(stream.bytes_saved, len(self.data) / 2)
+        decoded = audioop.ulaw2lin(encoded, 2)
+        error = audioop.rms(audioop.add(
+            decoded, audioop.mul(self.data, 2, -1), 2), 2)
+        self.assertLess(error, audioop.rms(self.data, 2) * 0.05)
+
+    def testStreaming(self):
+        """
+        Is incrementally encoded audio the same as encoding it at once?
+        """
+        encoder = audioencoder.get_encoder('ulaw')
+        stream = encoder.open()
+        encoded = ''.join(stream.write(self.data[i:i + 1000])
+                          for i in range(0, len(self.data), 1000))
+        encoded += stream.close()
+        self.assertEqual(encoded, encoder.encode(self.data)[0])
+        self.assertEqual(stream.raw_bytes, len(self.data))
+
+    @unittest.skipUnless(diagnose.check_executable('flac'),
+                         "flac not present")
+    def testFlac(self):
+        encoded, stream = audioencoder.get_encoder('flac').encode(self.data)
+        self.assertTrue(encoded.startswith('fLaC'))
+        self.assertGreater(stream.bytes_saved, 0)
+
+    def testUnknownEncoder(self):
+        with self.assertRaises(ValueError):
+            audioencoder.get_encoder('mp3')
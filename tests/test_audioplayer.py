@@ -0,0 +1,148 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import time
+import Queue
+import unittest
+import threading
+from client import audioplayer, jasperpath
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.written = []
+        self.stopped = True
+        self.starts = 0
+        self.write_delay = 0
+
+    def is_stopped(self):
+        return self.stopped
+
+    def start_stream(self):
+        self.starts += 1
+        self.stopped = False
+
+    def stop_stream(self):
+        self.stopped = True
+
+    def write(self, data):
+        time.sleep(self.write_delay)
+        self.written.append(data)
+
+    def close(self):
+        pass
+
+
+class FakeAudio(object):
+    def __init__(self):
+        self.stream = FakeStream()
+        self.opened = 0
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, **kwargs):
+        self.opened += 1
+        return self.stream
+
+
+class TestConvert(unittest.TestCase):
+    def testMonoToStereo(self):
+        clip = audioplayer.Clip('\x01\x00\x02\x00' * 500, 22050, 2, 1)
+        converted = audioplayer.convert(clip, 44100, 2, 2)
+        # Twice the rate, twice the channels (give or take a frame)
+        self.assertAlmostEqual(len(converted.data), 4 * len(clip.data),
+                               delta=8)
+        self.assertEqual(converted.channels, 2)
+
+    def testWidth(self):
+        clip = audioplayer.Clip('\x00\x00\x00\x01', 16000, 4, 1)
+        self.assertEqual(audioplayer.convert(clip, 16000, 2, 1).data,
+                         '\x00\x01')
+
+
+class TestAudioPlayer(unittest.TestCase):
+    def setUp(self):
+        self.audio = FakeAudio()
+        self.player = audioplayer.AudioPlayer(self.audio, chunk=256)
+
+    def tearDown(self):
+        self.player.close()
+
+    def testPlay(self):
+        """
+        Are queued clips played in order through one stream?
+        """
+        beep = jasperpath.data('audio', 'beep_hi.wav')
+        self.player.preload(beep)
+        first = self.player.play(beep, block=False)
+        second = self.player.play(beep)
+        self.assertTrue(first.done)
+        self.assertTrue(second.done)
+        self.assertEqual(self.audio.opened, 1)
+        self.assertEqual(''.join(self.audio.stream.written),
+                         audioplayer.load_wav(beep).data * 2)
+
+    def testCancel(self):
+        self.audio.stream.write_delay = 0.01
+        clip = audioplayer.Clip('\x00' * 1024 * 400, 44100, 2, 2)
+        playback = self.player.play_clip(clip, block=False)
+        threading.Timer(0.05, playback.cancel).start()
+        self.assertTrue(playback.wait(5))
+        self.assertLess(len(self.audio.stream.written), 400)
+
+    def testCancelAll(self):
+        self.audio.stream.write_delay = 0.01
+        clip = audioplayer.Clip('\x00' * 1024 * 400, 44100, 2, 2)
+        first = self.player.play_clip(clip, block=False)
+        second = self.player.play_clip(clip, block=False)
+        threading.Timer(0.05, self.player.cancel_all).start()
+        self.assertTrue(first.wait(5))
+        self.assertTrue(second.wait(5))
+        self.assertTrue(second.cancelled)
+        self.assertLess(len(self.audio.stream.written), 400)
+
+    def testCancelAllWhileDequeuing(self):
+        """
+        Is a clip skipped if cancel_all() runs right after the playback
+        thread took it off the queue?
+        """
+        player = self.player
+
+        class RacyQueue(Queue.Queue):
+            def get(self, *args, **kwargs):
+                item = Queue.Queue.get(self, *args, **kwargs)
+                if item is not None:
+                    player.cancel_all()
+                return item
+
+        player._queue = RacyQueue()
+        clip = audioplayer.Clip('\x00' * 1024 * 4, 44100, 2, 2)
+        playback = player.play_clip(clip, block=False)
+        self.assertTrue(playback.wait(5))
+        self.assertTrue(playback.cancelled)
+        self.assertEqual(self.audio.stream.written, [])
+
+    def testStream(self):
+        """
+        Is streamed audio converted and played as it arrives?
+        """
+        playback = self.player.open_stream(44100, 2, 1)
+        playback.write('\x01\x00\x02')
+        playback.write('\x00' * 1023)
+        playback.close()
+        self.assertTrue(playback.wait(5))
+        self.assertEqual(''.join(self.audio.stream.written)[:8],
+                         '\x01\x00\x01\x00\x02\x00\x02\x00')
+        # 513 mono frames
+        self.assertEqual(len(''.join(self.audio.stream.written)), 2052)
+
+
+class TestParseWavHeader(unittest.TestCase):
+    def testHeader(self):
+        with open(jasperpath.data('audio', 'time.wav'), 'rb') as f:
+            data = f.read(100)
+        self.assertIsNone(audioplayer.parse_wav_header(data[:20]))
+        self.assertEqual(audioplayer.parse_wav_header(data),
+                         (16000, 2, 1, 44))
+        with self.assertRaises(ValueError):
+            audioplayer.parse_wav_header('ID3' + '\x00' * 20)
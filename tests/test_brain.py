@@ -2,7 +2,7 @@
 # -*- coding: utf-8-*-
 import unittest
 import mock
-from client import brain, test_mic
+from client import brain, test_mic, stt
 
 
 DEFAULT_PROFILE = {
@@ -47,3 +47,37 @@ class TestBrain(unittest.TestCase):
         with mock.patch.object(hn, 'handle') as mocked_handle:
             my_brain.query(["hacker news"])
             self.assertTrue(mocked_handle.called)
+
+    def testAllFiltered(self):
+        """Does Brain reach the Unclear module if nothing was heard?"""
+        my_brain = TestBrain._emptyBrain()
+        unclear = my_brain.modules[-1]
+        transcription = stt.Transcription.from_texts(['', 'WATT TIME'],
+                                                     'test', 0.1,
+                                                     confidences=[0.0, 0.05])
+        with mock.patch.object(unclear, 'handle') as mocked_handle:
+            my_brain.query(transcription)
+            self.assertTrue(mocked_handle.called)
+
+    def testCandidates(self):
+        """Does Brain skip unlikely hypotheses and stop at a confident one?"""
+        my_brain = TestBrain._emptyBrain()
+        transcription = stt.Transcription.from_texts(
+            ['', 'WHAT TIME', 'WHAT IS THE TIME', 'WATT TIME'], 'test', 0.1,
+            confidences=[0.0, 0.5, 0.3, 0.05])
+        self.assertEqual(my_brain.get_candidates(transcription),
+                         ['WHAT TIME', 'WHAT IS THE TIME'])
+
+        transcription = stt.Transcription.from_texts(
+            ['WHAT TIME', 'WHAT IS THE TIME'], 'test', 0.1,
+            confidences=[0.9, 0.5])
+        self.assertEqual(my_brain.get_candidates(transcription),
+                         ['WHAT TIME'])
+
+        # If nothing is left, the empty text still reaches Unclear
+        transcription = stt.Transcription.from_texts(
+            ['', 'WATT TIME'], 'test', 0.1, confidences=[0.0, 0.05])
+        self.assertEqual(my_brain.get_candidates(transcription), [''])
+
+        # Plain lists are passed through unchanged
+        self.assertEqual(my_brain.get_candidates(['A', 'B']), ['A', 'B'])
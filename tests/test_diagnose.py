@@ -1,5 +1,6 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8-*-
+import time
 import unittest
 from client import diagnose
 
@@ -10,3 +11,42 @@ class TestDiagnose(unittest.TestCase):
         self.assertTrue(diagnose.check_python_import("os"))
         # I sincerly hope nobody will ever create a package with that name
         self.assertFalse(diagnose.check_python_import("nonexistant_package"))
+
+    def testCache(self):
+        """Are check results cached per argument until they expire?"""
+        calls = []
+
+        @diagnose.cached(0.2)
+        def check(name, suffix='!'):
+            calls.append(name)
+            return name + suffix
+
+        self.assertEqual(check('a'), 'a!')
+        self.assertEqual(check('a', suffix='!'), 'a!')
+        self.assertEqual(check('b'), 'b!')
+        self.assertEqual(calls, ['a', 'b'])
+        time.sleep(0.25)
+        check('a')
+        self.assertEqual(calls, ['a', 'b', 'a'])
+
+    def testCheckEngines(self):
+        """Are engines probed in parallel and only once?"""
+        started = []
+
+        def make_engine(available):
+            class Engine(object):
+                @classmethod
+                def is_available(cls):
+                    started.append(cls)
+                    time.sleep(0.2)
+                    return available
+            return Engine
+
+        engines = [make_engine(True), make_engine(False), make_engine(True)]
+        start = time.time()
+        results = diagnose.check_engines(engines)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual([results[engine] for engine in engines],
+                         [True, False, True])
+        self.assertFalse(diagnose.check_engine(engines[1]))
+        self.assertEqual(len(started), 3)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import time
+import unittest
+import threading
+import BaseHTTPServer
+import mock
+import requests
+from client import httptransport
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def testPercentile(self):
+        histogram = httptransport.LatencyHistogram(buckets=(0.1, 1.0))
+        self.assertIsNone(histogram.percentile(50))
+        for latency in (0.05, 0.05, 0.5, 0.7, 3.0):
+            histogram.add(latency)
+        self.assertEqual(histogram.counts, [2, 2, 1])
+        self.assertEqual(histogram.percentile(40), 0.1)
+        self.assertEqual(histogram.percentile(80), 1.0)
+        self.assertIsNone(histogram.percentile(100))
+        self.assertAlmostEqual(histogram.mean, 0.86)
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = httptransport.Transport('test', retries=2)
+        self.transport.session = mock.Mock()
+        patcher = mock.patch('time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self, status_code):
+        r = mock.Mock()
+        r.status_code = status_code
+        return r
+
+    def testRetries(self):
+        """
+        Are connection errors and server errors retried?
+        """
+        self.transport.session.request.side_effect = [
+            requests.exceptions.ConnectionError(),
+            self.response(503),
+            self.response(200)]
+        r = self.transport.post('http://localhost/', data='abc')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.transport.session.request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.transport.latency.count, 3)
+        for args, kwargs in self.transport.session.request.call_args_list:
+            self.assertEqual(kwargs['timeout'], self.transport.timeout)
+
+    def testBoundedRetries(self):
+        """
+        Is the last error raised once all retries failed?
+        """
+        self.transport.session.request.side_effect = \
+            requests.exceptions.Timeout()
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.transport.get('http://localhost/')
+        self.assertEqual(self.transport.session.request.call_count, 3)
+
+    def testClientErrorNotRetried(self):
+        self.transport.session.request.return_value = self.response(403)
+        r = self.transport.post('http://localhost/')
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(self.transport.session.request.call_count, 1)
+
+
+class StalledHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Reads the whole request, but never answers.
+    """
+
+    def do_POST(self):
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            self.rfile.read(size + 2)
+            if not size:
+                break
+        self.server.release.wait(10)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestStreamingUpload(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                StalledHandler)
+        self.server.release = threading.Event()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testStalledServer(self):
+        """
+        Does finish() give up on a server that doesn't respond?
+        """
+        transport = httptransport.Transport('test', read_timeout=0.5,
+                                            retries=0)
+        upload = httptransport.StreamingUpload(
+            transport, 'http://127.0.0.1:%d/' % self.server.server_address[1])
+        upload.write('abc')
+        start = time.time()
+        with self.assertRaises(requests.exceptions.RequestException):
+            upload.finish()
+        self.assertLess(time.time() - start, 5)
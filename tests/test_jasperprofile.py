@@ -0,0 +1,55 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import os
+import shutil
+import tempfile
+import unittest
+from client import jasperprofile
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'profile.yml')
+        self.profile = jasperprofile.Profile(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def testMissingFile(self):
+        self.assertFalse(self.profile.exists)
+        self.assertEqual(self.profile.data, {})
+        self.assertEqual(self.profile.section('pocketsphinx'), {})
+
+    def testParsedOnce(self):
+        """
+        Is the file only parsed again after it changed?
+        """
+        self.write("stt_engine: sphinx\n")
+        for i in range(5):
+            self.assertEqual(self.profile['stt_engine'], 'sphinx')
+        self.assertEqual(self.profile.loads, 1)
+
+        self.write("stt_engine: witai\n")
+        self.assertEqual(self.profile['stt_engine'], 'witai')
+        self.assertEqual(self.profile.loads, 2)
+
+    def testSection(self):
+        """
+        Are section values converted to the types in the schema?
+        """
+        self.write("pocketsphinx:\n" +
+                   "    hmm_dir: /tmp/hmm\n" +
+                   "    keyphrase_threshold: '1e-10'\n" +
+                   "    nbest: three\n" +
+                   "    unknown: 42\n")
+        self.assertEqual(self.profile.section('pocketsphinx'),
+                         {'hmm_dir': '/tmp/hmm',
+                          'keyphrase_threshold': 1e-10,
+                          'unknown': 42})
+        self.assertEqual(self.profile.section('pocketsphinx', 'hmm_dir'),
+                         {'hmm_dir': '/tmp/hmm'})
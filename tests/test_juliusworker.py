@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import os
+import sys
+import shutil
+import tempfile
+import textwrap
+import unittest
+from client import juliusworker
+
+RECOGOUT = """<RECOGOUT>
+  <SHYPO RANK="1" SCORE="-1234.5">
+    <WHYPO WORD="<s>" CLASSID="0" PHONE="sil" CM="1.000"/>
+    <WHYPO WORD="WHAT" CLASSID="1" PHONE="w ah t" CM="0.9"/>
+    <WHYPO WORD="TIME" CLASSID="2" PHONE="t ay m" CM="0.8"/>
+    <WHYPO WORD="</s>" CLASSID="3" PHONE="sil" CM="1.000"/>
+  </SHYPO>
+  <SHYPO RANK="2" SCORE="-1240.0">
+    <WHYPO WORD="<s>" CLASSID="0" PHONE="sil" CM="1.000"/>
+    <WHYPO WORD="TIME" CLASSID="2" PHONE="t ay m" CM="0.7"/>
+    <WHYPO WORD="</s>" CLASSID="3" PHONE="sil" CM="1.000"/>
+  </SHYPO>
+</RECOGOUT>
+"""
+
+# A stand-in for julius that answers every segment with the number of bytes
+# it received. If CRASH_FILE doesn't exist yet, it creates it and exits
+# instead of answering.
+FAKE_JULIUS = textwrap.dedent("""
+    import os
+    import sys
+    import socket
+    import struct
+
+    args = sys.argv[1:]
+    crash_file = args[args.index('-crashfile') + 1]
+
+    def accept(port):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('127.0.0.1', port))
+        server.listen(1)
+        return server.accept()[0]
+
+    def recv(sock, length):
+        data = ''
+        while len(data) < length:
+            chunk = sock.recv(length - len(data))
+            if not chunk:
+                sys.exit(0)
+            data += chunk
+        return data
+
+    print 'STAT: fake julius started'
+    sys.stdout.flush()
+    module = accept(int(args[args.index('-module') + 1]))
+    adin = accept(int(args[args.index('-adport') + 1]))
+    received = 0
+    while True:
+        length = struct.unpack('<i', recv(adin, 4))[0]
+        if length:
+            received += len(recv(adin, length))
+            continue
+        if not os.path.exists(crash_file):
+            open(crash_file, 'w').close()
+            os._exit(1)
+        module.sendall('<RECOGOUT>\\n<SHYPO RANK="1">\\n' +
+                       '<WHYPO WORD="<s>"/>\\n' +
+                       '<WHYPO WORD="%d"/>\\n' % received +
+                       '<WHYPO WORD="</s>"/>\\n</SHYPO>\\n</RECOGOUT>\\n.\\n')
+        received = 0
+""")
+
+
+class TestParseMessage(unittest.TestCase):
+    def testRecogout(self):
+        results = juliusworker.parse_message(RECOGOUT)
+        self.assertEqual([text for text, confidence in results],
+                         ['WHAT TIME', 'TIME'])
+        # Confidences are the mean CM of the words, without <s> and </s>
+        self.assertAlmostEqual(results[0][1], 0.85)
+        self.assertAlmostEqual(results[1][1], 0.7)
+
+    def testRecogfail(self):
+        self.assertEqual(juliusworker.parse_message('<RECOGFAIL/>\n'), [])
+
+    def testOtherMessage(self):
+        self.assertIsNone(juliusworker.parse_message(
+            '<INPUT STATUS="LISTEN" TIME="1234"/>\n'))
+
+
+class TestJuliusWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        script = os.path.join(self.tmpdir, 'julius.py')
+        with open(script, 'w') as f:
+            f.write(FAKE_JULIUS)
+        self.crash_file = os.path.join(self.tmpdir, 'crashed')
+        self.worker = juliusworker.JuliusWorker(
+            [script, '-crashfile', self.crash_file],
+            executable=sys.executable, startup_timeout=10)
+
+    def tearDown(self):
+        self.worker.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def testRestartAfterCrash(self):
+        """
+        Is Julius restarted (and the utterance retried) after a crash?
+        """
+        self.assertEqual(self.worker.recognize('\x00' * 320), [('320', None)])
+        self.assertTrue(os.path.exists(self.crash_file))
+        self.assertEqual(self.worker.starts, 2)
+
+    def testStreaming(self):
+        """
+        Does the process stay up for several streamed utterances?
+        """
+        open(self.crash_file, 'w').close()
+        self.worker.start()
+        for i in range(3):
+            self.worker.send('\x00' * 100)
+            self.worker.send('\x00' * 60)
+            self.assertEqual(self.worker.end_segment(), [('160', None)])
+        self.assertEqual(self.worker.starts, 1)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import imp
+import unittest
+import mock
+from client import stt
+
+
+def pyaudio_installed():
+    try:
+        imp.find_module('pyaudio')
+    except ImportError:
+        return False
+    else:
+        return True
+
+
+class FakeNoiseFloor(object):
+    threshold = 100
+
+
+class FakeCapture(object):
+    rate = 16000
+    chunk = 1024
+    width = 2
+
+    def __init__(self):
+        self.noise_floor = FakeNoiseFloor()
+        self.loud = True
+        self.flushes = 0
+        self.position = 0
+        self.ringbuffer = self
+
+    def flush(self):
+        self.flushes += 1
+
+    def read(self, start=None, length=None):
+        if start is not None:
+            # RingBuffer.read()
+            return '\x01\x00' * (length // 2)
+        sample = '\xff\x3f' if self.loud else '\x00\x00'
+        self.position += self.chunk * self.width
+        return sample * self.chunk
+
+    def preroll(self, seconds):
+        return self.read()
+
+    def get_threshold(self):
+        return self.noise_floor.threshold
+
+
+class FakeDecoder(object):
+    """
+    Stands in for a PocketSphinx engine in keyphrase search mode. It hears
+    the keyphrase after a number of chunks have been fed.
+    """
+    keyphrase = 'JASPER'
+
+    def __init__(self, hear_after=None):
+        self.hear_after = hear_after
+        self.started = 0
+        self.finished = 0
+        self.fed = 0
+
+    def start_utterance(self, rate, width):
+        self.started += 1
+        self.fed = 0
+
+    def feed_utterance(self, data):
+        self.fed += 1
+
+    def get_partial_transcription(self):
+        if self.hear_after is not None and self.fed >= self.hear_after:
+            return ['JASPER']
+        return []
+
+    def finish_utterance(self):
+        self.finished += 1
+        return []
+
+
+@unittest.skipUnless(pyaudio_installed(), "PyAudio not present")
+class TestKeyphraseSpotting(unittest.TestCase):
+    def setUp(self):
+        from client import mic
+        self.capture = FakeCapture()
+        self.speaker = mock.Mock()
+
+        def create(decoder):
+            return mic.Mic(self.speaker, decoder, mock.Mock(),
+                           capture=self.capture, speech=mock.Mock())
+        self.create = create
+
+    def testKeyphrase(self):
+        """
+        Is the keyphrase spotted and the utterance reset after the hit?
+        """
+        decoder = FakeDecoder(hear_after=3)
+        my_mic = self.create(decoder)
+        self.assertEqual(my_mic.passiveListen('JASPER'), (100, 'JASPER'))
+        self.assertEqual(decoder.fed, 3)
+        self.assertEqual((decoder.started, decoder.finished), (1, 1))
+        self.assertTrue(my_mic.speech.cancel_all.called)
+
+        # The next call starts a new utterance
+        decoder.hear_after = 1
+        self.assertEqual(my_mic.passiveListen('JASPER'), (100, 'JASPER'))
+        self.assertEqual((decoder.started, decoder.finished), (2, 2))
+
+    def testUtteranceKeptOpen(self):
+        """
+        Does the utterance stay open across calls that hear nothing?
+        """
+        decoder = FakeDecoder()
+        my_mic = self.create(decoder)
+        my_mic.KEYPHRASE_UTTERANCE_TIME = 1000
+        self.assertEqual(my_mic.passiveListen('JASPER'), (None, None))
+        fed = decoder.fed
+        self.assertGreater(fed, 0)
+
+        decoder.hear_after = fed + 2
+        self.assertEqual(my_mic.passiveListen('JASPER'), (100, 'JASPER'))
+        self.assertEqual((decoder.started, decoder.finished), (1, 1))
+        self.assertEqual(self.capture.flushes, 1)
+
+    def testSilence(self):
+        """
+        Is silence skipped instead of decoded?
+        """
+        self.capture.loud = False
+        decoder = FakeDecoder()
+        my_mic = self.create(decoder)
+        self.assertEqual(my_mic.passiveListen('JASPER'), (None, None))
+        self.assertEqual(decoder.fed, 0)
+
+
+@unittest.skipUnless(pyaudio_installed(), "PyAudio not present")
+class TestPassiveListen(unittest.TestCase):
+    def testTranscribePcm(self):
+        """
+        Is the recorded audio passed to the engine as raw PCM?
+        """
+        from client import mic
+        capture = FakeCapture()
+        engine = mock.Mock(spec=['transcribe_pcm'])
+        engine.transcribe_pcm.return_value = ['JASPER']
+        my_mic = mic.Mic(mock.Mock(), engine, mock.Mock(), capture=capture,
+                         speech=mock.Mock())
+        self.assertEqual(my_mic.passiveListen('JASPER')[1], 'JASPER')
+        data, rate, width = engine.transcribe_pcm.call_args[0]
+        self.assertEqual((rate, width), (16000, 2))
+        # 20 chunks before the disturbance and one second after it
+        self.assertEqual(len(data), (20 + 16000 / 1024) * 1024 * 2)
+
+
+class TestKeyphraseConfig(unittest.TestCase):
+    def getPassiveInstance(self, config):
+        profile = mock.Mock()
+        profile.section.return_value = config
+        with mock.patch('client.jasperprofile.get_profile',
+                        return_value=profile), \
+                mock.patch('client.vocabcompiler.get_keyword_phrases',
+                           return_value=['JASPER', 'TIME']), \
+                mock.patch.object(stt.PocketSphinxSTT,
+                                  'get_instance') as get_instance:
+            stt.PocketSphinxSTT.get_passive_instance()
+        return get_instance.call_args
+
+    def testKeyphrase(self):
+        """
+        Is the keyphrase uppercased and added to the dictionary?
+        """
+        args, kwargs = self.getPassiveInstance(
+            {'keyphrase': 'hey jasper', 'keyphrase_threshold': 1e-10})
+        self.assertEqual(args, ('keyword', ['HEY', 'JASPER', 'TIME']))
+        self.assertEqual(kwargs, {'keyphrase': 'HEY JASPER',
+                                  'keyphrase_threshold': 1e-10})
+
+    def testNoKeyphrase(self):
+        args, kwargs = self.getPassiveInstance({})
+        self.assertEqual(args, ('keyword', ['JASPER', 'TIME']))
+        self.assertEqual(kwargs, {})
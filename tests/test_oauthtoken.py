@@ -0,0 +1,82 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import os
+import stat
+import time
+import shutil
+import tempfile
+import unittest
+from client import oauthtoken
+
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tokens.json')
+        self.fetched = []
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.cancel()
+        shutil.rmtree(self.tmpdir)
+
+    def fetch(self, expires_in=3600):
+        def fetch():
+            self.fetched.append(time.time())
+            return ('token%d' % len(self.fetched), expires_in)
+        return fetch
+
+    def create(self, fetch, **kwargs):
+        manager = oauthtoken.TokenManager('test', 'client', fetch,
+                                          path=self.path, **kwargs)
+        self.managers.append(manager)
+        return manager
+
+    def waitForFetches(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while len(self.fetched) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def testPersisted(self):
+        """
+        Is a cached token used after a restart without fetching a new one?
+        """
+        manager = self.create(self.fetch())
+        self.waitForFetches(1)
+        self.assertEqual(manager.token, 'token1')
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+        manager.cancel()
+
+        manager = self.create(self.fetch())
+        self.assertEqual(manager.token, 'token1')
+        self.assertEqual(manager.fetches, 0)
+        self.assertEqual(len(self.fetched), 1)
+
+    def testProactiveRefresh(self):
+        """
+        Is the token refreshed in the background before it expires?
+        """
+        manager = self.create(self.fetch(expires_in=0.4), margin=0.3)
+        self.waitForFetches(3)
+        manager.cancel()
+        self.assertGreaterEqual(len(self.fetched), 3)
+        self.assertEqual(manager.token, 'token%d' % len(self.fetched))
+
+    def testInvalidate(self):
+        manager = self.create(self.fetch())
+        self.waitForFetches(1)
+        manager.invalidate('token1')
+        self.assertEqual(manager.token, 'token2')
+        # A stale rejection doesn't cause another refresh
+        manager.invalidate('token1')
+        self.assertEqual(manager.token, 'token2')
+        self.assertEqual(len(self.fetched), 2)
+
+    def testShared(self):
+        first = oauthtoken.get_token_manager('shared-test', 'client',
+                                             self.fetch(), path=self.path)
+        second = oauthtoken.get_token_manager('shared-test', 'client',
+                                              self.fetch(), path=self.path)
+        self.managers.append(first)
+        self.assertIs(first, second)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import time
+import unittest
+import threading
+from client import speechqueue
+
+
+class TestSpeechQueue(unittest.TestCase):
+    def setUp(self):
+        self.said = []
+        self.stopped = threading.Event()
+        self.queue = speechqueue.SpeechQueue(self.say, self.stopped.set)
+
+    def say(self, phrase, speech):
+        # Takes a while, unless it's stopped
+        self.said.append(phrase)
+        deadline = time.time() + 0.1
+        while not speech.cancelled and time.time() < deadline:
+            time.sleep(0.005)
+
+    def testOrder(self):
+        """
+        Does put() return right away and are phrases said in order?
+        """
+        start = time.time()
+        first = self.queue.put('One.')
+        second = self.queue.put('Two.')
+        self.assertLess(time.time() - start, 0.05)
+        self.assertFalse(second.done)
+        self.assertTrue(second.wait(5))
+        self.assertTrue(first.done)
+        self.assertEqual(self.said, ['One.', 'Two.'])
+
+    def testCancelQueued(self):
+        first = self.queue.put('One.')
+        second = self.queue.put('Two.')
+        second.cancel()
+        self.assertTrue(first.wait(5))
+        self.assertTrue(second.wait(5))
+        self.assertEqual(self.said, ['One.'])
+        self.assertFalse(self.stopped.is_set())
+
+    def testCancelAll(self):
+        """
+        Does cancel_all() interrupt the current phrase and drop the rest
+        (barge-in)?
+        """
+        first = self.queue.put('One.')
+        second = self.queue.put('Two.')
+        while not self.said:
+            time.sleep(0.005)
+        start = time.time()
+        self.queue.cancel_all()
+        self.assertTrue(first.wait(5))
+        self.assertTrue(second.wait(5))
+        self.assertLess(time.time() - start, 0.09)
+        self.assertTrue(self.stopped.is_set())
+        self.assertEqual(self.said, ['One.'])
+
+    def testNothingStartsAfterCancelAll(self):
+        """
+        Is a phrase that was being taken off the queue never started after
+        cancel_all() has returned?
+        """
+        for i in range(20):
+            speech = self.queue.put('Hello')
+            self.queue.cancel_all()
+            said = len(self.said)
+            self.assertTrue(speech.wait(5))
+            self.assertTrue(speech.cancelled)
+            self.assertEqual(len(self.said), said)
+
+    def testSaid(self):
+        speech = speechqueue.said('Hello')
+        self.assertTrue(speech.done)
+        self.assertTrue(speech.wait(0))
+
+
+class TestSayText(unittest.TestCase):
+    class FakeSpeaker(object):
+        def __init__(self):
+            self.said = []
+
+        def say_all(self, phrases, is_cancelled=None):
+            for phrase in phrases:
+                if is_cancelled():
+                    break
+                self.said.append(phrase)
+
+        def stop(self):
+            pass
+
+    def testSentences(self):
+        """
+        Is a text said sentence by sentence?
+        """
+        speaker = self.FakeSpeaker()
+        speechqueue.say_text(speaker, 'Good morning. How are you?')
+        self.assertEqual(speaker.said, ['Good morning.', 'How are you?'])
+
+    def testQueue(self):
+        speaker = self.FakeSpeaker()
+        queue = speechqueue.for_speaker(speaker)
+        self.assertTrue(queue.put('Hello. Bye.').wait(5))
+        self.assertEqual(speaker.said, ['Hello.', 'Bye.'])
@@ -2,6 +2,12 @@
 # -*- coding: utf-8-*-
 import unittest
 import imp
+import wave
+import threading
+import time
+import tempfile
+import BaseHTTPServer
+import mock
 from client import stt, jasperpath
 
 
@@ -49,3 +55,326 @@ class TestSTT(unittest.TestCase):
         with open(self.time_clip, mode="rb") as f:
             transcription = self.active_stt_engine.transcribe(f)
         self.assertIn("TIME", transcription)
+
+    def testSharedDecoder(self):
+        """
+        Do passive and active listening share one decoder?
+        """
+        self.assertIs(self.passive_stt_engine._decoder,
+                      self.active_stt_engine._decoder)
+        with open(self.time_clip, mode="rb") as f:
+            self.active_stt_engine.transcribe(f)
+        with open(self.jasper_clip, mode="rb") as f:
+            transcription = self.passive_stt_engine.transcribe(f)
+        self.assertIn("JASPER", transcription)
+
+
+class TestSharedDecoderLock(unittest.TestCase):
+    """
+    Runs the PocketSphinx utterance methods on a stand-in decoder.
+    """
+
+    def setUp(self):
+        self.shared = mock.Mock()
+        self.shared.lock = threading.Semaphore(1)
+        self.shared.decoder.hyp.return_value = None
+        self.engine = stt.PocketSphinxSTT.__new__(stt.PocketSphinxSTT)
+        self.engine._logger = mock.Mock()
+        self.engine._shared = self.shared
+        self.engine._decoder = self.shared.decoder
+        self.engine._search = 'default'
+        self.engine.nbest = 1
+        self.engine.keyphrase = None
+
+    def isLockedElsewhere(self):
+        acquired = []
+
+        def try_lock():
+            acquired.append(self.shared.lock.acquire(False))
+            if acquired[0]:
+                self.shared.lock.release()
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return not acquired[0]
+
+    def testUtteranceHoldsLock(self):
+        """
+        Is the shared decoder locked from start_utterance() until
+        finish_utterance()?
+        """
+        self.engine.start_utterance()
+        self.engine.feed_utterance('\x00\x00' * 10)
+        self.assertTrue(self.isLockedElsewhere())
+        self.assertEqual(self.engine.finish_utterance(), [''])
+        self.assertFalse(self.isLockedElsewhere())
+        self.shared.use_search.assert_called_once_with('default')
+
+    def testTranscribeReleasesLock(self):
+        self.assertEqual(self.engine.transcribe_pcm('\x00\x00' * 10), [''])
+        self.assertFalse(self.isLockedElsewhere())
+
+    def testHedgedStreaming(self):
+        """
+        Is the lock released when HedgedSTT finishes the utterance on
+        another thread?
+        """
+        hyp = mock.Mock(hypstr='WHAT TIME', prob=0)
+        self.shared.decoder.hyp.return_value = hyp
+        self.shared.decoder.get_logmath.return_value.exp.return_value = 0.9
+        self.engine.SLUG = 'sphinx'
+        hedged = stt.HedgedSTT([self.engine])
+        hedged.start_utterance()
+        hedged.feed_utterance('\x00\x00' * 10)
+        self.assertEqual(hedged.finish_utterance(), ['WHAT TIME'])
+        self.assertFalse(self.isLockedElsewhere())
+
+
+class TestJuliusFailure(unittest.TestCase):
+    def testRecognizeFails(self):
+        """
+        Is an empty transcription returned if Julius keeps failing?
+        """
+        engine = stt.JuliusSTT.__new__(stt.JuliusSTT)
+        engine._logger = mock.Mock()
+        engine._worker = mock.Mock()
+        engine._worker.start.side_effect = RuntimeError('Julius died')
+        engine._worker.recognize.side_effect = RuntimeError('Julius died')
+        transcription = engine.transcribe_pcm('\x00\x00' * 10)
+        self.assertEqual(transcription, [])
+        self.assertEqual(transcription.hypotheses, [])
+        self.assertTrue(engine._logger.error.called)
+
+
+class TestUtteranceFallback(unittest.TestCase):
+    class RecordingSTT(stt.AbstractSTTEngine):
+        @classmethod
+        def is_available(cls):
+            return True
+
+        def transcribe(self, fp):
+            wav = wave.open(fp, 'rb')
+            self.params = (wav.getframerate(), wav.getsampwidth())
+            self.channels = wav.getnchannels()
+            self.frames = wav.readframes(wav.getnframes())
+            return ['DONE']
+
+    def testFallbackCollectsChunks(self):
+        """
+        Does the default streaming API transcribe all fed chunks at once?
+        """
+        engine = self.RecordingSTT()
+        engine.start_utterance(8000, 2)
+        engine.feed_utterance('\x00\x01' * 10)
+        engine.feed_utterance('\x02\x03' * 10)
+        self.assertEqual(engine.get_partial_transcription(), [])
+        self.assertEqual(engine.finish_utterance(), ['DONE'])
+        self.assertEqual(engine.params, (8000, 2))
+        self.assertEqual(engine.frames, '\x00\x01' * 10 + '\x02\x03' * 10)
+
+    def testTranscribePcm(self):
+        """
+        Is raw PCM wrapped into an in-memory WAV file for transcribe()?
+        """
+        engine = self.RecordingSTT()
+        self.assertEqual(engine.transcribe_pcm('\x00\x01' * 10, 8000, 2),
+                         ['DONE'])
+        self.assertEqual(engine.params, (8000, 2))
+        self.assertEqual(engine.channels, 1)
+        self.assertEqual(engine.frames, '\x00\x01' * 10)
+
+    def testFinishUtterance(self):
+        """
+        Are the chunks joined and passed to transcribe_pcm() with the
+        utterance's rate and width?
+        """
+        engine = self.RecordingSTT()
+        engine.start_utterance(44100, 4)
+        engine.feed_utterance('\x00\x01\x02\x03')
+        engine.feed_utterance('\x04\x05\x06\x07')
+        with mock.patch.object(engine, 'transcribe_pcm',
+                               return_value=['DONE']) as transcribe_pcm:
+            self.assertEqual(engine.finish_utterance(), ['DONE'])
+        transcribe_pcm.assert_called_once_with(
+            '\x00\x01\x02\x03\x04\x05\x06\x07', 44100, 4)
+
+
+class GoogleStandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers like the Google Speech API and records what it received.
+    """
+
+    def do_POST(self):
+        server = self.server
+        chunked = self.headers.get('transfer-encoding') == 'chunked'
+        body = ''
+        if chunked:
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+                server.chunk_received.set()
+        else:
+            body = self.rfile.read(int(self.headers['content-length']))
+        server.requests.append((chunked, body))
+        if chunked and server.fail_streaming:
+            self.send_response(503)
+            self.end_headers()
+            return
+        response = ('{"result":[]}\n' +
+                    '{"result":[{"alternative":[{"transcript":"what time ' +
+                    'is it","confidence":0.92},{"transcript":"what time ' +
+                    'is this"}]}]}\n')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestStreamingUpload(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                GoogleStandInHandler)
+        self.server.requests = []
+        self.server.chunk_received = threading.Event()
+        self.server.fail_streaming = False
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.engine = stt.GoogleSTT(api_key='KEY', retries=0,
+                                    encoding='pcm')
+        self.engine._request_url = 'http://127.0.0.1:%d/recognize' % \
+            self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testStreaming(self):
+        """
+        Is audio uploaded while the utterance is still going on?
+        """
+        self.engine.start_utterance(16000, 2)
+        self.engine.feed_utterance('\x01\x00' * 100)
+        self.assertTrue(self.server.chunk_received.wait(5))
+        self.engine.feed_utterance('\x02\x00' * 100)
+        transcription = self.engine.finish_utterance()
+        self.assertEqual(transcription,
+                         ['WHAT TIME IS IT', 'WHAT TIME IS THIS'])
+        self.assertEqual(stt.get_confidence(transcription), 0.92)
+        self.assertEqual(transcription.hypotheses[0].engine, 'google')
+        self.assertIsNone(transcription.hypotheses[1].confidence)
+        self.assertEqual(self.server.requests,
+                         [(True, '\x01\x00' * 100 + '\x02\x00' * 100)])
+
+    def testFallback(self):
+        """
+        Is the whole utterance uploaded again if streaming fails?
+        """
+        self.server.fail_streaming = True
+        self.engine.start_utterance(16000, 2)
+        self.engine.feed_utterance('\x01\x00' * 100)
+        self.engine.feed_utterance('\x02\x00' * 100)
+        self.assertEqual(self.engine.finish_utterance(),
+                         ['WHAT TIME IS IT', 'WHAT TIME IS THIS'])
+        data = '\x01\x00' * 100 + '\x02\x00' * 100
+        self.assertEqual(self.server.requests, [(True, data), (False, data)])
+
+    def testTranscribeWav(self):
+        """
+        Does transcribe() upload the PCM data of a WAV file without its
+        header?
+        """
+        data = '\x01\x00' * 100
+        with tempfile.SpooledTemporaryFile() as f:
+            wav = wave.open(f, 'wb')
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(data)
+            wav.close()
+            f.seek(0)
+            self.assertEqual(self.engine.transcribe(f),
+                             ['WHAT TIME IS IT', 'WHAT TIME IS THIS'])
+        self.assertEqual(self.server.requests, [(False, data)])
+
+
+class TestHedgedSTT(unittest.TestCase):
+    class DelayedSTT(stt.AbstractSTTEngine):
+        SLUG = None
+
+        def __init__(self, name, result, delay):
+            self.SLUG = name
+            self.result = result
+            self.delay = delay
+            self.calls = 0
+            self.warmed_up = False
+
+        @classmethod
+        def is_available(cls):
+            return True
+
+        def transcribe(self, fp):
+            pass
+
+        def warm_up(self):
+            self.warmed_up = True
+
+        def transcribe_pcm(self, data, rate=16000, width=2):
+            self.calls += 1
+            time.sleep(self.delay)
+            return self.result
+
+    def testFirstConfidentResult(self):
+        """
+        Is the first confident result returned without waiting for others?
+        """
+        slow = self.DelayedSTT('slow', ['SLOW'], 1)
+        fast = self.DelayedSTT('fast', ['FAST'], 0)
+        engine = stt.HedgedSTT([slow, fast])
+        start = time.time()
+        self.assertEqual(engine.transcribe_pcm('\x00' * 32), ['FAST'])
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(engine.wins, [0, 1])
+
+        # The slow engine is skipped while it's still busy
+        self.assertEqual(engine.transcribe_pcm('\x00' * 32), ['FAST'])
+        self.assertEqual(slow.calls, 1)
+        self.assertEqual(fast.calls, 2)
+
+    def testDeadline(self):
+        """
+        Is an engine that misses its deadline given up on?
+        """
+        slow = self.DelayedSTT('slow', ['SLOW'], 1)
+        empty = self.DelayedSTT('empty', [], 0)
+        engine = stt.HedgedSTT([slow, empty], deadlines=[0.1, None])
+        start = time.time()
+        self.assertEqual(engine.transcribe_pcm('\x00' * 32), [])
+        self.assertLess(time.time() - start, 0.5)
+
+    def testFallbackOrder(self):
+        """
+        Is the first engine's result used if nothing is confident enough?
+        """
+        first = self.DelayedSTT('first', ['FIRST'], 0.1)
+        second = self.DelayedSTT('second', ['SECOND'], 0)
+        engine = stt.HedgedSTT([first, second], threshold=1.1)
+        self.assertEqual(engine.transcribe_pcm('\x00' * 32), ['FIRST'])
+        self.assertEqual(engine.wins, [1, 0])
+
+    def testWarmUp(self):
+        """
+        Are all engines warmed up?
+        """
+        first = self.DelayedSTT('first', ['FIRST'], 0)
+        second = self.DelayedSTT('second', ['SECOND'], 0)
+        stt.HedgedSTT([first, second]).warm_up()
+        self.assertTrue(first.warmed_up)
+        self.assertTrue(second.warmed_up)
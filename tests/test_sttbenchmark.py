@@ -0,0 +1,76 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import os
+import shutil
+import tempfile
+import unittest
+from client import sttbenchmark, stt, jasperpath
+
+
+class TestWordErrorRate(unittest.TestCase):
+    def testWordErrors(self):
+        self.assertEqual(sttbenchmark.word_errors('what time is it',
+                                                  'What time is it?'),
+                         (0, 4))
+        # One substitution, one deletion
+        self.assertEqual(sttbenchmark.word_errors('what time is it',
+                                                  'what dime it'), (2, 4))
+        # Two insertions
+        self.assertEqual(sttbenchmark.word_errors('time',
+                                                  'the time is'), (2, 1))
+
+    def testWordErrorRate(self):
+        self.assertEqual(sttbenchmark.word_error_rate(
+            [('what time is it', 'what time is it'),
+             ('check my email', 'check email')]), 1 / 7.0)
+        self.assertIsNone(sttbenchmark.word_error_rate([]))
+
+    def testPercentile(self):
+        values = range(1, 101)
+        self.assertEqual(sttbenchmark.percentile(values, 50), 50)
+        self.assertEqual(sttbenchmark.percentile(values, 95), 95)
+        self.assertEqual(sttbenchmark.percentile([3, 1, 2], 50), 2)
+        self.assertIsNone(sttbenchmark.percentile([], 50))
+
+
+class TestBenchmark(unittest.TestCase):
+    class FixedSTT(stt.AbstractSTTEngine):
+        SLUG = None
+
+        def __init__(self, text):
+            self.SLUG = 'fixed'
+            self.text = text
+
+        @classmethod
+        def is_available(cls):
+            return True
+
+        def transcribe(self, fp):
+            pass
+
+        def transcribe_pcm(self, data, rate=16000, width=2):
+            return [self.text]
+
+    def setUp(self):
+        self.corpus = tempfile.mkdtemp()
+        for name in ('jasper', 'time'):
+            shutil.copy(jasperpath.data('audio', name + '.wav'),
+                        self.corpus)
+        with open(os.path.join(self.corpus, 'time.txt'), 'w') as f:
+            f.write('What time is it?\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.corpus)
+
+    def testBenchmark(self):
+        clips = sttbenchmark.load_corpus(self.corpus)
+        self.assertEqual([clip.name for clip in clips], ['jasper', 'time'])
+        self.assertIsNone(clips[0].reference)
+        self.assertEqual(clips[1].reference, 'What time is it?')
+
+        result = sttbenchmark.benchmark(self.FixedSTT('WHAT TIME'), clips)
+        self.assertEqual(result['clips'], 2)
+        self.assertEqual(result['wer'], 0.5)
+        self.assertGreater(result['audio_seconds'], 0)
+        self.assertGreater(result['peak_rss_kib'], 0)
+        self.assertIn('fixed', sttbenchmark.format_results([result]))
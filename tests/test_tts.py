@@ -1,7 +1,12 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8-*-
+import io
+import time
+import wave
+import shutil
+import tempfile
 import unittest
-from client import tts
+from client import tts, ttscache
 
 
 class TestTTS(unittest.TestCase):
@@ -9,3 +14,178 @@ class TestTTS(unittest.TestCase):
         tts_engine = tts.get_engine_by_slug('dummy-tts')
         tts_instance = tts_engine()
         tts_instance.say('This is a test.')
+
+
+class TestPhraseCache(unittest.TestCase):
+    class CountingTTS(tts.AbstractTTSEngine):
+        SLUG = None
+
+        def __init__(self):
+            super(TestPhraseCache.CountingTTS, self).__init__()
+            self.SLUG = 'counting-tts'
+            self.synthesized = []
+            self.played = []
+
+        @classmethod
+        def is_available(cls):
+            return True
+
+        def synthesize(self, phrase):
+            self.synthesized.append(phrase)
+            with tempfile.NamedTemporaryFile(suffix='.wav',
+                                             delete=False) as f:
+                f.write(phrase)
+            return f.name
+
+        def play(self, filename):
+            with open(filename, 'rb') as f:
+                self.played.append(f.read())
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testCachedSay(self):
+        """
+        Is a phrase only synthesized once?
+        """
+        engine = self.CountingTTS()
+        engine.cache = ttscache.PhraseCache(self.tmpdir)
+        engine.say('Pardon?')
+        engine.say('Pardon?')
+        self.assertEqual(engine.synthesized, ['Pardon?'])
+        self.assertEqual(engine.played, ['Pardon?', 'Pardon?'])
+
+    def testSayAll(self):
+        """
+        Are phrases synthesized ahead and played in order?
+        """
+        engine = self.CountingTTS()
+        synthesize = engine.synthesize
+        events = []
+
+        def slow_synthesize(phrase):
+            events.append(('synthesize', phrase))
+            time.sleep(0.05)
+            return synthesize(phrase)
+
+        def play(filename):
+            with open(filename, 'rb') as f:
+                events.append(('play', f.read()))
+            time.sleep(0.1)
+
+        engine.synthesize = slow_synthesize
+        engine.play = play
+        engine.say_all(['One.', 'Two.', 'Three.', 'Four.'])
+        played = [phrase for event, phrase in events if event == 'play']
+        self.assertEqual(played, ['One.', 'Two.', 'Three.', 'Four.'])
+        # The second phrase is synthesized before the first one is played
+        self.assertLess(events.index(('synthesize', 'Two.')),
+                        events.index(('play', 'One.')))
+
+    def testSayAllCancelled(self):
+        engine = self.CountingTTS()
+        played = engine.played
+        engine.say_all(['One.', 'Two.', 'Three.'],
+                       is_cancelled=lambda: len(played) >= 1)
+        self.assertEqual(played, ['One.'])
+
+    def testCancelledWhileSynthesizing(self):
+        engine = self.CountingTTS()
+        synthesize = engine.synthesize
+        cancelled = []
+
+        def cancelling_synthesize(phrase):
+            cancelled.append(True)
+            return synthesize(phrase)
+
+        engine.synthesize = cancelling_synthesize
+        engine.say_all(['One.'], is_cancelled=lambda: bool(cancelled))
+        self.assertEqual(engine.played, [])
+
+    def testUncachedSay(self):
+        engine = self.CountingTTS()
+        engine.say('Pardon?')
+        engine.say('Pardon?')
+        self.assertEqual(engine.synthesized, ['Pardon?', 'Pardon?'])
+
+
+class TestStreaming(unittest.TestCase):
+    class StreamingTTS(tts.AbstractTTSEngine):
+        SLUG = None
+        STREAMING = True
+
+        def __init__(self, audio):
+            super(TestStreaming.StreamingTTS, self).__init__()
+            self.SLUG = 'streaming-tts'
+            self.audio = audio
+
+        @classmethod
+        def is_available(cls):
+            return True
+
+        def synthesize_stream(self, phrase):
+            f = io.BytesIO()
+            wav = wave.open(f, 'wb')
+            wav.setframerate(16000)
+            wav.setsampwidth(2)
+            wav.setnchannels(1)
+            wav.writeframes(self.audio)
+            wav.close()
+            data = f.getvalue()
+            # Split the header, too
+            for i in range(0, len(data), 30):
+                yield data[i:i + 30]
+
+    class FakePlayer(object):
+        def __init__(self):
+            self.streamed = []
+            self.played = []
+
+        def open_stream(self, rate, width, channels):
+            self.format = (rate, width, channels)
+            player = self
+
+            class Playback(object):
+                cancelled = False
+
+                def write(self, data):
+                    player.streamed.append(data)
+
+                def close(self):
+                    pass
+
+                def wait(self):
+                    pass
+            return Playback()
+
+        def play(self, filename):
+            self.played.append(filename)
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.audio = '\x01\x02' * 1000
+        self.engine = self.StreamingTTS(self.audio)
+        self.engine.player = self.FakePlayer()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testStreaming(self):
+        """
+        Is streamed audio played and then cached?
+        """
+        self.engine.cache = ttscache.PhraseCache(self.tmpdir)
+        self.engine.say('Hello')
+        player = self.engine.player
+        self.assertEqual(player.format, (16000, 2, 1))
+        self.assertEqual(''.join(player.streamed), self.audio)
+        self.assertGreater(len(player.streamed), 1)
+
+        self.engine.say('Hello')
+        self.assertEqual(len(player.played), 1)
+        wav = wave.open(player.played[0], 'rb')
+        self.assertEqual(wav.readframes(wav.getnframes()), self.audio)
+        wav.close()
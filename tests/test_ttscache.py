@@ -0,0 +1,63 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import os
+import shutil
+import tempfile
+import unittest
+from client import ttscache
+
+
+class TestPhraseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tts-cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def synthesize(self, size=100):
+        with tempfile.NamedTemporaryFile(suffix='.wav', dir=self.tmpdir,
+                                         delete=False) as f:
+            f.write('\x00' * size)
+        return f.name
+
+    def testKey(self):
+        key = ttscache.PhraseCache.get_key
+        self.assertEqual(key('espeak-tts', {'voice': 'en'}, 'Pardon?'),
+                         key('espeak-tts', {'voice': 'en'}, ' Pardon? \n'))
+        self.assertNotEqual(key('espeak-tts', {'voice': 'en'}, 'Pardon?'),
+                            key('espeak-tts', {'voice': 'de'}, 'Pardon?'))
+        self.assertNotEqual(key('espeak-tts', {}, 'Pardon?'),
+                            key('pico-tts', {}, 'Pardon?'))
+
+    def testHitAndMiss(self):
+        cache = ttscache.PhraseCache(self.path)
+        self.assertIsNone(cache.get('a'))
+        path = cache.put('a', self.synthesize())
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(cache.get('a'), path)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Empty files (failed synthesis) aren't cached
+        self.assertIsNone(cache.put('b', self.synthesize(0)))
+        self.assertIsNone(cache.get('b'))
+
+        # Cached phrases survive a restart
+        cache = ttscache.PhraseCache(self.path)
+        self.assertEqual(cache.get('a'), path)
+
+    def testEviction(self):
+        """
+        Are the least recently used phrases evicted first?
+        """
+        cache = ttscache.PhraseCache(self.path, max_size=250)
+        cache.put('a', self.synthesize())
+        cache.put('b', self.synthesize())
+        cache.get('a')
+        cache.put('c', self.synthesize())
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.size, 200)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(sorted(os.listdir(self.path)), ['a.wav', 'c.wav'])
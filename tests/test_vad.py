@@ -0,0 +1,74 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import unittest
+import audioop
+import numpy
+from client import vad
+
+
+def make_chunk(amplitude, length=1024):
+    samples = numpy.empty(length, dtype='<i2')
+    samples[0::2] = amplitude
+    samples[1::2] = -amplitude
+    return samples.tostring()
+
+
+class TestVAD(unittest.TestCase):
+
+    def testScoreMatchesAudioop(self):
+        data = make_chunk(3000)
+        self.assertAlmostEqual(vad.score(data), audioop.rms(data, 2) / 3.0,
+                               places=0)
+
+    def testVectorizedScores(self):
+        detector = vad.VoiceActivityDetector()
+        chunks = [make_chunk(a) for a in (0, 300, 3000)]
+        scores = detector.scores(''.join(chunks), 1024)
+        self.assertEqual(len(scores), 3)
+        for chunk, value in zip(chunks, scores):
+            self.assertAlmostEqual(detector.score(chunk), value)
+
+    def testRollingAverage(self):
+        detector = vad.VoiceActivityDetector(window=2)
+        self.assertEqual(detector.average, 0.0)
+        detector.add_score(3)
+        self.assertEqual(detector.average, 3)
+        detector.add_score(5)
+        detector.add_score(7)
+        self.assertEqual(detector.average, 6)
+        self.assertEqual(detector.threshold,
+                         6 * vad.THRESHOLD_MULTIPLIER)
+
+    def testEndOfSpeech(self):
+        detector = vad.VoiceActivityDetector(window=3)
+        detector.reset(120)
+        self.assertFalse(detector.has_ended(100))
+        for i in range(3):
+            detector.update(make_chunk(0))
+        self.assertTrue(detector.has_ended(100))
+
+
+class TestNoiseFloorTracker(unittest.TestCase):
+
+    def testWarmup(self):
+        tracker = vad.NoiseFloorTracker(warmup=2)
+        self.assertFalse(tracker.ready)
+        tracker.update(10)
+        tracker.update(10)
+        self.assertTrue(tracker.ready)
+        self.assertEqual(tracker.floor, 10)
+        self.assertEqual(tracker.threshold, 10 * vad.THRESHOLD_MULTIPLIER)
+
+    def testSpeechHardlyRaisesFloor(self):
+        tracker = vad.NoiseFloorTracker()
+        tracker.update(10)
+        for i in range(50):
+            tracker.update(100)
+        self.assertLess(tracker.floor, 20)
+
+    def testFollowsQuieterBackground(self):
+        tracker = vad.NoiseFloorTracker()
+        tracker.update(100)
+        for i in range(30):
+            tracker.update(10)
+        self.assertLess(tracker.floor, 11)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8-*-
+import unittest
+import mock
+import numpy
+from client import wakeword
+
+
+def make_clip(voiced_time, total_time=2.0, rate=16000):
+    samples = numpy.zeros(int(total_time * rate), dtype='<i2')
+    samples[:] = 10
+    voiced = int(voiced_time * rate)
+    samples[1:voiced:2] = 4000
+    samples[0:voiced:2] = -4000
+    return samples.tostring()
+
+
+class TestSpeechDurationDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = wakeword.SpeechDurationDetector()
+
+    def testAcceptsWord(self):
+        self.assertTrue(self.detector.accepts(make_clip(0.6)))
+
+    def testRejectsClick(self):
+        self.assertFalse(self.detector.accepts(make_clip(0.05)))
+
+    def testRejectsSilence(self):
+        self.assertFalse(self.detector.accepts(make_clip(0)))
+
+
+class TestDetectorCascade(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = mock.Mock()
+        self.engine.transcribe_pcm.return_value = ['JASPER']
+        self.first = mock.Mock(SLUG='first')
+        self.second = mock.Mock(SLUG='second')
+        self.cascade = wakeword.DetectorCascade(self.engine,
+                                                [self.first, self.second])
+
+    def testRejectedClipsNeverReachEngine(self):
+        self.first.accepts.return_value = False
+        self.assertEqual(self.cascade.transcribe_pcm('data'), [])
+        self.assertFalse(self.second.accepts.called)
+        self.assertFalse(self.engine.transcribe_pcm.called)
+
+    def testAcceptedClipsReachEngine(self):
+        self.first.accepts.return_value = True
+        self.second.accepts.return_value = True
+        self.assertEqual(self.cascade.transcribe_pcm('data'), ['JASPER'])
+        self.engine.transcribe_pcm.assert_called_once_with('data', 16000, 2)
+
+    def testStats(self):
+        self.first.accepts.side_effect = [False, True, True]
+        self.second.accepts.side_effect = [False, True]
+        for i in range(3):
+            self.cascade.transcribe_pcm('data')
+        self.assertEqual(self.cascade.stats,
+                         [('first', 1), ('second', 1), ('passed', 1)])
+
+
+class TestSTTDetector(unittest.TestCase):
+
+    def testKeyword(self):
+        engine = mock.Mock()
+        detector = wakeword.STTDetector(engine, ['JASPER'])
+        engine.transcribe_pcm.return_value = ['HEY JASPER']
+        self.assertTrue(detector.accepts('data'))
+        engine.transcribe_pcm.return_value = ['WHAT']
+        self.assertFalse(detector.accepts('data'))